@@ -0,0 +1,65 @@
+"""Общие утилиты бенчмарков: sys.path, перцентили и монитор задержек event loop."""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(values, unit: float = 1000.0) -> dict:
+    """p50/p99/max в миллисекундах (values — в секундах)."""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * unit, 3),
+        "p99_ms": round(percentile(values, 99) * unit, 3),
+        "max_ms": round((max(values) if values else 0.0) * unit, 3),
+    }
+
+
+class LoopLagMonitor:
+    """Просыпается каждые `interval` секунд и пишет, насколько опоздал.
+
+    Опоздание = время, которое event loop был занят чужим синхронным кодом.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self) -> dict:
+        stats = summarize(self.lags)
+        stats["stalled_ms_total"] = round(sum(l for l in self.lags if l > 0.005) * 1000, 1)
+        return stats
+
+
+def timer():
+    return time.perf_counter()
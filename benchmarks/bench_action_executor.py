@@ -0,0 +1,114 @@
+"""
+Рейд спама: удаление каждого сообщения отдельным запросом против ActionExecutor.
+
+FakeBot имитирует flood control Telegram: больше `--chat-limit` запросов в
+секунду в один чат — TelegramRetryAfter. Время в тесте ускорено: лимиты и
+retry_after считаются в «быстрых» секундах (--speedup).
+
+    python -m benchmarks.bench_action_executor --chats 20 --messages 300
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from services.action_executor import ActionExecutor
+
+
+class FakeBot:
+    def __init__(self, chat_limit: float, speedup: float, latency: float = 0.02):
+        self.chat_limit = chat_limit
+        self.speedup = speedup
+        self.latency = latency / speedup
+        self.calls = 0
+        self.flood_errors = 0
+        self.deleted = 0
+        self._history = defaultdict(deque)
+
+    def _check(self, chat_id: int):
+        now = time.monotonic()
+        window = 1.0 / self.speedup
+        history = self._history[chat_id]
+        while history and now - history[0] > window:
+            history.popleft()
+        if len(history) >= self.chat_limit:
+            self.flood_errors += 1
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=1 / self.speedup)
+        history.append(now)
+
+    async def delete_message(self, chat_id: int, message_id: int):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        self._check(chat_id)
+        self.deleted += 1
+
+    async def delete_messages(self, chat_id: int, message_ids):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        self._check(chat_id)
+        self.deleted += len(message_ids)
+
+
+async def inline(bot: FakeBot, chats: int, messages: int) -> float:
+    """Как раньше: хендлер сам удаляет и сам ждёт повторов."""
+    async def handle(chat_id, message_id):
+        while True:
+            try:
+                return await bot.delete_message(chat_id, message_id)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        handle(-c, m) for m in range(messages) for c in range(chats)
+    ))
+    return time.perf_counter() - started
+
+
+async def executor(bot: FakeBot, chats: int, messages: int, speedup: float) -> float:
+    ex = ActionExecutor(bot, global_rate=30 * speedup, chat_rate=1 * speedup, chat_burst=3)
+    await ex.start()
+    started = time.perf_counter()
+    for m in range(messages):
+        for c in range(chats):
+            ex.delete(-c, m)
+        await asyncio.sleep(0)
+    while ex.depth() or ex._in_flight:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    await ex.stop()
+    return elapsed
+
+
+async def run(mode: str, args) -> dict:
+    bot = FakeBot(args.chat_limit, args.speedup)
+    if mode == "inline":
+        elapsed = await inline(bot, args.chats, args.messages)
+    else:
+        elapsed = await executor(bot, args.chats, args.messages, args.speedup)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "api_calls": bot.calls,
+        "flood_errors": bot.flood_errors,
+        "deleted": bot.deleted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=300, help="спам-сообщений на чат")
+    parser.add_argument("--chat-limit", type=float, default=1.0, help="запросов/с в чат до 429")
+    parser.add_argument("--speedup", type=float, default=100.0)
+    args = parser.parse_args()
+
+    for mode in ("inline", "executor"):
+        report = asyncio.run(run(mode, args))
+        print(f"{mode:>8}: deleted={report['deleted']} api_calls={report['api_calls']} "
+              f"429s={report['flood_errors']} elapsed={report['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Пропускная способность и задержка AI-очереди на офлайн FakeBackend.
+
+Сравниваются запрос на каждое сообщение (batch=1) и микро-батчинг.
+
+    python -m benchmarks.bench_ai_pipeline --messages 2000 --rate 500
+"""
+import argparse
+import asyncio
+
+from benchmarks._common import summarize, timer
+from benchmarks.corpus import replay_corpus
+
+from services.ai_pipeline import AIFilterPipeline, FakeBackend
+from services.text_analysis import analyze
+
+
+class FakeMessage:
+    deleted = 0
+
+    async def delete(self):
+        FakeMessage.deleted += 1
+
+
+async def run(messages, rate: float, latency: float, batch: int, window: float, in_flight: int):
+    FakeMessage.deleted = 0
+    backend = FakeBackend(latency=latency)
+    pipeline = AIFilterPipeline(
+        backend, max_batch=batch, max_delay=window,
+        max_in_flight=in_flight, queue_size=len(messages),
+    )
+    await pipeline.start()
+
+    started = timer()
+    for sample in messages:
+        pipeline.submit(FakeMessage(), analyze(sample.text))
+        await asyncio.sleep(1 / rate)
+    await pipeline.stop()
+    elapsed = timer() - started
+
+    report = summarize(list(pipeline.latencies))
+    report.update(
+        model_calls=backend.calls,
+        deleted=FakeMessage.deleted,
+        msgs_per_s=round(len(messages) / elapsed, 1),
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--rate", type=float, default=500.0, help="сообщений в секунду")
+    parser.add_argument("--latency", type=float, default=0.4, help="задержка модели, с")
+    parser.add_argument("--in-flight", type=int, default=4)
+    args = parser.parse_args()
+
+    messages = replay_corpus(args.messages)
+    for batch, window in ((1, 0.0), (8, 0.1), (32, 0.3)):
+        report = asyncio.run(run(messages, args.rate, args.latency, batch, window, args.in_flight))
+        print(f"batch={batch:>2} window={window}s | calls={report['model_calls']} "
+              f"deleted={report['deleted']} | latency p50={report['p50_ms']}ms "
+              f"p99={report['p99_ms']}ms | {report['msgs_per_s']} msg/s")
+
+
+if __name__ == "__main__":
+    main()
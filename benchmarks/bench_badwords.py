@@ -0,0 +1,73 @@
+"""
+Проверка сообщения против бан-листа: старый вложенный цикл против автомата
+Ахо-Корасик. Морфология не участвует — сравниваем только сам матчер.
+
+    python -m benchmarks.bench_badwords --words 10000 50000 --messages 2000
+"""
+import argparse
+import random
+
+from benchmarks._common import summarize, timer
+
+from services.badword_matcher import AhoCorasick
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def random_word(rng: random.Random, lo: int = 4, hi: int = 10) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(lo, hi)))
+
+
+def nested_loop(lemmas, banned):
+    for lemma in lemmas:
+        for word in banned:
+            if word in lemma:
+                return word
+    return None
+
+
+def bench(sizes, messages: int, words_per_message: int, seed: int = 42):
+    rng = random.Random(seed)
+    corpus = [
+        [random_word(rng, 2, 9) for _ in range(words_per_message)]
+        for _ in range(messages)
+    ]
+
+    for size in sizes:
+        banned = sorted({random_word(rng, 6, 12) for _ in range(size)})
+
+        started = timer()
+        automaton = AhoCorasick(banned)
+        build = timer() - started
+
+        loop_times, ac_times = [], []
+        loop_hits = ac_hits = 0
+        # Вложенный цикл слишком медленный, гоняем его на подвыборке
+        for lemmas in corpus[: max(1, messages // 20)]:
+            started = timer()
+            loop_hits += nested_loop(lemmas, banned) is not None
+            loop_times.append(timer() - started)
+        for lemmas in corpus:
+            text = " ".join(lemmas)
+            started = timer()
+            ac_hits += automaton.search(text) is not None
+            ac_times.append(timer() - started)
+
+        loop = summarize(loop_times)
+        ac = summarize(ac_times)
+        print(f"{size:>7} words | build {build * 1000:.1f}ms, {automaton.size} states | "
+              f"nested loop p50={loop['p50_ms']}ms p99={loop['p99_ms']}ms | "
+              f"aho-corasick p50={ac['p50_ms']}ms p99={ac['p99_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--words-per-message", type=int, default=40)
+    args = parser.parse_args()
+    bench(args.words, args.messages, args.words_per_message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Задержка event loop при конкурентном трафике групп: синхронный Session против async.
+
+Каждая «группа» — отдельная корутина, которая на каждое сообщение делает то же,
+что AuthorizedMessageMiddleware: выборка пользователя по (group_id, user_id)
+и коммит для новых пользователей.
+
+    python -m benchmarks.bench_db_stall --groups 50 --messages 40
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from benchmarks._common import LoopLagMonitor, timer
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, ChatUser, Group
+
+GROUP_ID = 1
+
+
+def seed(path: str, users: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(Group(id=GROUP_ID, chat_id=-100))
+        session.add_all(
+            ChatUser(user_id=i, group_id=GROUP_ID, is_verified=True) for i in range(users)
+        )
+        session.commit()
+    engine.dispose()
+
+
+# ---------------------------
+# До: синхронная сессия прямо в корутине
+# ---------------------------
+async def sync_group(session_factory, group: int, messages: int, users: int):
+    for n in range(messages):
+        user_id = (group * 31 + n) % (users * 2)
+        with session_factory() as session:
+            db_user = session.query(ChatUser).filter_by(group_id=GROUP_ID, user_id=user_id).first()
+            if not db_user:
+                session.add(ChatUser(user_id=users * 2 + group * messages + n, group_id=GROUP_ID))
+                session.commit()
+        await asyncio.sleep(0)
+
+
+# ---------------------------
+# После: AsyncSession поверх aiosqlite
+# ---------------------------
+async def async_group(session_factory, group: int, messages: int, users: int):
+    for n in range(messages):
+        user_id = (group * 31 + n) % (users * 2)
+        async with session_factory() as session:
+            db_user = await ChatUser.get(session, user_id, GROUP_ID)
+            if not db_user:
+                session.add(ChatUser(user_id=users * 2 + group * messages + n, group_id=GROUP_ID))
+                await session.commit()
+
+
+async def run(mode: str, path: str, groups: int, messages: int, users: int) -> dict:
+    if mode == "sync":
+        engine = create_engine(f"sqlite:///{path}")
+        factory = sessionmaker(bind=engine)
+        worker = sync_group
+    else:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        worker = async_group
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = timer()
+    await asyncio.gather(*(worker(factory, g, messages, users) for g in range(groups)))
+    elapsed = timer() - started
+    await monitor.stop()
+
+    if mode == "sync":
+        engine.dispose()
+    else:
+        await engine.dispose()
+
+    report = monitor.report()
+    report["elapsed_s"] = round(elapsed, 3)
+    report["msgs_per_s"] = round(groups * messages / elapsed, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            seed(path, args.users)
+            report = asyncio.run(run(mode, path, args.groups, args.messages, args.users))
+        print(f"{mode:>5}: loop lag p50={report['p50_ms']}ms p99={report['p99_ms']}ms "
+              f"max={report['max_ms']}ms stalled={report['stalled_ms_total']}ms | "
+              f"{report['msgs_per_s']} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Антифлуд под рейдом: тысячи чатов, в части из них — залп сообщений и
+вступлений. Меряем стоимость одного решения и время до lockdown.
+
+    python -m benchmarks.bench_flood_detector --chats 2000 --messages 500000
+"""
+import argparse
+import random
+
+from benchmarks._common import summarize, timer
+
+from database.settings_cache import FLOOD_PRESETS
+from services.flood_detector import DROP, LOCKDOWN, FloodDetector
+
+
+def bench(chats: int, messages: int, raid_share: float, raid_traffic: float, preset: str, seed: int = 7):
+    rng = random.Random(seed)
+    limits = FLOOD_PRESETS[preset]
+    detector = FloodDetector()
+    raided = rng.sample(range(chats), max(1, int(chats * raid_share)))
+
+    now = 0.0
+    first_lockdown = {}
+    drops = 0
+    times = []
+    for i in range(messages):
+        # Общий поток ~1000 сообщений/с, доля raid_traffic приходится на атакуемые чаты
+        now += 0.001
+        if rng.random() < raid_traffic:
+            # Рейд: много новых аккаунтов, одинаковый текст
+            chat_id = rng.choice(raided)
+            user_id, text_hash = rng.randrange(10_000_000), 1
+            if rng.random() < 0.05:
+                detector.on_join(chat_id, limits, now=now)
+        else:
+            chat_id = rng.randrange(chats)
+            user_id, text_hash = rng.randrange(200), rng.getrandbits(32)
+
+        started = timer()
+        verdict = detector.on_message(chat_id, user_id, text_hash, limits, now=now)
+        times.append(timer() - started)
+
+        drops += verdict == DROP
+        if verdict == LOCKDOWN:
+            first_lockdown.setdefault(chat_id, now)
+
+    raided = set(raided)
+    stats = summarize(times)
+    false_lockdowns = len(set(first_lockdown) - raided)
+    print(f"{preset:>8} | {messages} msgs over {chats} chats ({len(raided)} raided) | "
+          f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms | "
+          f"drops={drops} lockdowns={len(first_lockdown)} "
+          f"(raided caught {len(raided & set(first_lockdown))}, false {false_lockdowns}) | "
+          f"first lockdown after {min(first_lockdown.values(), default=0):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=500_000)
+    parser.add_argument("--raid-share", type=float, default=0.01)
+    parser.add_argument("--raid-traffic", type=float, default=0.3)
+    args = parser.parse_args()
+
+    for preset in FLOOD_PRESETS:
+        bench(args.chats, args.messages, args.raid_share, args.raid_traffic, preset)
+
+
+if __name__ == "__main__":
+    main()
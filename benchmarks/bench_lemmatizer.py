@@ -0,0 +1,61 @@
+"""
+Лемматизация чата: голый pymorphy3 против Lemmatizer с кэшем.
+
+Поток сообщений собирается из ограниченного словаря по закону Ципфа —
+так выглядит реальная переписка, где одни и те же слова повторяются.
+
+    python -m benchmarks.bench_lemmatizer --messages 5000
+"""
+import argparse
+import random
+
+from benchmarks._common import timer
+
+from services.lemmatizer import Lemmatizer
+
+VOCABULARY = (
+    "привет как дела что делаешь сегодня завтра вечером встреча пойдём кино "
+    "работа дом машина деньги купить продать скидка реклама подписывайся канал "
+    "бот крипта заработок быстро бесплатно ссылка группа чат админ правила "
+    "спасибо пожалуйста хорошо плохо новости погода играть смотреть писать "
+    "читать думать говорить знать хотеть мочь видеть слышать понимать помнить"
+).split()
+
+
+def make_corpus(messages: int, seed: int = 7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    corpus = []
+    for _ in range(messages):
+        length = rng.choice((3, 5, 8, 12, 20, 120))
+        corpus.append(rng.choices(VOCABULARY, weights, k=length))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5_000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    lemmatizer = Lemmatizer()
+    lemmatizer.morph  # словари грузятся лениво — не включаем загрузку в замер
+
+    started = timer()
+    for words in corpus:
+        [lemmatizer._parse(word) for word in words]
+    raw = timer() - started
+
+    started = timer()
+    for words in corpus:
+        lemmatizer.lemmatize(words)
+    cached = timer() - started
+
+    print(f"pymorphy3 без кэша: {raw * 1000:.1f}ms")
+    print(f"Lemmatizer с кэшем: {cached * 1000:.1f}ms (x{raw / cached:.1f})")
+    print(lemmatizer.stats())
+    lemmatizer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Фильтр ссылок: дерево доменов по меткам (services/link_filter.py) против
+перебора списка с endswith и проверки всех суффиксов домена по множеству.
+
+    сборка:  время и память дерева на 100k / 1M доменов
+    поиск:   p50/p99 на домен; запросы — поддомены запрещённых и чужие домены
+    кэш:     доля попаданий кэша вердиктов на потоке ссылок, где популярные
+             домены повторяются (распределение Ципфа)
+
+    python -m benchmarks.bench_link_filter --sizes 100000 1000000 --queries 20000
+"""
+import argparse
+import random
+import string
+import tracemalloc
+
+from benchmarks._common import summarize, timer
+
+from services.link_filter import DENY, DomainTrie, LinkFilter, link_host
+
+TLDS = ("com", "ru", "net", "org", "xyz", "io", "top", "info", "co.uk", "com.br")
+
+
+def domain(rng: random.Random) -> str:
+    name = "".join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(5, 14)))
+    return f"{name}.{rng.choice(TLDS)}"
+
+
+def endswith_scan(domains, host: str) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def suffix_set(domains: set, host: str) -> bool:
+    labels = host.split(".")
+    return any(".".join(labels[i:]) in domains for i in range(len(labels)))
+
+
+def _measure(find, probes):
+    times, hits = [], 0
+    for host in probes:
+        started = timer()
+        hits += bool(find(host))
+        times.append(timer() - started)
+    return summarize(times, unit=1e6), hits
+
+
+def bench_lookup(sizes, queries: int, seed: int = 3) -> None:
+    rng = random.Random(seed)
+    for size in sizes:
+        domains = list({domain(rng) for _ in range(size)})
+        tracemalloc.start()
+        started = timer()
+        trie = DomainTrie((d, DENY) for d in domains)
+        build = timer() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        as_set = set(domains)
+
+        # Половина — поддомены запрещённых, половина — посторонние
+        probes = [f"promo{i}.{rng.choice(domains)}" if i % 2 else domain(rng) for i in range(queries)]
+        line = f"{len(domains):>8} domains | build {build:.2f}s, {memory / 2 ** 20:.0f} MiB"
+        for name, find, sample in (("endswith", lambda h: endswith_scan(domains, h), 20),
+                                   ("suffix-set", lambda h: suffix_set(as_set, h), queries),
+                                   ("trie", trie.lookup, queries)):
+            s, hits = _measure(find, probes[:sample])
+            line += f" | {name} p50={s['p50_ms']}us p99={s['p99_ms']}us hits={hits}/{min(sample, queries)}"
+        print(line)
+
+
+def bench_cache(messages: int, distinct: int, seed: int = 11) -> None:
+    rng = random.Random(seed)
+    hosts = [domain(rng) for _ in range(distinct)]
+    link_filter = LinkFilter(deny=hosts[::10], path=None)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    links = [f"https://{hosts[i]}/p/{rng.randrange(10 ** 6)}"
+             for i in rng.choices(range(distinct), weights=weights, k=messages)]
+
+    started = timer()
+    blocked = 0
+    for link in links:
+        blocked += link_filter.verdict(-1, None, link_host(link)) == DENY
+    elapsed = timer() - started
+    print(f"кэш: {messages} ссылок, {distinct} доменов -> {elapsed / messages * 1e6:.1f}us на ссылку "
+          f"(с разбором URL), заблокировано {blocked}, {link_filter.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--distinct", type=int, default=5_000)
+    args = parser.parse_args()
+
+    bench_lookup(args.sizes, args.queries)
+    bench_cache(args.messages, args.distinct)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Бан-лист медиа: поиск почти-дубликата pHash в HammingIndex (multi-index
+hashing) против перебора всего списка и BK-дерева, и сколько скачиваний
+экономит кэш хэшей по file_unique_id.
+
+    поиск:   запросы — копии запрещённых (несколько изменённых бит) и чужие
+             картинки; радиус MEDIA_PHASH_DISTANCE
+    кэш:     поток медиа, где популярные стикеры и картинки повторяются
+             (распределение Ципфа); скачивание — с задержкой, без сети
+
+    python -m benchmarks.bench_media_index --sizes 1000 10000 100000 --queries 2000
+"""
+import argparse
+import asyncio
+import io
+import random
+
+from benchmarks._common import summarize, timer
+
+from config import MEDIA_PHASH_DISTANCE
+from services.media_index import HammingIndex, MediaHasher
+
+
+def linear(hashes, value: int, max_distance: int):
+    for h in hashes:
+        if (h ^ value).bit_count() <= max_distance:
+            return h
+    return None
+
+
+class BKTree:
+    """Классическое BK-дерево — для сравнения: на 64-битных хэшах обходит почти всё."""
+
+    def __init__(self, values):
+        self.root = None
+        for value in values:
+            self.add(value)
+
+    def add(self, value: int) -> None:
+        if self.root is None:
+            self.root = [value, {}]
+            return
+        node = self.root
+        while True:
+            dist = (node[0] ^ value).bit_count()
+            if dist == 0:
+                return
+            if dist not in node[1]:
+                node[1][dist] = [value, {}]
+                return
+            node = node[1][dist]
+
+    def find(self, value: int, max_distance: int):
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            dist = (node[0] ^ value).bit_count()
+            if dist <= max_distance:
+                return node[0]
+            stack.extend(child for edge, child in node[1].items() if abs(edge - dist) <= max_distance)
+        return None
+
+
+def flip(value: int, bits: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+
+def bench_lookup(sizes, queries: int, distance: int, seed: int = 5) -> None:
+    rng = random.Random(seed)
+    for size in sizes:
+        hashes = [rng.getrandbits(64) for _ in range(size)]
+        started = timer()
+        index = HammingIndex(distance, hashes)
+        build = timer() - started
+        tree = BKTree(hashes)
+
+        # Половина — копии запрещённых, половина — посторонние картинки
+        probes = [flip(rng.choice(hashes), rng.randint(0, distance), rng) if i % 2 else rng.getrandbits(64)
+                  for i in range(queries)]
+        results = {}
+        for name, find in (("linear", lambda v: linear(hashes, v, distance)),
+                           ("bk-tree", lambda v: tree.find(v, distance)),
+                           ("index", index.find)):
+            times, hits = [], 0
+            # Перебор и BK-дерево на больших списках — на подвыборке
+            for value in probes if name == "index" or size <= 10_000 else probes[: max(50, queries // 10)]:
+                started = timer()
+                hits += find(value) is not None
+                times.append(timer() - started)
+            results[name] = (summarize(times, unit=1e6), hits, len(times))
+
+        line = f"{size:>7} hashes | build {build * 1000:.0f}ms"
+        for name, (s, hits, n) in results.items():
+            line += f" | {name} p50={s['p50_ms']}us p99={s['p99_ms']}us hits={hits}/{n}"
+        print(line)
+
+
+class SlowBot:
+    """Скачивание одной и той же картинки с задержкой сети."""
+
+    def __init__(self, latency: float, payload: bytes):
+        self.latency = latency
+        self.payload = payload
+        self.downloads = 0
+
+    async def download(self, file_id: str):
+        self.downloads += 1
+        await asyncio.sleep(self.latency)
+        return io.BytesIO(self.payload)
+
+
+def _payload() -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (90, 90), (200, 40, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+async def bench_cache(messages: int, distinct: int, latency: float, seed: int = 9) -> None:
+    hasher = MediaHasher()
+    if not hasher.available:
+        print("кэш: Pillow не установлен — pHash не считается, пропускаем")
+        return
+    rng = random.Random(seed)
+    bot = SlowBot(latency, _payload())
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    stream = rng.choices(range(distinct), weights=weights, k=messages)
+
+    started = timer()
+    # Сообщения приходят пачками, как из разных чатов одновременно
+    for i in range(0, messages, 50):
+        await asyncio.gather(*(hasher.get(bot, f"file{m}", f"u{m}") for m in stream[i:i + 50]))
+    elapsed = timer() - started
+    print(f"кэш: {messages} медиа, {distinct} разных файлов -> скачиваний {bot.downloads} "
+          f"({bot.downloads / messages:.1%}), без кэша было бы {messages}; {elapsed:.2f}s, {hasher.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--distance", type=int, default=MEDIA_PHASH_DISTANCE)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--distinct", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка скачивания, с")
+    args = parser.parse_args()
+
+    bench_lookup(args.sizes, args.queries, args.distance)
+    asyncio.run(bench_cache(args.messages, args.distinct, args.latency))
+
+
+if __name__ == "__main__":
+    main()
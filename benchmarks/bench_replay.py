@@ -0,0 +1,274 @@
+"""
+Прогон потоков апдейтов через настоящий Dispatcher из bot.py (все мидлвари,
+хендлеры и router_admin) против бота без сети. База — временная, AI — fake.
+
+Для каждого сценария: пропускная способность, задержка апдейта целиком,
+собственное время каждой мидлвари и хендлеров, вызовы API и время, за
+которое фоновые очереди (удаления, AI, журнал) разбираются после потока.
+Результат — JSON, чтобы сравнивать прогоны между собой.
+
+    python -m benchmarks.bench_replay
+    python -m benchmarks.bench_replay --scenarios spam_wave --scale 2 --out after.json --compare before.json
+    python -m benchmarks.bench_replay --input recorded_updates.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from benchmarks._common import ROOT, LoopLagMonitor, summarize, timer
+
+# До импорта bot/config: временная база, офлайн-классификатор, фиктивный токен
+_TMP = tempfile.mkdtemp(prefix="replay-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "replay.db")
+os.environ["AI_BACKEND"] = "fake"
+os.environ.setdefault("TOKEN", "42:REPLAY-BENCHMARK-TOKEN")
+os.environ["METRICS_PORT"] = "0"
+
+from aiogram import Dispatcher  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from benchmarks import updates as streams  # noqa: E402
+from benchmarks.fake_bot import make_fake_bot  # noqa: E402
+from services.metrics import MetricsRegistry, instrument_dispatcher  # noqa: E402
+from services.webhook import update_chat_id  # noqa: E402
+
+
+# ---------------------------
+# Время по стадиям
+# ---------------------------
+class StageTimer:
+    """
+    Сэмплы по стадиям для services.metrics.instrument_dispatcher: вместо
+    гистограмм — списки значений, чтобы считать точные перцентили.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def stage(self, name: str) -> Callable[[float], None]:
+        return self.samples[name].append
+
+    def instrument(self, dp: Dispatcher) -> None:
+        instrument_dispatcher(dp, stage=self.stage, registry=MetricsRegistry())
+
+    def report(self) -> Dict[str, dict]:
+        return {name: summarize(values) for name, values in sorted(self.samples.items()) if values}
+
+    def reset(self) -> None:
+        for values in self.samples.values():
+            values.clear()
+
+
+# ---------------------------
+# Прогон
+# ---------------------------
+async def drain(executor, pipeline, journal, timeout: float = 60.0) -> float:
+    """Ждёт, пока фоновые очереди опустеют; возвращает сколько это заняло."""
+    started = timer()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ai = pipeline.stats()
+        if not executor.depth() and not ai["queue_depth"] and not ai["in_flight"]:
+            break
+        await asyncio.sleep(0.01)
+    await journal.flush()
+    return timer() - started
+
+
+async def replay(dp: Dispatcher, bot, raw_updates: List[dict], concurrency: int, rate: float) -> List[float]:
+    """
+    Апдейты одного чата — строго по порядку, разные чаты — параллельно в `concurrency` полосах.
+    rate > 0 — подаём не быстрее `rate` апдейтов в секунду (иначе антифлуд видит
+    сжатое время и включает lockdown даже на обычной переписке).
+    """
+    parsed = [Update.model_validate(raw, context={"bot": bot}) for raw in raw_updates]
+    lanes: List[List[tuple]] = [[] for _ in range(concurrency)]
+    for i, update in enumerate(parsed):
+        offset = i / rate if rate > 0 else 0.0
+        lanes[hash(update_chat_id(update)) % concurrency].append((offset, update))
+
+    latencies: List[float] = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def run_lane(lane: List[tuple]):
+        for offset, update in lane:
+            delay = start + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = timer()
+            await dp.feed_update(bot, update)
+            latencies.append(timer() - started)
+
+    await asyncio.gather(*(run_lane(lane) for lane in lanes if lane))
+    return latencies
+
+
+def _delta(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+
+async def run(scenarios: Dict[str, List[dict]], concurrency: int, rate: float, telegram_limits: bool,
+              api_latency: float) -> Dict[str, dict]:
+    import bot as app
+    from database.fsm_storage import fsm_storage
+    from database.user_journal import user_journal
+    from middlewares.ai_filtering import ai_pipeline
+    from services.action_executor import TokenBucket, action_executor
+    from services.flood_detector import flood_detector
+    from services.spam_classifier import spam_classifier
+
+    # Модель спама не трогаем: учится и сохраняется только во временную папку
+    spam_classifier.path = os.path.join(_TMP, "spam_model.bin")
+    if not telegram_limits:
+        # Меряем сам бот, а не лимиты Telegram: очередь действий не тормозим
+        action_executor._global = TokenBucket(1e9, 1e9)
+        action_executor.chat_rate = action_executor.chat_burst = 1e9
+
+    fake_bot = make_fake_bot(api_latency)
+    session = fake_bot.session
+    await app.load_state()
+    dp = app.setup_dispatcher(Dispatcher(storage=fsm_storage), instrument=False)
+    stages = StageTimer()
+    stages.instrument(dp)
+    await dp.emit_startup(bot=fake_bot, dispatcher=dp)
+
+    results = {}
+    try:
+        for name, raw_updates in scenarios.items():
+            stages.reset()
+            calls_before = session.snapshot()
+            flood_before = flood_detector.stats()
+            monitor = LoopLagMonitor()
+            monitor.start()
+
+            started = timer()
+            latencies = await replay(dp, fake_bot, raw_updates, concurrency, rate)
+            elapsed = timer() - started
+            drain_time = await drain(action_executor, ai_pipeline, user_journal)
+            await monitor.stop()
+
+            results[name] = {
+                "updates": len(raw_updates),
+                "elapsed_s": round(elapsed, 3),
+                "updates_per_s": round(len(raw_updates) / elapsed, 1),
+                "drain_s": round(drain_time, 3),
+                "latency": summarize(latencies),
+                "stages": stages.report(),
+                "loop_lag": monitor.report(),
+                "api_calls": _delta(session.snapshot(), calls_before),
+                "flood": _delta(flood_detector.stats(), flood_before),
+                "ai": ai_pipeline.stats(),
+                "journal": user_journal.stats(),
+            }
+    finally:
+        await dp.emit_shutdown(bot=fake_bot, dispatcher=dp)
+        from database.models import dispose_engine
+        await dispose_engine()
+    return results
+
+
+# ---------------------------
+# Вывод и сравнение
+# ---------------------------
+def print_report(results: Dict[str, dict]) -> None:
+    for name, r in results.items():
+        lat = r["latency"]
+        print(f"\n== {name}: {r['updates']} updates, {r['updates_per_s']} upd/s, "
+              f"p50={lat['p50_ms']}ms p99={lat['p99_ms']}ms, drain {r['drain_s']}s")
+        for stage, s in r["stages"].items():
+            print(f"   {stage:<45} n={s['count']:<6} p50={s['p50_ms']:<8} p99={s['p99_ms']:<8} max={s['max_ms']}")
+        print(f"   api: {r['api_calls']}")
+
+
+def print_compare(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    def pct(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print("\n== compare with baseline")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        print(f"   {name:<10} upd/s {base['updates_per_s']} -> {r['updates_per_s']} "
+              f"({pct(r['updates_per_s'], base['updates_per_s'])}), "
+              f"p99 {base['latency']['p99_ms']} -> {r['latency']['p99_ms']}ms "
+              f"({pct(r['latency']['p99_ms'], base['latency']['p99_ms'])})")
+        for stage, s in r["stages"].items():
+            old = base["stages"].get(stage)
+            if old:
+                print(f"      {stage:<45} p99 {old['p99_ms']} -> {s['p99_ms']}ms")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(streams.SCENARIOS), choices=list(streams.SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель размера синтетических сценариев")
+    parser.add_argument("--input", nargs="+", default=[], help="JSONL с записанными апдейтами (вместо синтетики)")
+    parser.add_argument("--save-stream", help="сохранить сгенерированные потоки в эту папку как JSONL")
+    parser.add_argument("--concurrency", type=int, default=16, help="параллельных полос (по chat_id)")
+    parser.add_argument("--rate", type=float, default=0.0, help="апдейтов в секунду (0 — как можно быстрее)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="имитация ответа Telegram, секунд")
+    parser.add_argument("--telegram-limits", action="store_true", help="не снимать лимиты очереди действий")
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", f"replay-{int(time.time())}.json"))
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    if args.input:
+        scenarios = {os.path.basename(path): list(streams.read_jsonl(path)) for path in args.input}
+    else:
+        scenarios = streams.build(args.scenarios, args.scale)
+    if args.save_stream:
+        os.makedirs(args.save_stream, exist_ok=True)
+        for name, raw_updates in scenarios.items():
+            streams.write_jsonl(os.path.join(args.save_stream, f"{name}.jsonl"), raw_updates)
+
+    try:
+        results = asyncio.run(run(scenarios, args.concurrency, args.rate, args.telegram_limits, args.api_latency))
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+    print_report(results)
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": int(time.time()),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "scale": args.scale,
+            "api_latency": args.api_latency,
+            "telegram_limits": args.telegram_limits,
+        },
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"\nsaved {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            print_compare(results, json.load(fh)["scenarios"])
+
+
+if __name__ == "__main__":
+    main()
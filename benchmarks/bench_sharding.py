@@ -0,0 +1,93 @@
+"""
+Масштабирование по процессам: тот же поток апдейтов, что в bench_replay,
+через ShardRouter и настоящие процессы-шарды (bot.run_shard) с ботом без
+сети. Для каждого числа шардов — своя временная база.
+
+Время считается от первого апдейта до момента, когда все шарды разобрали
+очереди и остановились (включая фоновые очереди и запись журнала), то есть
+запуск процессов и загрузка состояния не входят.
+
+    python -m benchmarks.bench_sharding
+    python -m benchmarks.bench_sharding --shards 1 2 4 8 --scale 4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+from benchmarks import updates as streams
+from benchmarks._common import timer
+from benchmarks.fake_bot import make_fake_bot
+
+
+def offline_shard() -> None:
+    """Выполняется в каждом шарде перед запуском: меряем бота, а не лимиты Telegram."""
+    from services.action_executor import action_executor
+    from services.spam_classifier import spam_classifier
+
+    action_executor.set_global_rate(1e9)
+    action_executor.chat_rate = action_executor.chat_burst = 1e9
+    spam_classifier.path = os.environ["DB_PATH"] + ".spam_model.bin"
+
+
+async def run(shards: int, raw_updates: List[dict]) -> Dict[str, float]:
+    # Шард наследует окружение фронта в момент запуска процесса
+    tmp = tempfile.mkdtemp(prefix=f"shards{shards}-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["AI_BACKEND"] = "fake"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("TOKEN", "42:REPLAY-BENCHMARK-TOKEN")
+
+    from bot import run_shard
+    from services.sharding import ShardRouter
+
+    router = ShardRouter(None, shards, run_shard, args=(make_fake_bot, offline_shard))
+    try:
+        await router.start()
+        started = timer()
+        for raw in raw_updates:
+            while not router.submit_raw(raw):
+                await asyncio.sleep(0.001)
+        # Отдаём управление, чтобы последняя пачка ушла до замера
+        await asyncio.sleep(0)
+        fed = timer() - started
+        await router.stop()
+        elapsed = timer() - started
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    processed = sum(s["updates"] for s in router.shard_stats.values())
+    return {
+        "shards": shards,
+        "updates": processed,
+        "fed_s": round(fed, 3),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(processed / elapsed, 1),
+        "per_shard": [router.shard_stats[i]["updates"] for i in sorted(router.shard_stats)],
+        "synced": router.synced,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--scenarios", nargs="+", default=["chatter", "spam_wave"], choices=list(streams.SCENARIOS))
+    parser.add_argument("--scale", type=float, default=2.0)
+    args = parser.parse_args()
+
+    built = streams.build(args.scenarios, args.scale)
+    raw_updates = [update for stream in built.values() for update in stream]
+    print(f"{len(raw_updates)} updates, cpu: {os.cpu_count()}")
+
+    base = None
+    for shards in args.shards:
+        r = asyncio.run(run(shards, raw_updates))
+        base = base or r["updates_per_s"]
+        print(f"shards={shards:<3} {r['updates_per_s']:>9} upd/s  x{r['updates_per_s'] / base:.2f}  "
+              f"elapsed {r['elapsed_s']}s (fed {r['fed_s']}s)  per shard {r['per_shard']}, sync events {r['synced']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Общий бан-лист: проверка «забанен ли где-нибудь» на каждом сообщении.
+
+    проверка:  SQL по покрывающему индексу ix_chat_users_user_banned (синхронный
+               sqlite3 — нижняя граница, без aiosqlite и сессии) против set и
+               BanFilter (фильтр Блума + отсортированный array); в потоке 1%
+               забаненных, остальные — обычные пользователи
+    память:    байт на пользователя у set и у BanFilter
+    дополнение: новые баны по одному (множество + слияние в массив) против
+               пересборки всего фильтра
+
+    python -m benchmarks.bench_shared_bans --sizes 100000 1000000 --queries 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import tracemalloc
+
+from benchmarks._common import summarize, timer
+
+from services.shared_bans import BanFilter
+
+ID_RANGE = (10 ** 8, 8 * 10 ** 9)
+
+
+def sql_table(path: str, ids) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chat_users (id INTEGER PRIMARY KEY, user_id BIGINT, group_id INT, is_banned BOOLEAN)")
+    conn.execute("CREATE INDEX ix_chat_users_user_banned ON chat_users (user_id, is_banned)")
+    conn.executemany("INSERT INTO chat_users (user_id, group_id, is_banned) VALUES (?, 1, 1)", ((i,) for i in ids))
+    conn.commit()
+    return conn
+
+
+def _measure(check, probes):
+    times, hits = [], 0
+    for user_id in probes:
+        started = timer()
+        hits += bool(check(user_id))
+        times.append(timer() - started)
+    return summarize(times, unit=1e6), hits
+
+
+def bench_check(sizes, queries: int, sql_limit: int, seed: int = 13) -> None:
+    rng = random.Random(seed)
+    for size in sizes:
+        ids = rng.sample(range(*ID_RANGE), size)
+
+        tracemalloc.start()
+        as_set = set(ids)
+        set_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        started = timer()
+        ban_filter = BanFilter(ids)
+        build = timer() - started
+
+        probes = [rng.choice(ids) if rng.random() < 0.01 else rng.randrange(*ID_RANGE) for _ in range(queries)]
+        clean = [p for p in probes if p not in as_set]
+        positives = sum(ban_filter.might_contain(p) for p in clean)
+
+        line = (f"{size:>8} banned | build {build:.2f}s | set {set_bytes / size:.0f}B/user, "
+                f"filter {ban_filter.memory() / size:.0f}B/user | bloom false positives {positives / len(clean):.3%}")
+        checks = [("set", as_set.__contains__), ("filter", ban_filter.__contains__)]
+        conn = None
+        if size <= sql_limit:
+            fd, path = tempfile.mkstemp(suffix=".db")
+            os.close(fd)
+            conn = sql_table(path, ids)
+            query = "SELECT 1 FROM chat_users WHERE user_id = ? AND is_banned = 1 LIMIT 1"
+            checks.insert(0, ("sql", lambda user_id: conn.execute(query, (user_id,)).fetchone()))
+        print(line)
+        for name, check in checks:
+            s, hits = _measure(check, probes)
+            print(f"{'':>16} {name:<7} p50={s['p50_ms']}us p99={s['p99_ms']}us hits={hits}/{len(probes)}")
+        if conn is not None:
+            conn.close()
+            os.remove(path)
+
+
+def bench_add(base: int, adds: int, seed: int = 17) -> None:
+    rng = random.Random(seed)
+    ban_filter = BanFilter(rng.sample(range(*ID_RANGE), base))
+    new = [rng.randrange(*ID_RANGE) for _ in range(adds)]
+    started = timer()
+    for user_id in new:
+        ban_filter.add(user_id)
+    incremental = timer() - started
+    started = timer()
+    BanFilter(list(ban_filter._ids) + list(ban_filter._delta))
+    rebuild = timer() - started
+    print(f"дополнение: {adds} банов к {base} -> {incremental / adds * 1e6:.1f}us на бан "
+          f"(со слияниями); пересборка всего фильтра {rebuild:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--sql-limit", type=int, default=1_000_000, help="SQL — только на списках не больше")
+    parser.add_argument("--adds", type=int, default=50_000)
+    args = parser.parse_args()
+
+    bench_check(args.sizes, args.queries, args.sql_limit)
+    bench_add(max(args.sizes), args.adds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Локальный пред-классификатор на replay-корпусе.
+
+Первая половина корпуса — обучение (как если бы вердикты пришли от модели),
+вторая — проверка: точность/полнота уверенных решений, доля сообщений,
+которые всё равно уйдут в AI, время оценки и размер модели на диске.
+
+    python -m benchmarks.bench_spam_classifier --messages 10000
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks._common import summarize, timer
+from benchmarks.corpus import replay_corpus
+
+from services.spam_classifier import HAM, SPAM, SpamClassifier
+from services.text_analysis import analyze
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--spam-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    corpus = replay_corpus(args.messages, args.spam_ratio, seed=3)
+    half = len(corpus) // 2
+    model = SpamClassifier()
+    # Разбор текста делает мидлварь до классификатора — здесь он вне замеров
+    analyses = [analyze(sample.text) for sample in corpus]
+
+    started = timer()
+    for sample, analysis in zip(corpus[:half], analyses):
+        model.learn(analysis, sample.is_spam)
+    learn_time = timer() - started
+
+    tp = fp = fn = tn = escalated = 0
+    scores = []
+    for sample, analysis in zip(corpus[half:], analyses[half:]):
+        started = timer()
+        decision, _ = model.decide(analysis)
+        scores.append(timer() - started)
+        if decision == SPAM:
+            tp += sample.is_spam
+            fp += not sample.is_spam
+        elif decision == HAM:
+            fn += sample.is_spam
+            tn += not sample.is_spam
+        else:
+            escalated += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.bin")
+        model.save(path)
+        size = os.path.getsize(path)
+        reloaded = SpamClassifier.load(path)
+        assert reloaded.score(analyses[0]) == model.score(analyses[0])
+
+    decided = tp + fp + fn + tn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    latency = summarize(scores, unit=1e6)
+    print(f"train={half} test={len(corpus) - half} learn={learn_time / half * 1e6:.1f}us/msg")
+    print(f"decided locally={decided} escalated to AI={escalated} "
+          f"({escalated / (len(corpus) - half):.1%})")
+    print(f"precision={precision:.4f} recall={recall:.4f} tp={tp} fp={fp} fn={fn} tn={tn}")
+    print(f"score p50={latency['p50_ms']}us p99={latency['p99_ms']}us | model on disk={size / 1024:.0f}KiB")
+
+
+if __name__ == "__main__":
+    main()
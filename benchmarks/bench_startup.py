@@ -0,0 +1,144 @@
+"""
+Время старта бота: от запуска интерпретатора до готовности к поллингу и до
+момента, когда прогреты все фильтры. Каждый замер — в новом процессе (иначе
+модули уже импортированы), база — временная, бот — без сети.
+
+    готов к поллингу: import bot + load_state + setup_dispatcher + startup-хуки
+    фильтры прогреты: + warmup (словари pymorphy3, SDK модели)
+    eager:            оценка «как было» — прогрев каждого компонента до поллинга
+
+Плюс отчёт -X importtime: модули проекта и самые тяжёлые пакеты.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --backend gemini --top 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from benchmarks._common import ROOT, timer
+
+PROJECT = ("bot", "config", "database", "handlers", "middlewares", "services")
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+# ---------------------------
+# Дочерний процесс: один старт
+# ---------------------------
+async def _child_startup(started: float) -> Dict[str, float]:
+    import bot as app
+    from aiogram import Dispatcher
+    from benchmarks.fake_bot import make_fake_bot
+    from database.fsm_storage import fsm_storage
+    from database.models import dispose_engine
+    from services.warmup import warmup
+
+    phases = {"import_s": timer() - started}
+    await app.load_state()
+    phases["load_state_s"] = timer() - started
+    dp = app.setup_dispatcher(Dispatcher(storage=fsm_storage))
+    fake_bot = make_fake_bot()
+    await dp.emit_startup(bot=fake_bot, dispatcher=dp)
+    phases["ready_s"] = timer() - started
+    await warmup.wait()
+    phases["warm_s"] = timer() - started
+    phases.update({f"warm_{name}_s": d for name, d in warmup.durations.items()})
+    phases["warm_failed"] = [name for name, status in warmup.status.items() if status == "failed"]
+    await dp.emit_shutdown(bot=fake_bot, dispatcher=dp)
+    await dispose_engine()
+    return phases
+
+
+def child() -> None:
+    started = timer()
+    print(json.dumps(asyncio.run(_child_startup(started))))
+
+
+# ---------------------------
+# Родитель: повторы и отчёт
+# ---------------------------
+def _env(tmp: str, backend: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DB_PATH": os.path.join(tmp, "startup.db"),
+        "AI_BACKEND": backend,
+        "METRICS_PORT": "0",
+        "TOKEN": env.get("TOKEN", "42:REPLAY-BENCHMARK-TOKEN"),
+        "PYTHONPATH": ROOT,
+    })
+    return env
+
+
+def measure(repeat: int, backend: str) -> List[dict]:
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"], cwd=ROOT,
+                                 env=_env(tmp, backend), capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def import_report(backend: str, top: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"], cwd=ROOT,
+                             env=_env(tmp, backend), capture_output=True, text=True, check=True)
+    project, packages = [], {}
+    for line in out.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        own, cumulative, name = int(match[1]), int(match[2]), match[4]
+        root = name.split(".")[0]
+        if root in PROJECT:
+            project.append((cumulative, own, name))
+        else:
+            packages[root] = max(packages.get(root, 0), cumulative)
+
+    print("\n== import bot: модули проекта (cumulative / self, мс)")
+    for cumulative, own, name in sorted(project, reverse=True)[:top]:
+        print(f"   {name:<40} {cumulative / 1000:>8.1f} {own / 1000:>8.1f}")
+    print("\n== самые тяжёлые сторонние пакеты (cumulative, мс)")
+    for root, cumulative in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"   {root:<40} {cumulative / 1000:>8.1f}")
+    lazy = [m for m in ("pymorphy3", "google.genai") if re.search(rf"\| *{re.escape(m)}$", out.stderr, re.M)]
+    print(f"   импортированы при старте из ленивых: {lazy or 'нет'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini"])
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    runs = measure(args.repeat, args.backend)
+    median = {key: statistics.median(r[key] for r in runs) for key in runs[0] if key.endswith("_s")}
+    print(f"== старт, медиана из {args.repeat} (AI_BACKEND={args.backend})")
+    for key in ("import_s", "load_state_s", "ready_s", "warm_s"):
+        print(f"   {key:<24} {median[key]:.3f}s")
+    for key in sorted(k for k in median if k.startswith("warm_") and k != "warm_s"):
+        print(f"   {key:<24} {median[key]:.3f}s (фоном)")
+    # Раньше всё это грузилось до поллинга, последовательно
+    eager = median["ready_s"] + sum(v for k, v in median.items() if k.startswith("warm_") and k != "warm_s")
+    print(f"   поллинг начинается через {median['ready_s']:.3f}s вместо ~{eager:.3f}s при загрузке до поллинга")
+    if runs[0]["warm_failed"]:
+        print(f"   недоступны (деградация): {runs[0]['warm_failed']}")
+
+    import_report(args.backend, args.top)
+
+
+if __name__ == "__main__":
+    main()
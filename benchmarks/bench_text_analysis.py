@@ -0,0 +1,136 @@
+"""
+Общий разбор текста (services/text_analysis.py) против прежней схемы, где
+каждый фильтр сам резал строку: антифлуд — hash(text), бан-лист — lower().split(),
+кэш вердиктов — normalize() на get и put, классификатор — features() на
+decide и learn.
+
+    подготовка:  время на сообщение, старая схема vs один analyze()
+    обход:       доля обфусцированных сообщений (двойники букв, невидимые
+                 символы, эмодзи и пробелы между буквами, leetspeak, NFKC),
+                 в которых бан-лист находит слово, и доля вариантов одного
+                 текста, которые антифлуд считает повтором
+
+Морфология не участвует — сравнивается только работа со строкой.
+
+    python -m benchmarks.bench_text_analysis --messages 20000
+"""
+import argparse
+import hashlib
+import random
+import re
+
+from benchmarks._common import summarize, timer
+from benchmarks.corpus import replay_corpus
+
+from config import BANNED_WORDS
+from services.badword_matcher import AhoCorasick
+from services.text_analysis import analyze, fold
+
+_WORD_RE = re.compile(r"\w+")
+_LINK_RE = re.compile(r"https?://|t\.me/|www\.|@\w{4,}")
+
+HOMOGLYPHS = {"а": "a", "с": "c", "е": "e", "о": "o", "р": "p", "х": "x", "у": "y", "к": "k"}
+LEET = {"о": "0", "з": "3", "ч": "4", "а": "@"}
+INVISIBLE = ("\u200b", "\u200c", "\u2060", "\u00ad", "\ufeff")
+
+
+# ---------------------------
+# Как было: каждый фильтр сам по себе
+# ---------------------------
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def _features(text: str) -> list:
+    lowered = text.lower()
+    words = _WORD_RE.findall(lowered)
+    joined = f" {' '.join(words)} "
+    return [f"w:{w}" for w in words] + [joined[i:i + 3] for i in range(len(joined) - 2)] \
+        + (["meta:link"] if _LINK_RE.search(lowered) else [])
+
+
+def legacy(text: str) -> None:
+    hash(text)                                  # антифлуд
+    text.lower().split()                        # бан-лист
+    for _ in range(2):                          # кэш вердиктов: get и put
+        normalized = _normalize(text)
+        hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+        normalized.split()
+    _features(text)                             # классификатор: decide
+    _features(text)                             # ...и learn по вердикту модели
+
+
+def shared(text: str) -> None:
+    analysis = analyze(text)
+    hash(analysis.content_hash)
+    # Потребители только читают готовые поля
+    _ = f" {analysis.normalized} "
+
+
+# ---------------------------
+# Обфускация
+# ---------------------------
+def obfuscate(word: str, rng: random.Random) -> str:
+    kind = rng.randrange(6)
+    if kind == 0:
+        return "".join(HOMOGLYPHS.get(ch, ch) if rng.random() < 0.5 else ch for ch in word)
+    if kind == 1:
+        return rng.choice(INVISIBLE).join(word)
+    if kind == 2:
+        return rng.choice((" ", ".", "💥", "🔥", "-")).join(word)
+    if kind == 3:
+        return "".join(LEET.get(ch, ch) for ch in word)
+    if kind == 4:
+        # Полноширинные латинские двойники: ｐ, ｏ, ｃ
+        return "".join(chr(ord(HOMOGLYPHS[ch]) + 0xFEE0) if ch in HOMOGLYPHS else ch for ch in word)
+    return word.upper()
+
+
+def bypass(messages: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    matcher = AhoCorasick({fold(w) for w in BANNED_WORDS})
+    old_caught = new_caught = 0
+    for _ in range(messages):
+        word = obfuscate(rng.choice(BANNED_WORDS), rng)
+        text = f"Привет всем, {word} тут, заходите"
+        old_caught += matcher.search(" ".join(text.lower().split())) is not None
+        new_caught += matcher.search(analyze(text).normalized) is not None
+
+    # Вариации одного рекламного текста: сколько разных ключей у антифлуда
+    base = "Заработок от 5000 в день без вложений пиши в личку"
+    variants = []
+    for _ in range(messages):
+        words = base.split()
+        i = rng.randrange(len(words))
+        words[i] = obfuscate(words[i].lower(), rng)
+        variants.append(" ".join(words) + rng.choice(("", " 🔥", "!!", " 💰💰")))
+    return {
+        "old_caught": old_caught / messages,
+        "new_caught": new_caught / messages,
+        "old_keys": len({hash(v) for v in variants}),
+        "new_keys": len({analyze(v).content_hash for v in variants}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20_000)
+    args = parser.parse_args()
+
+    texts = [sample.text for sample in replay_corpus(args.messages, spam_ratio=0.3)]
+    for name, prepare in (("per-filter", legacy), ("shared", shared)):
+        times = []
+        for text in texts:
+            started = timer()
+            prepare(text)
+            times.append(timer() - started)
+        s = summarize(times, unit=1e6)
+        print(f"{name:<11} p50={s['p50_ms']}us p99={s['p99_ms']}us total={sum(times) * 1000:.1f}ms")
+
+    r = bypass(min(args.messages, 5_000))
+    print(f"бан-лист ловит обфусцированные слова: было {r['old_caught']:.1%}, стало {r['new_caught']:.1%}")
+    print(f"антифлуд: разных ключей у вариантов одного текста: было {r['old_keys']}, стало {r['new_keys']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Волна вступлений: каждый новый пользователь — три изменения статуса
+(новая строка, капча отправлена, капча пройдена).
+
+    inline:  как раньше — отдельная транзакция с коммитом на каждое изменение
+    journal: UserStateJournal — изменения в памяти, запись пачками
+
+Сравниваем пропускную способность, число коммитов и задержку event loop.
+
+    python -m benchmarks.bench_user_journal --users 5000 --producers 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from benchmarks._common import LoopLagMonitor, timer
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from config import SQLITE_PRAGMAS
+from database.models import Base, ChatUser
+from database.user_journal import UserStateJournal
+
+GROUPS = 50
+
+
+def make_engine(path: str, synchronous: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    pragmas = {**SQLITE_PRAGMAS, "synchronous": synchronous}
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
+# ---------------------------
+# До: коммит на каждое изменение
+# ---------------------------
+async def inline_user(factory, user_id: int, counters: dict):
+    group_id = user_id % GROUPS + 1
+    async with factory() as session:
+        db_user = ChatUser(user_id=user_id, group_id=group_id)
+        session.add(db_user)
+        await session.commit()
+        db_user.is_captcha_sent = True
+        await session.commit()
+    await asyncio.sleep(0)  # пользователь нажимает кнопку — отдельный апдейт
+    async with factory() as session:
+        db_user = await ChatUser.get(session, user_id, group_id)
+        db_user.is_verified = True
+        await session.commit()
+    counters["commits"] += 3
+
+
+# ---------------------------
+# После: журнал
+# ---------------------------
+async def journal_user(journal: UserStateJournal, user_id: int, counters: dict):
+    group_id = user_id % GROUPS + 1
+    journal.record(group_id, user_id)
+    journal.record(group_id, user_id, is_captcha_sent=True)
+    await asyncio.sleep(0)
+    journal.record(group_id, user_id, is_verified=True, is_captcha_sent=True)
+
+
+async def run(mode: str, path: str, users: int, producers: int, synchronous: str,
+              interval: float, batch: int) -> dict:
+    engine = make_engine(path, synchronous)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    journal = UserStateJournal(session_factory=factory, flush_interval=interval, max_pending=batch)
+    counters = {"commits": 0}
+
+    async def producer(offset: int):
+        for user_id in range(offset, users, producers):
+            if mode == "inline":
+                await inline_user(factory, user_id, counters)
+            else:
+                await journal_user(journal, user_id, counters)
+                if user_id % 50 == 0:
+                    await asyncio.sleep(0)
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    if mode == "journal":
+        await journal.start()
+    started = timer()
+    await asyncio.gather(*(producer(i) for i in range(producers)))
+    accepted = timer() - started
+    if mode == "journal":
+        await journal.stop()
+        counters["commits"] = journal.flushes
+    durable = timer() - started
+    await monitor.stop()
+
+    async with factory() as session:
+        verified = await session.scalar(select(func.count()).select_from(ChatUser).where(ChatUser.is_verified))
+    await engine.dispose()
+
+    report = monitor.report()
+    report.update(
+        accepted_s=round(accepted, 3),
+        durable_s=round(durable, 3),
+        mutations_per_s=round(users * 3 / accepted),
+        commits=counters["commits"],
+        verified=verified,
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--producers", type=int, default=50)
+    parser.add_argument("--synchronous", nargs="+", default=["FULL", "NORMAL"])
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    for synchronous in args.synchronous:
+        for mode in ("inline", "journal"):
+            with tempfile.TemporaryDirectory() as tmp:
+                report = asyncio.run(run(mode, os.path.join(tmp, "bench.db"), args.users, args.producers,
+                                         synchronous, args.interval, args.batch))
+            print(f"{synchronous:>6} {mode:>7} | {report['mutations_per_s']} mutations/s, "
+                  f"{report['commits']} commits, durable after {report['durable_s']}s | "
+                  f"loop lag p99={report['p99_ms']}ms max={report['max_ms']}ms | "
+                  f"verified={report['verified']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Стоимость проверки пользователя при миллионе записей в chat_users.
+
+    до:    username UNIQUE, две выборки (бан + строка), прагмы SQLite по умолчанию
+    после: UNIQUE (group_id, user_id), одна выборка, WAL/synchronous/mmap из config
+
+Плюс запись: отметка is_captcha_sent с коммитом на каждое изменение —
+там видна разница synchronous=FULL против NORMAL в режиме WAL.
+
+    python -m benchmarks.bench_user_lookup --users 1000000 --lookups 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+
+from benchmarks._common import summarize, timer
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.dialects import sqlite
+
+from config import SQLITE_PRAGMAS
+from database.models import ChatUser
+
+GROUPS = 500
+
+OLD_SCHEMA = """
+CREATE TABLE chat_users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR NOT NULL UNIQUE,
+    is_verified BOOLEAN, is_banned BOOLEAN, is_captcha_sent BOOLEAN, is_admin BOOLEAN,
+    group_id INTEGER
+)
+"""
+
+
+def new_schema() -> str:
+    table = ChatUser.__table__
+    dialect = sqlite.dialect()
+    ddl = [str(CreateTable(table).compile(dialect=dialect))]
+    ddl += [str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes]
+    return ";\n".join(ddl)
+
+
+def build(path: str, users: int, old: bool) -> float:
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA if old else new_schema())
+    started = timer()
+    if old:
+        rows = ((f"user_{i}", 1, 0, 1, 0, i % GROUPS + 1) for i in range(users))
+        conn.executemany(
+            "INSERT INTO chat_users (username, is_verified, is_banned, is_captcha_sent, is_admin, group_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows,
+        )
+    else:
+        rows = ((i, i % GROUPS + 1, 1, 0, 1, 0) for i in range(users))
+        conn.executemany(
+            "INSERT INTO chat_users (user_id, group_id, is_verified, is_banned, is_captcha_sent, is_admin) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows,
+        )
+    conn.commit()
+    conn.close()
+    return timer() - started
+
+
+def connect(path: str, tuned: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    if tuned:
+        for name, value in SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def lookups(conn: sqlite3.Connection, keys, old: bool) -> dict:
+    times = []
+    for user_id in keys:
+        group_id = user_id % GROUPS + 1
+        started = timer()
+        if old:
+            username = f"user_{user_id}"
+            conn.execute("SELECT id FROM chat_users WHERE username = ? AND is_banned = 1 LIMIT 1",
+                         (username,)).fetchone()
+            conn.execute("SELECT * FROM chat_users WHERE username = ?", (username,)).fetchone()
+        else:
+            conn.execute("SELECT * FROM chat_users WHERE group_id = ? AND user_id = ?",
+                         (group_id, user_id)).fetchone()
+        times.append(timer() - started)
+    return summarize(times)
+
+
+def writes(conn: sqlite3.Connection, keys, old: bool) -> dict:
+    times = []
+    for user_id in keys:
+        started = timer()
+        conn.execute("BEGIN")
+        if old:
+            conn.execute("UPDATE chat_users SET is_captcha_sent = 1 WHERE username = ?", (f"user_{user_id}",))
+        else:
+            conn.execute("UPDATE chat_users SET is_captcha_sent = 1 WHERE group_id = ? AND user_id = ?",
+                         (user_id % GROUPS + 1, user_id))
+        conn.execute("COMMIT")
+        times.append(timer() - started)
+    return summarize(times)
+
+
+async def orm_lookups(path: str, keys) -> dict:
+    """То, что реально делает AuthorizedMessageMiddleware: ChatUser.get через AsyncSession."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    times = []
+    async with factory() as session:
+        for user_id in keys:
+            started = timer()
+            await ChatUser.get(session, user_id, user_id % GROUPS + 1)
+            times.append(timer() - started)
+            session.expunge_all()
+    await engine.dispose()
+    return summarize(times)
+
+
+def fmt(stats: dict) -> str:
+    return f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--writes", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    # ~10% промахов: пользователь пишет впервые
+    keys = [rng.randrange(int(args.users * 1.1)) for _ in range(args.lookups)]
+    write_keys = [rng.randrange(args.users) for _ in range(args.writes)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, old in (("before", True), ("after", False)):
+            path = os.path.join(tmp, f"{label}.db")
+            load = build(path, args.users, old)
+            size = os.path.getsize(path) / 2 ** 20
+            conn = connect(path, tuned=not old)
+            read = lookups(conn, keys, old)
+            write = writes(conn, write_keys, old)
+            conn.close()
+            print(f"{label:>6} | {args.users} rows, {size:.0f} MB, load {load:.1f}s | "
+                  f"lookup {fmt(read)} | commit {fmt(write)}")
+            if not old:
+                orm = asyncio.run(orm_lookups(path, keys[: min(len(keys), 5000)]))
+                print(f"{'':>6} | ChatUser.get via AsyncSession {fmt(orm)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Кэш вердиктов на волне спама: сколько обращений к модели он экономит.
+
+Поток — обычная переписка вперемешку с вариациями нескольких рекламных
+шаблонов (см. benchmarks/corpus.py).
+
+    python -m benchmarks.bench_verdict_cache --messages 5000 --spam-ratio 0.3
+"""
+import argparse
+
+from benchmarks._common import summarize, timer
+from benchmarks.corpus import replay_corpus
+
+from services.text_analysis import analyze
+from services.verdict_cache import VerdictCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--spam-ratio", type=float, default=0.3)
+    args = parser.parse_args()
+
+    cache = VerdictCache()
+    model_calls = 0
+    wrong = 0
+    lookups = []
+
+    for sample in replay_corpus(args.messages, args.spam_ratio):
+        analysis = analyze(sample.text)
+        started = timer()
+        verdict = cache.get(analysis)
+        lookups.append(timer() - started)
+
+        if verdict is None:
+            # Промах: «спрашиваем модель» и запоминаем ответ
+            model_calls += 1
+            cache.put(analysis, sample.is_spam)
+        elif verdict != sample.is_spam:
+            wrong += 1
+
+    stats = cache.stats()
+    latency = summarize(lookups)
+    print(f"messages={args.messages} model_calls={model_calls} saved={stats['saved_calls']} "
+          f"(exact={stats['exact_hits']}, near={stats['near_hits']}) "
+          f"hit_ratio={stats['hit_ratio']} wrong={wrong}")
+    print(f"lookup p50={latency['p50_ms']}ms p99={latency['p99_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Нагрузочный тест webhook-режима: синтетические апдейты POST'ами в локальный
+сервер, задержка от отправки до хендлера (p50/p99) и проверка порядка
+апдейтов внутри чата.
+
+    python -m benchmarks.bench_webhook --updates 5000 --chats 200 --workers 16
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from benchmarks._common import summarize
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import ClientSession, web
+
+from services.webhook import UpdateWorkerPool, build_app
+
+PORT = 18081
+PATH = "/webhook"
+
+
+def make_update(update_id: int, chat_id: int, seq: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": seq,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"chat {chat_id}"},
+            "from": {"id": 1000 + update_id % 50, "is_bot": False, "first_name": "user"},
+            "text": f"{seq} {time.perf_counter()}",
+        },
+    }
+
+
+async def run(updates: int, chats: int, workers: int, work: float, concurrency: int) -> dict:
+    latencies = []
+    last_seq = defaultdict(int)
+    reordered = 0
+
+    dp = Dispatcher()
+
+    @dp.message()
+    async def handler(message: types.Message):
+        nonlocal reordered
+        seq, sent_at = message.text.split()
+        if int(seq) < last_seq[message.chat.id]:
+            reordered += 1
+        last_seq[message.chat.id] = int(seq)
+        await asyncio.sleep(work)  # имитация мидлварей и запросов к API
+        latencies.append(time.perf_counter() - float(sent_at))
+
+    bot = Bot(token="123456:TEST")
+    pool = UpdateWorkerPool(dp, bot, workers=workers, queue_size=updates)
+    runner = web.AppRunner(build_app(pool, PATH, secret=None))
+    await pool.start()
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    url = f"http://127.0.0.1:{PORT}{PATH}"
+    semaphore = asyncio.Semaphore(concurrency)
+    seq_by_chat = defaultdict(int)
+    chat_locks = defaultdict(asyncio.Lock)
+
+    async def post(session: ClientSession, update_id: int):
+        chat_id = -1000 - update_id % chats
+        async with semaphore:
+            # Внутри чата шлём строго по одному, как Telegram: порядок отправки = порядок номеров
+            async with chat_locks[chat_id]:
+                seq_by_chat[chat_id] += 1
+                payload = make_update(update_id, chat_id, seq_by_chat[chat_id])
+                async with session.post(url, json=payload) as response:
+                    assert response.status == 200
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(post(session, i) for i in range(1, updates + 1)))
+    await pool.stop()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    await bot.session.close()
+
+    report = summarize(latencies)
+    report.update(updates_per_s=round(updates / elapsed, 1), reordered=reordered)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5_000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--work", type=float, default=0.005, help="время обработки апдейта, с")
+    parser.add_argument("--concurrency", type=int, default=64, help="параллельных POST'ов")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    for workers in args.workers:
+        report = asyncio.run(run(args.updates, args.chats, workers, args.work, args.concurrency))
+        print(f"workers={workers:>3} | {report['updates_per_s']} upd/s | "
+              f"latency p50={report['p50_ms']}ms p99={report['p99_ms']}ms | "
+              f"reordered={report['reordered']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Синтетические потоки сообщений: обычная переписка, волны спама, рейды."""
+import random
+from typing import Iterator, List, NamedTuple
+
+# Реальный пример рекламы, который раньше был зашит в ai_filtering.py
+ZHKH_AD = """
+    🏠 Единый ЖКХ Бот — ваш официальный цифровой помощник по всем вопросам жилищно-коммунального хозяйства!
+    С ним вы сможете:
+    ✅ Передавать показания счётчиков за несколько секунд
+    💳 Просматривать и оплачивать счета онлайн
+    🔧 Оформлять заявки на ремонт и техническое обслуживание
+    📢 Получать актуальные новости и уведомления от управляющей компании
+    ✉️ Отправлять обращения, предложения и жалобы напрямую
+    📊 Отслеживать историю платежей и анализировать расходы
+
+    Все услуги ЖКХ — в одном удобном Telegram-боте!
+    🚀 Просто откройте Telegram и найдите ПОМОЩНИК ЖКХ
+"""
+
+SPAM_TEMPLATES = [
+    ZHKH_AD,
+    "🔥 Заработок от 5000₽ в день без вложений! Пиши в личку @{nick} 💰",
+    "Крипта растёт, успей купить! Подписывайся на канал t.me/{nick} 🚀",
+    "Скидка 70% только сегодня! Переходи по ссылке https://{nick}.shop 🎁",
+    "Ищем людей на удалёнку, 2 часа в день, доход от 3000 в день. Подробности в лс",
+]
+
+CHATTER = (
+    "привет всем как дела у кого есть конспект по матану завтра пара во сколько "
+    "кто идёт вечером на футбол скиньте расписание спасибо огромное да согласен "
+    "нет не видел сегодня очень холодно ребята кто знает где найти методичку "
+    "я опоздаю минут на десять ок договорились смешно вообще не понял вопрос "
+    "можно ссылку на видео с лекции отлично хорошо давай созвонимся после обеда"
+).split()
+
+
+class Sample(NamedTuple):
+    text: str
+    is_spam: bool
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    """Мелкие правки, которыми спамеры обходят точные совпадения."""
+    words = text.split()
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(words))
+        op = rng.random()
+        if op < 0.3:
+            words[i] = words[i].upper()
+        elif op < 0.6:
+            words.insert(i, rng.choice(("!!", "✅", "👉", "—")))
+        elif op < 0.8 and len(words) > 5:
+            words.pop(i)
+        else:
+            words[i] = words[i] + rng.choice(".!,")
+    return " ".join(words)
+
+
+def chatter(rng: random.Random) -> str:
+    return " ".join(rng.choices(CHATTER, k=rng.randint(2, 14)))
+
+
+def spam(rng: random.Random) -> str:
+    template = rng.choice(SPAM_TEMPLATES)
+    nick = "".join(rng.choice("abcdefghijklmnop") for _ in range(rng.randint(5, 9)))
+    return mutate(template.format(nick=nick), rng)
+
+
+def stream(size: int, spam_ratio: float = 0.1, seed: int = 1) -> Iterator[Sample]:
+    rng = random.Random(seed)
+    for _ in range(size):
+        if rng.random() < spam_ratio:
+            yield Sample(spam(rng), True)
+        else:
+            yield Sample(chatter(rng), False)
+
+
+def replay_corpus(size: int = 5_000, spam_ratio: float = 0.2, seed: int = 1) -> List[Sample]:
+    return list(stream(size, spam_ratio, seed))
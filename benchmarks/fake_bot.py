@@ -0,0 +1,69 @@
+"""Бот без сети: сессия aiogram, которая записывает вызовы API и отвечает правдоподобно."""
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    DeleteMessage, DeleteMessages, GetChatAdministrators, GetMe, SendMessage, TelegramMethod,
+)
+from aiogram.types import Chat, Message, User
+
+BOT_ID = 42
+BOT_TOKEN = f"{BOT_ID}:REPLAY-BENCHMARK-TOKEN"
+
+
+class RecordingSession(BaseSession):
+    """
+    Вместо HTTP — счётчик вызовов по имени метода и ответ нужного типа.
+    `latency` имитирует время ответа Telegram (по умолчанию мгновенно).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.deleted = 0
+        self._message_ids = itertools.count(1_000_000)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if isinstance(method, DeleteMessages):
+            self.deleted += len(method.message_ids)
+        elif isinstance(method, DeleteMessage):
+            self.deleted += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(bot, method)
+
+    def _result(self, bot: Bot, method: TelegramMethod[Any]) -> Any:
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(self._message_ids),
+                date=int(time.time()),
+                chat=Chat(id=method.chat_id, type="supergroup"),
+                from_user=User(id=BOT_ID, is_bot=True, first_name="replay"),
+                text=method.text,
+            ).as_(bot)
+        if isinstance(method, GetMe):
+            return User(id=BOT_ID, is_bot=True, first_name="replay", username="replay_bot")
+        if isinstance(method, GetChatAdministrators):
+            return []
+        return True
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.calls, deleted_messages=self.deleted)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+def make_fake_bot(latency: float = 0.0) -> Bot:
+    return Bot(token=BOT_TOKEN, session=RecordingSession(latency))
@@ -0,0 +1,162 @@
+"""
+Синтетические потоки апдейтов Telegram (сырые dict, как в getUpdates/webhook):
+обычная переписка, волна спама, рейд вступлений. Тот же формат читается
+из JSONL-записи реального трафика.
+"""
+import itertools
+import json
+import random
+from typing import Dict, Iterable, Iterator, List
+
+from benchmarks.corpus import chatter, spam
+from benchmarks.fake_bot import BOT_ID
+
+Update = Dict
+
+
+class UpdateFactory:
+    def __init__(self, seed: int = 1, start_time: int = 1_700_000_000):
+        self.rng = random.Random(seed)
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self.now = start_time
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    @staticmethod
+    def chat(chat_id: int) -> dict:
+        return {"id": chat_id, "type": "supergroup", "title": f"Replay chat {chat_id}"}
+
+    def _message(self, chat: dict, user_id: int, **fields) -> dict:
+        self.now += 1
+        return {
+            "message_id": next(self._message_ids),
+            "date": self.now,
+            "chat": chat,
+            "from": self.user(user_id),
+            **fields,
+        }
+
+    def message(self, chat_id: int, user_id: int, text: str) -> Update:
+        return {"update_id": next(self._update_ids), "message": self._message(self.chat(chat_id), user_id, text=text)}
+
+    def join(self, chat_id: int, user_ids: List[int]) -> Update:
+        members = [self.user(uid) for uid in user_ids]
+        return {
+            "update_id": next(self._update_ids),
+            "message": self._message(self.chat(chat_id), user_ids[0], new_chat_members=members),
+        }
+
+    def captcha_click(self, chat_id: int, user_id: int) -> Update:
+        prompt = self._message(self.chat(chat_id), BOT_ID, text="captcha")
+        prompt["from"] = {"id": BOT_ID, "is_bot": True, "first_name": "replay"}
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(self.rng.getrandbits(48)),
+                "from": self.user(user_id),
+                "chat_instance": str(chat_id),
+                "message": prompt,
+                "data": f"captcha_ok:{user_id}",
+            },
+        }
+
+    def admin_command(self, user_id: int) -> Update:
+        chat = {"id": user_id, "type": "private", "first_name": f"User{user_id}"}
+        return {"update_id": next(self._update_ids), "message": self._message(chat, user_id, text="/admin")}
+
+
+def _interleave(rng: random.Random, sequences: List[List[Update]]) -> List[Update]:
+    """Случайно перемешивает потоки, сохраняя порядок внутри каждого."""
+    pending = [list(reversed(s)) for s in sequences if s]
+    out = []
+    while pending:
+        i = rng.randrange(len(pending))
+        out.append(pending[i].pop())
+        if not pending[i]:
+            pending[i] = pending[-1]
+            pending.pop()
+    return out
+
+
+def _newcomer(f: UpdateFactory, chat_id: int, user_id: int, texts: Iterable[str]) -> List[Update]:
+    # Первое сообщение -> капча -> нажатие -> обычные сообщения
+    texts = list(texts)
+    seq = [f.message(chat_id, user_id, texts[0]), f.captcha_click(chat_id, user_id)]
+    seq += [f.message(chat_id, user_id, t) for t in texts[1:]]
+    return seq
+
+
+def chatter_stream(f: UpdateFactory, chats: int = 20, users: int = 400, messages: int = 10,
+                   chat_base: int = -1001_000_000) -> List[Update]:
+    rng = f.rng
+    sequences = []
+    for u in range(users):
+        user_id = 10_000 + u
+        chat_id = chat_base - u % chats
+        sequences.append(_newcomer(f, chat_id, user_id, (chatter(rng) for _ in range(messages))))
+    # Изредка кто-то открывает /admin в личке
+    sequences.append([f.admin_command(10_000 + u) for u in range(0, users, 50)])
+    return _interleave(rng, sequences)
+
+
+def spam_wave_stream(f: UpdateFactory, chats: int = 10, users: int = 300, messages: int = 10,
+                     spam_share: float = 0.3, chat_base: int = -1002_000_000) -> List[Update]:
+    rng = f.rng
+    sequences = []
+    for u in range(users):
+        user_id = 20_000 + u
+        chat_id = chat_base - u % chats
+        texts = [spam(rng) if rng.random() < spam_share else chatter(rng) for _ in range(messages)]
+        sequences.append(_newcomer(f, chat_id, user_id, texts))
+    return _interleave(rng, sequences)
+
+
+def join_raid_stream(f: UpdateFactory, raiders: int = 1_000, residents: int = 30, burst: int = 10,
+                     chat_id: int = -1003_000_000) -> List[Update]:
+    rng = f.rng
+    residents_seq = [
+        _newcomer(f, chat_id, 30_000 + u, (chatter(rng) for _ in range(8))) for u in range(residents)
+    ]
+    raid = []
+    ids = [40_000 + i for i in range(raiders)]
+    for i in range(0, raiders, burst):
+        group = ids[i:i + burst]
+        raid.append(f.join(chat_id, group))
+        raid += [f.message(chat_id, uid, spam(rng)) for uid in group]
+    # Сначала чат живёт обычной жизнью, потом налетает рейд, переписка продолжается поверх
+    calm = _interleave(rng, [seq[: len(seq) // 2] for seq in residents_seq])
+    busy = _interleave(rng, [raid] + [seq[len(seq) // 2:] for seq in residents_seq])
+    return calm + busy
+
+
+# Сценарий -> (генератор, параметр размера, его значение при scale=1)
+SCENARIOS = {
+    "chatter": (chatter_stream, "users", 400),
+    "spam_wave": (spam_wave_stream, "users", 300),
+    "join_raid": (join_raid_stream, "raiders", 1_000),
+}
+
+
+def build(names: Iterable[str], scale: float = 1.0, seed: int = 1) -> Dict[str, List[Update]]:
+    f = UpdateFactory(seed)
+    streams = {}
+    for name in names:
+        builder, size_param, size = SCENARIOS[name]
+        streams[name] = builder(f, **{size_param: max(10, int(size * scale))})
+    return streams
+
+
+def read_jsonl(path: str) -> Iterator[Update]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_jsonl(path: str, updates: Iterable[Update]) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        for update in updates:
+            fh.write(json.dumps(update, ensure_ascii=False) + "\n")
@@ -1,38 +1,172 @@
 import logging
 import asyncio
+from typing import Optional
 from aiogram import Bot, Dispatcher, F, types
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.filters import JOIN_TRANSITION, ChatMemberUpdatedFilter, KICKED
+from aiogram.types import Update
 
 
-from config import TOKEN
+from config import ACTIONS_GLOBAL_RATE, METRICS_PORT, RUN_MODE, SHARDS, TOKEN
+from database.cache import user_cache
+from database.fsm_storage import fsm_storage
+from database.models import Session, dispose_engine, get_engine, init_db
+from database.registry import group_registry
+from database.settings_cache import settings_cache
+from database.user_journal import user_journal
+from services.admin_roster import admin_roster
 from handlers.captcha import captcha_ok
 from handlers.admin_panel import router_admin
 from handlers.messages import handle_message
+from handlers.moderation import member_banned, member_joined
+from handlers.roster import bot_membership_updated, member_updated
 
 from middlewares.db_middleware import db_session_middleware
+from middlewares.flood_middleware import FloodGuardMiddleware
+from middlewares.text_analysis import TextAnalysisMiddleware
 from middlewares.message_middleware import AuthorizedMessageMiddleware
-from middlewares.bandword_middleware import CensorshipMiddleware
+from middlewares.bandword_middleware import CensorshipMiddleware, badword_index
 from middlewares.chat_id_middleware import GroupRegisterMiddleware
+from middlewares.ai_filtering import AIFilteringMiddleware, ai_pipeline
+from middlewares.link_filter import LinkFilterMiddleware
+from middlewares.media_filter import MediaFilterMiddleware
+from services.action_executor import action_executor
+from services.captcha_scheduler import captcha_scheduler
+from services.metrics import ApiMetricsMiddleware, instrument_dispatcher, metrics, watch_engine
+from services.metrics_server import metrics_server
+from services.shard_sync import shard_sync
+from services.sharding import ShardRouter, poll, serve_webhook
+from services.shared_bans import shared_bans
+from services.lemmatizer import lemmatizer
+from services.link_filter import link_filter
+from services.media_index import media_hasher, media_index
+from services.spam_classifier import spam_classifier
+from services.warmup import warmup
+from services.webhook import UpdateWorkerPool, run_webhook
 
 ## Можно не пихать объявление бота и диспатчера в функцию
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-dp = Dispatcher(storage=MemoryStorage())
+# FSM — в SQLite: диалоги админки переживают перезапуск и видны всем шардам
+dp = Dispatcher(storage=fsm_storage)
 
 
-async def main():
-    ## Добавил логирование
-    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+async def load_state():
+    """База и резидентные кэши — до того, как пойдут апдейты."""
+    await init_db()
+    await group_registry.load()
+    await settings_cache.load_all()
+    await admin_roster.load()
+    await fsm_storage.load()
+
+
+def setup_metrics():
+    """Гейджи очередей и кэшей, счётчик SQL-запросов."""
+    metrics.gauge("bot_action_queue_depth", action_executor.depth)
+    metrics.gauge("bot_ai_queue_depth", lambda: ai_pipeline.stats()["queue_depth"])
+    metrics.gauge("bot_journal_pending", lambda: len(user_journal))
+    metrics.gauge("bot_captcha_pending", lambda: len(captcha_scheduler))
+    metrics.gauge("bot_user_cache_size", lambda: len(user_cache))
+    metrics.gauge("bot_warmup_pending", warmup.pending)
+    metrics.gauge("bot_media_hash_cache_size", lambda: len(media_hasher))
+    metrics.gauge("bot_shared_ban_users", lambda: len(shared_bans))
+    watch_engine(get_engine())
+
+
+def setup_shard_sync():
+    """Что делать с изменениями, которые сделал и сохранил в базу другой шард."""
+
+    async def group_added(chat_id: int, group_id: int):
+        group_registry.add(chat_id, group_id)
+
+    async def settings_changed(group_id: int):
+        async with Session() as session:
+            await settings_cache.load(session, group_id)
+
+    async def badwords_changed(group_id: int):
+        badword_index.invalidate(group_id)
 
+    async def media_changed(group_id: int):
+        media_index.invalidate(group_id)
+
+    async def links_changed(group_id: int):
+        link_filter.invalidate(group_id)
+
+    async def bans_changed(user_id: Optional[int] = None, group_id: Optional[int] = None):
+        # Новый бан — в список; группа включила/выключила участие — перечитать её баны
+        if user_id is not None:
+            shared_bans.add(user_id)
+        else:
+            await shared_bans.refresh_group(group_id)
+
+    async def roster_changed(chat_id: int, group_id: int, title, admin_ids, updated_at: float):
+        group_registry.add(chat_id, group_id)
+        admin_roster.put(chat_id, title, admin_ids, updated_at)
+
+    shard_sync.subscribe("group", group_added)
+    shard_sync.subscribe("settings", settings_changed)
+    shard_sync.subscribe("badwords", badwords_changed)
+    shard_sync.subscribe("roster", roster_changed)
+    shard_sync.subscribe("media", media_changed)
+    shard_sync.subscribe("links", links_changed)
+    shard_sync.subscribe("bans", bans_changed)
+
+
+def setup_dispatcher(dp: Dispatcher, instrument: bool = True) -> Dispatcher:
+    """
+    Мидлвари, фоновые очереди и хендлеры. Используется и ботом, и benchmarks/replay.
+    instrument=False — без замеров (replay вешает свои).
+    """
     # --- Middleware ---
+    # Текст разбирается один раз, дальше все фильтры берут data["analysis"].
+    # Антифлуд сразу за ним: работает только с памятью и режет лишнее до сессии БД
+    dp.update.middleware(TextAnalysisMiddleware())
+    dp.update.middleware(FloodGuardMiddleware())
     dp.update.middleware(db_session_middleware)
     dp.update.middleware(GroupRegisterMiddleware())
     dp.message.middleware(CensorshipMiddleware())
     dp.message.middleware(AuthorizedMessageMiddleware())
+    # Ссылки — только словари в памяти, поэтому раньше медиа и AI
+    dp.message.middleware(LinkFilterMiddleware())
+    # Медиа — после проверки пользователя: сообщения неподтверждённых и так удаляются, качать их незачем
+    media_filter = MediaFilterMiddleware()
+    dp.message.middleware(media_filter)
+    dp.message.middleware(AIFilteringMiddleware())
+
+    # --- Тяжёлое грузится фоном: поллинг не ждёт словарей и SDK модели ---
+    warmup.add("morphology", lemmatizer.warm_up)
+    warmup.add("ai_backend", ai_pipeline.warm_up)
+    warmup.add("link_lists", link_filter.load_global)
+    warmup.add("shared_bans", shared_bans.load)
+    dp.startup.register(warmup.start)
+    dp.shutdown.register(warmup.stop)
+
+    # --- Фоновые очереди живут столько же, сколько поллинг ---
+    dp.startup.register(action_executor.start)
+    dp.startup.register(user_journal.start)
+    dp.startup.register(ai_pipeline.start)
+    dp.startup.register(captcha_scheduler.start)
+    dp.shutdown.register(captcha_scheduler.stop)
+    dp.shutdown.register(media_filter.stop)
+    dp.shutdown.register(ai_pipeline.stop)
+    dp.shutdown.register(action_executor.stop)
+    # Последним из очередей: капчи при остановке ещё дописывают сюда сбросы
+    dp.shutdown.register(user_journal.stop)
+    dp.shutdown.register(spam_classifier.stop)
+    dp.startup.register(metrics_server.start)
+    dp.shutdown.register(metrics_server.stop)
 
     # --- Callback-хендлеры ---
     dp.callback_query.register(captcha_ok, F.data.startswith("captcha_ok:"))
 
+    # --- Баны, выданные админами через Telegram ---
+    dp.chat_member.register(member_banned, ChatMemberUpdatedFilter(member_status_changed=KICKED))
+    # --- Вступления: общий бан-лист банит сразу, дальше апдейт идёт в учёт админов ---
+    dp.chat_member.register(member_joined, ChatMemberUpdatedFilter(member_status_changed=JOIN_TRANSITION))
+
+    # --- Кэш админов: повышения, понижения, добавление/удаление бота ---
+    dp.chat_member.register(member_updated)
+    dp.my_chat_member.register(bot_membership_updated)
+
     # --- Подключаем админский роутер полностью ---
     dp.include_router(router_admin)
 
@@ -40,7 +174,103 @@ async def main():
     ## ВО ВСЕХ ТВОИХ БЕДАХ ВИНОВАТА ЭТА СТРОЧКА
     dp.message.register(handle_message)
 
-    await dp.start_polling(bot)
+    # --- Замеры: оборачиваем уже зарегистрированное, поэтому в самом конце ---
+    if instrument:
+        instrument_dispatcher(dp)
+    return dp
+
+
+# ---------------------------
+# Шардированный режим (SHARDS > 1)
+# ---------------------------
+async def serve_shard(shard: int, shards: int, inbox, outbox, bot_factory=None, init=None):
+    """
+    Процесс-шард: своя копия всего бота, апдейты — из inbox от фронта.
+    Внутри шарда порядок в чате и параллельность между чатами — как у webhook.
+    """
+    shard_sync.attach(outbox, shard, shards)
+    shard_bot = bot_factory() if bot_factory is not None else bot
+
+    await load_state()
+    setup_metrics()
+    setup_shard_sync()
+    # Лимит Telegram общий на бота — каждому шарду своя доля
+    action_executor.set_global_rate(ACTIONS_GLOBAL_RATE / shards)
+    metrics_server.port = METRICS_PORT + shard if METRICS_PORT else 0
+    setup_dispatcher(dp)
+    shard_bot.session.middleware(ApiMetricsMiddleware())
+    if init is not None:
+        init()
+
+    pool = UpdateWorkerPool(dp, shard_bot)
+    await dp.emit_startup(bot=shard_bot, **dp.workflow_data)
+    await pool.start()
+    outbox.put(("ready", shard))
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            kind = message[0]
+            if kind == "updates":
+                for raw in message[1]:
+                    await pool.put(Update.model_validate(raw, context={"bot": shard_bot}))
+            elif kind == "sync":
+                await shard_sync.deliver(message[1], message[2])
+            elif kind == "stop":
+                break
+    finally:
+        await pool.stop()
+        await dp.emit_shutdown(bot=shard_bot, **dp.workflow_data)
+        await shard_bot.session.close()
+        await dispose_engine()
+        outbox.put(("stopped", shard, {"updates": pool.accepted, "failed": pool.failed,
+                                       "sync_received": shard_sync.received}))
+
+
+def run_shard(shard: int, shards: int, inbox, outbox, bot_factory=None, init=None):
+    """Точка входа процесса (multiprocessing, spawn)."""
+    logging.basicConfig(format=f'%(asctime)s - shard {shard} - %(name)s - %(levelname)s - %(message)s',
+                        level=logging.INFO)
+    asyncio.run(serve_shard(shard, shards, inbox, outbox, bot_factory, init))
+
+
+async def run_front(shards: int):
+    """Фронт: шарды и получение апдейтов. Диспетчер здесь только для списка типов апдейтов."""
+    allowed_updates = setup_dispatcher(Dispatcher(), instrument=False).resolve_used_update_types()
+
+    router = ShardRouter(bot, shards, run_shard)
+    await router.start()
+    try:
+        if RUN_MODE == "webhook":
+            await serve_webhook(bot, router, allowed_updates)
+        else:
+            await bot.delete_webhook()
+            await poll(bot, router, allowed_updates)
+    finally:
+        await router.stop()
+        await bot.session.close()
+
+
+async def main():
+    ## Добавил логирование
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    if SHARDS > 1:
+        await run_front(SHARDS)
+        return
+
+    await load_state()
+    setup_metrics()
+    setup_dispatcher(dp)
+    bot.session.middleware(ApiMetricsMiddleware())
+
+    # --- Получение апдейтов: long polling или webhook (RUN_MODE) ---
+    if RUN_MODE == "webhook":
+        await run_webhook(dp, bot)
+    else:
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
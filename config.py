@@ -8,9 +8,85 @@ TOKEN = os.getenv("TOKEN")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "database", "chat_users.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "database", "chat_users.db"))
 
 DB_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DB_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-CAPTCHA_TIMEOUT = 30
+# --- SQLite: выставляются на каждое соединение ---
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # читатели не ждут писателя
+    "synchronous": "NORMAL",        # в режиме WAL безопасно и без fsync на каждый коммит
+    "mmap_size": 256 * 1024 * 1024, # чтение страниц через mmap, без копирования в кэш
+    "cache_size": -16000,           # ~16 МБ страничного кэша
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,           # мс ожидания блокировки вместо мгновенной ошибки
+}
+
+CAPTCHA_TIMEOUT = 30                # секунд на нажатие кнопки капчи
+CAPTCHA_EXPIRE_ACTION = "kick"      # kick — выгнать (сможет зайти снова) | restrict — запретить писать
 BANNED_WORDS = ["реклама", "крипта", "бот", "подписывайся"]
+
+# --- AI-фильтрация ---
+AI_BACKEND = os.getenv("AI_BACKEND", "gemini")  # gemini | fake (офлайн, для тестов)
+GEMINI_MODEL = "gemini-2.5-flash"
+AI_BATCH_SIZE = 8          # сообщений в одном запросе к модели
+AI_BATCH_WINDOW = 0.3      # сколько секунд ждём, пока набирается пачка
+AI_MAX_IN_FLIGHT = 4       # одновременных запросов к модели
+AI_QUEUE_SIZE = 1000
+
+# --- Фильтр медиа: стикеры, фото, GIF ---
+BANNED_STICKER_EMOJI = ["🔞", "🍓"]   # стикеры с такими эмодзи удаляются во всех группах
+MEDIA_PHASH_DISTANCE = 8        # бит различия pHash, при котором картинка считается той же
+MEDIA_HASH_CACHE_SIZE = 50_000  # pHash скачанных файлов по file_unique_id
+MEDIA_DOWNLOADS = 4             # одновременных скачиваний миниатюр
+
+# --- Фильтр ссылок: списки доменов (поддомены наследуют вердикт) ---
+LINK_ALLOWLIST = ["telegram.org", "wikipedia.org", "youtube.com", "youtu.be", "github.com"]
+LINK_DENYLIST: list = []
+# Большой общий список запрещённых доменов: по домену в строке, формат hosts тоже подходит
+LINK_DENYLIST_PATH = os.getenv("LINK_DENYLIST_PATH")
+LINK_VERDICT_CACHE_SIZE = 100_000   # вердиктов (группа, домен) в памяти
+
+# --- Общий бан-лист групп (включается в настройках группы) ---
+SHARED_BAN_BITS_PER_USER = 16   # бит фильтра Блума на пользователя: ~0.2% ложных срабатываний
+SHARED_BAN_HASHES = 4           # хэш-функций фильтра Блума
+SHARED_BAN_MERGE = 4096         # новые баны копятся в множестве, потом вливаются в массив
+
+# --- Локальный пред-классификатор спама ---
+SPAM_MODEL_PATH = os.path.join(BASE_DIR, "database", "spam_model.bin")
+SPAM_HAM_THRESHOLD = 0.05   # ниже — точно не спам, в модель не отправляем
+SPAM_SPAM_THRESHOLD = 0.98  # выше — точно спам, удаляем без модели
+
+# --- Кэш админов групп для /admin ---
+ROSTER_TTL = 6 * 60 * 60    # через сколько секунд список админов считается устаревшим
+ROSTER_CONCURRENCY = 10     # одновременных запросов к API при обновлении
+
+# --- Режим получения апдейтов ---
+RUN_MODE = os.getenv("RUN_MODE", "polling")  # polling | webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")       # публичный https-адрес, на который шлёт Telegram
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+
+# --- Очередь действий модерации (удаления, капчи, баны) ---
+ACTIONS_GLOBAL_RATE = 25.0      # запросов к API в секунду на весь бот
+ACTIONS_CHAT_RATE = 0.5         # запросов в секунду в один чат...
+ACTIONS_CHAT_BURST = 5          # ...с таким запасом на всплеск
+ACTIONS_MAX_PENDING = 5000      # действий в очереди одного чата, лишние отбрасываются
+ACTIONS_MAX_ATTEMPTS = 5
+
+# --- Отложенная запись статусов пользователей ---
+USER_FLUSH_INTERVAL = 1.0   # секунд между записями накопленных изменений
+USER_FLUSH_BATCH = 500      # столько изменённых пользователей — пишем, не дожидаясь таймера
+
+# --- Метрики и профилировщик (только локально: не выставлять наружу) ---
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))  # 0 — не поднимать /metrics
+
+# --- Шардирование по процессам (1 — всё в одном процессе, как раньше) ---
+SHARDS = int(os.getenv("SHARDS", "1"))                    # процессов-обработчиков
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))  # пачек апдейтов в очереди одного шарда
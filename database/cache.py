@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+
+class UserStatus(NamedTuple):
+    is_banned: bool = False
+    is_verified: bool = False
+    is_captcha_sent: bool = False
+
+
+# ============================================================
+#               LRU + TTL КЭШ СТАТУСОВ ПОЛЬЗОВАТЕЛЕЙ
+# ============================================================
+class UserStatusCache:
+    """
+    Ограниченный кэш статуса пользователя по ключу (user_id, chat_id).
+
+    Самые старые записи вытесняются при переполнении (LRU), каждая запись
+    живёт не дольше `ttl` секунд — на случай правок базы в обход бота.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[int, int], Tuple[float, UserStatus]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, chat_id: int) -> Optional[UserStatus]:
+        key = (user_id, chat_id)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, status = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return status
+
+    def set(self, user_id: int, chat_id: int, status: UserStatus) -> None:
+        key = (user_id, chat_id)
+        self._data[key] = (time.monotonic() + self.ttl, status)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def update(self, user_id: int, chat_id: int, **fields) -> None:
+        """Меняет отдельные флаги; если записи нет — заводит её с дефолтами."""
+        key = (user_id, chat_id)
+        entry = self._data.get(key)
+        status = entry[1] if entry else UserStatus()
+        self.set(user_id, chat_id, status._replace(**fields))
+
+    def update_user(self, user_id: int, **fields) -> None:
+        """Меняет флаги пользователя во всех чатах, где он закэширован."""
+        for key in [k for k in self._data if k[0] == user_id]:
+            self.update(key[0], key[1], **fields)
+
+    def invalidate(self, user_id: int, chat_id: Optional[int] = None) -> None:
+        if chat_id is not None:
+            self._data.pop((user_id, chat_id), None)
+            return
+        for key in [k for k in self._data if k[0] == user_id]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+user_cache = UserStatusCache()
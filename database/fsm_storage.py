@@ -0,0 +1,78 @@
+import json
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from database.models import FSMRecord, Session
+
+
+# ============================================================
+#             FSM-ХРАНИЛИЩЕ AIOGRAM ПОВЕРХ SQLITE
+# ============================================================
+class SQLiteStorage(BaseStorage):
+    """
+    Состояния диалогов (AddBadWordState и т.п.) в таблице fsm_states:
+    переживают перезапуск и видны всем процессам-шардам.
+
+    FSMContextMiddleware спрашивает состояние на каждом апдейте, поэтому
+    чтение — из памяти: все строки загружаются при старте (их единицы —
+    только незаконченные диалоги), запись идёт в память и сразу в базу.
+    Ключ принадлежит одному чату, а чат — одному шарду, так что копии в
+    разных процессах не расходятся.
+    """
+
+    def __init__(self, session_factory=Session, key_builder: Optional[KeyBuilder] = None):
+        self.session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._records: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+
+    async def load(self) -> int:
+        async with self.session_factory() as session:
+            rows = (await session.scalars(select(FSMRecord))).all()
+        self._records = {row.key: (row.state, json.loads(row.data or "{}")) for row in rows}
+        return len(self._records)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        record_key = self.key_builder.build(key)
+        _, data = self._records.get(record_key, (None, {}))
+        await self._save(record_key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._records.get(self.key_builder.build(key), (None, {}))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record_key = self.key_builder.build(key)
+        state, _ = self._records.get(record_key, (None, {}))
+        await self._save(record_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(self._records.get(self.key_builder.build(key), (None, {}))[1])
+
+    async def close(self) -> None:
+        pass
+
+    async def _save(self, record_key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if self._records.get(record_key, (None, {})) == (state, data):
+            return
+
+        async with self.session_factory() as session:
+            # Пустая запись (state.clear()) — строку удаляем, таблица не растёт
+            if state is None and not data:
+                self._records.pop(record_key, None)
+                await session.execute(delete(FSMRecord).where(FSMRecord.key == record_key))
+            else:
+                self._records[record_key] = (state, data)
+                stmt = insert(FSMRecord).values(key=record_key, state=state, data=json.dumps(data, ensure_ascii=False))
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[FSMRecord.key],
+                    set_={"state": stmt.excluded.state, "data": stmt.excluded.data},
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+
+fsm_storage = SQLiteStorage()
@@ -0,0 +1,195 @@
+"""
+Миграции схемы. Номер версии хранится в самой базе (PRAGMA user_version):
+новая база сразу создаётся в актуальном виде, старая проходит недостающие
+шаги по порядку в одной транзакции: упал шаг — база остаётся прежней.
+
+Таблицы, которые только добавляются и ничего не меняют в существующих,
+по-прежнему создаёт create_all в конце — отдельный шаг им не нужен.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import Table, inspect
+from sqlalchemy.engine import Connection
+
+from database.models import Base, ChatUser, PendingCaptcha
+
+logger = logging.getLogger(__name__)
+
+# Строки старой chat_users, для которых не нашёлся user_id
+UNMIGRATED = "chat_users_unmigrated"
+
+
+def _rebuild(conn: Connection, table: Table) -> str:
+    """
+    SQLite не умеет менять ограничения через ALTER — переименовываем старую
+    таблицу, создаём новую по модели. Возвращает имя старой для копирования.
+    """
+    old = f"{table.name}_old"
+    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old}"')
+    # Индексы уезжают вместе с таблицей под теми же именами — освобождаем имена
+    for index in inspect(conn).get_indexes(old):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    table.create(conn)
+    return old
+
+
+def _user_id_from_key(username: str, known: Dict[str, int]) -> Optional[int]:
+    if username.startswith("id_") and username[3:].isdigit():
+        return int(username[3:])
+    return known.get(username)
+
+
+def _group_ids(conn: Connection, chat_ids) -> Dict[int, int]:
+    """
+    Старый chat_users.group_id — это Telegram chat_id, а не groups.id.
+    Отображение chat_id -> groups.id; чаты, которых нет в groups, регистрируются.
+    """
+    known = dict(conn.exec_driver_sql("SELECT chat_id, id FROM groups").all())
+    for chat_id in set(chat_ids) - set(known):
+        known[chat_id] = conn.exec_driver_sql(
+            "INSERT INTO groups (chat_id) VALUES (?) RETURNING id", (chat_id,)
+        ).scalar_one()
+    return known
+
+
+# ---------------------------
+# Шаги
+# ---------------------------
+def _chat_users_by_user_id(conn: Connection) -> None:
+    """chat_users: ключ username (глобально уникальный) -> (group_id, user_id)."""
+    columns = {c["name"] for c in inspect(conn).get_columns("chat_users")}
+    if "user_id" in columns:
+        return
+
+    # user_id пользователей с username восстанавливаем из ожидающих капч, где он записан
+    known: Dict[str, int] = {}
+    if inspect(conn).has_table("pending_captchas"):
+        known = dict(conn.exec_driver_sql("SELECT username, user_id FROM pending_captchas").all())
+
+    old = _rebuild(conn, ChatUser.__table__)
+    rows = conn.exec_driver_sql(
+        f'SELECT id, username, group_id, is_verified, is_banned, is_captcha_sent, is_admin FROM "{old}"'
+    ).all()
+
+    group_ids = _group_ids(conn, (row[2] for row in rows if row[2] is not None))
+    migrated, moved, lost = {}, [], []
+    for row in rows:
+        row_id, username, chat_id, is_verified, is_banned, is_captcha_sent, is_admin = row
+        user_id = _user_id_from_key(username, known)
+        if user_id is None or chat_id is None:
+            lost.append(row)
+            continue
+        group_id = group_ids[chat_id]
+        moved.append((row_id,))
+        migrated[(group_id, user_id)] = {
+            "user_id": user_id,
+            "group_id": group_id,
+            "username": None if username.startswith("id_") else username,
+            "is_verified": bool(is_verified),
+            "is_banned": bool(is_banned),
+            "is_captcha_sent": bool(is_captcha_sent),
+            "is_admin": bool(is_admin),
+        }
+    if migrated:
+        conn.execute(ChatUser.__table__.insert(), list(migrated.values()))
+
+    if lost:
+        # Без user_id строку в новую таблицу не положить — старые строки остаются как были,
+        # чтобы баны и подтверждения можно было восстановить руками
+        conn.exec_driver_sql(f'ALTER TABLE "{old}" RENAME TO "{UNMIGRATED}"')
+        if moved:
+            conn.exec_driver_sql(f'DELETE FROM "{UNMIGRATED}" WHERE id = ?', moved)
+        banned = [row[1] for row in lost if row[4]]
+        logger.warning(
+            "chat_users: %s записей без user_id (в т.ч. %s банов: %s) сохранены в %s",
+            len(lost), len(banned), ", ".join(banned[:20]), UNMIGRATED,
+        )
+    else:
+        conn.exec_driver_sql(f'DROP TABLE "{old}"')
+    logger.info("chat_users: перенесено %s из %s записей", len(migrated), len(rows))
+
+
+def _pending_captchas_by_user_id(conn: Connection) -> None:
+    """pending_captchas: уникальность (chat_id, username) -> (chat_id, user_id)."""
+    if not inspect(conn).has_table("pending_captchas"):
+        return
+    columns = {c["name"] for c in inspect(conn).get_columns("pending_captchas")}
+    if "username" not in columns:
+        return
+
+    old = _rebuild(conn, PendingCaptcha.__table__)
+    # При дублях по user_id остаётся самая поздняя капча
+    conn.exec_driver_sql(
+        f'INSERT OR REPLACE INTO pending_captchas (group_id, chat_id, user_id, message_id, expires_at) '
+        f'SELECT group_id, chat_id, user_id, message_id, expires_at FROM "{old}" ORDER BY expires_at'
+    )
+    conn.exec_driver_sql(f'DROP TABLE "{old}"')
+
+
+def _group_settings_link_policy(conn: Connection) -> None:
+    """group_settings: новая колонка link_policy (политика ссылок группы)."""
+    if not inspect(conn).has_table("group_settings"):
+        return
+    columns = {c["name"] for c in inspect(conn).get_columns("group_settings")}
+    if "link_policy" not in columns:
+        conn.exec_driver_sql("ALTER TABLE group_settings ADD COLUMN link_policy VARCHAR NOT NULL DEFAULT 'deny'")
+
+
+def _group_settings_share_bans(conn: Connection) -> None:
+    """group_settings: новая колонка share_bans (участие в общем бан-листе)."""
+    if not inspect(conn).has_table("group_settings"):
+        return
+    columns = {c["name"] for c in inspect(conn).get_columns("group_settings")}
+    if "share_bans" not in columns:
+        conn.exec_driver_sql("ALTER TABLE group_settings ADD COLUMN share_bans BOOLEAN NOT NULL DEFAULT 0")
+
+
+def _chat_users_banned_by_admin(conn: Connection) -> None:
+    """chat_users: новая колонка banned_by_admin (кто выдал бан)."""
+    columns = {c["name"] for c in inspect(conn).get_columns("chat_users")}
+    if "banned_by_admin" not in columns:
+        # Источник старых банов неизвестен (среди них и кики по капче) — в общий список они не идут
+        conn.exec_driver_sql("ALTER TABLE chat_users ADD COLUMN banned_by_admin BOOLEAN DEFAULT 0")
+
+
+# Порядок не менять: номер шага = его индекс + 1 = версия схемы после него
+MIGRATIONS: List = [
+    _chat_users_by_user_id,
+    _pending_captchas_by_user_id,
+    _group_settings_link_policy,
+    _group_settings_share_bans,
+    _chat_users_banned_by_admin,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _begin(conn: Connection) -> None:
+    """
+    engine.begin() в sqlite3 не открывает транзакцию до первого INSERT/UPDATE:
+    ALTER/CREATE/DROP до него ушли бы в autocommit. Открываем её явно.
+    """
+    if not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN")
+
+
+def migrate(conn: Connection) -> int:
+    """Доводит схему до SCHEMA_VERSION. Вызывается внутри транзакции (engine.begin)."""
+    _begin(conn)
+    version = schema_version(conn)
+
+    if not inspect(conn).has_table("chat_users"):
+        # Пустая база — создаём сразу актуальную схему, шаги не нужны
+        version = SCHEMA_VERSION
+
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info("Миграция схемы %s: %s", number, step.__doc__)
+        step(conn)
+
+    Base.metadata.create_all(conn)
+    conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return SCHEMA_VERSION
@@ -1,10 +1,12 @@
-import os
+from typing import Optional
+
 from sqlalchemy import (
-    Column, create_engine, Boolean, BigInteger,
-    ForeignKey, Integer, String
+    Column, Boolean, BigInteger, Float,
+    ForeignKey, Index, Integer, JSON, String, Text, UniqueConstraint, event, select
 )
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from config import DB_PATH, DB_URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, relationship
+from config import ASYNC_DB_URL, SQLITE_PRAGMAS
 
 Base = declarative_base()
 
@@ -35,6 +37,28 @@ class Group(Base):
         back_populates="group",
         cascade="all, delete-orphan"
     )
+    flood_settings = relationship(
+        "FloodSettings",
+        back_populates="group",
+        uselist=False,
+        cascade="all, delete-orphan"
+    )
+    roster = relationship(
+        "GroupRoster",
+        back_populates="group",
+        uselist=False,
+        cascade="all, delete-orphan"
+    )
+    banned_media = relationship(
+        "BannedMedia",
+        back_populates="group",
+        cascade="all, delete-orphan"
+    )
+    link_rules = relationship(
+        "LinkRule",
+        back_populates="group",
+        cascade="all, delete-orphan"
+    )
 
 
 # ============================================================
@@ -53,37 +77,84 @@ class BadWord(Base):
         return f"<BadWord(group_id={self.group_id}, word='{self.word}')>"
 
 
+# ============================================================
+#                   BANNED MEDIA MODEL
+# ============================================================
+class BannedMedia(Base):
+    """
+    Запрещённое медиа группы: конкретный файл (по file_unique_id, плюс его
+    pHash для почти-дубликатов) или целый набор стикеров (kind="set").
+    """
+
+    __tablename__ = "banned_media"
+    __table_args__ = (
+        Index("ix_banned_media_group", "group_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String, nullable=False)               # sticker | photo | animation | set
+    file_unique_id = Column(String, nullable=True)
+    set_name = Column(String, nullable=True)            # набор стикера (для kind="set" — ключ)
+    phash = Column(BigInteger, nullable=True)           # 64 бита со знаком: SQLite хранит int64
+
+    group = relationship("Group", back_populates="banned_media")
+
+    def __repr__(self):
+        return f"<BannedMedia(group_id={self.group_id}, kind='{self.kind}', file='{self.file_unique_id}')>"
+
+
 # ============================================================
 #                     CHAT USER MODEL
 # ============================================================
 class ChatUser(Base):
+    """Статус пользователя в конкретной группе: ключ — Telegram user_id + Group.id."""
+
     __tablename__ = "chat_users"
+    __table_args__ = (
+        # Точечный поиск (group_id, user_id): один спуск по B-дереву вместо строки username
+        UniqueConstraint("group_id", "user_id", name="uq_chat_users_group_user"),
+        # Баны пользователя во всех группах — покрывающий, таблицу не читает
+        Index("ix_chat_users_user_banned", "user_id", "is_banned"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String, unique=True, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    username = Column(String, nullable=True)  # только для отображения, может меняться
 
     is_verified = Column(Boolean, default=False)
     is_banned = Column(Boolean, default=False)
     is_captcha_sent = Column(Boolean, default=False)
     is_admin = Column(Boolean, default=False)
+    # Бан выдал админ, а не бот (общий бан-лист): в общий список идут только такие
+    banned_by_admin = Column(Boolean, default=False)
 
-    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
     group = relationship("Group", back_populates="users")
 
     @staticmethod
-    def is_user_banned(session, username: str) -> bool:
-        return session.query(ChatUser).filter_by(username=username, is_banned=True).first() is not None
+    async def get(session: AsyncSession, user_id: int, group_id: int) -> Optional["ChatUser"]:
+        return await session.scalar(select(ChatUser).filter_by(group_id=group_id, user_id=user_id))
+
+    @staticmethod
+    async def _exists(session: AsyncSession, **criteria) -> bool:
+        result = await session.execute(select(ChatUser.id).filter_by(**criteria).limit(1))
+        return result.first() is not None
+
+    @staticmethod
+    async def is_user_banned(session: AsyncSession, user_id: int, group_id: int) -> bool:
+        return await ChatUser._exists(session, group_id=group_id, user_id=user_id, is_banned=True)
 
     @staticmethod
-    def is_user_verified(session, username: str) -> bool:
-        return session.query(ChatUser).filter_by(username=username, is_verified=True).first() is not None
+    async def is_user_verified(session: AsyncSession, user_id: int, group_id: int) -> bool:
+        return await ChatUser._exists(session, group_id=group_id, user_id=user_id, is_verified=True)
 
     @staticmethod
-    def is_user_admin(session, username: str) -> bool:
-        return session.query(ChatUser).filter_by(username=username, is_admin=True).first() is not None
+    async def is_user_admin(session: AsyncSession, user_id: int, group_id: int) -> bool:
+        return await ChatUser._exists(session, group_id=group_id, user_id=user_id, is_admin=True)
 
     def __repr__(self):
-        return f'<ChatUser(username="{self.username}", admin={self.is_admin})>'
+        return f'<ChatUser(user_id={self.user_id}, group_id={self.group_id}, admin={self.is_admin})>'
 
 
 # ============================================================
@@ -98,6 +169,8 @@ class GroupSettings(Base):
     filter_badwords = Column(Boolean, default=True)
     welcome_enabled = Column(Boolean, default=True)
     ai_filtering = Column(Boolean, default=True)
+    link_policy = Column(String, nullable=False, default="deny")   # off | deny | strict
+    share_bans = Column(Boolean, nullable=False, default=False)    # общий бан-лист групп
 
     group = relationship("Group", back_populates="settings")
 
@@ -105,12 +178,153 @@ class GroupSettings(Base):
         return f"<GroupSettings(group_id={self.group_id})>"
 
 
+# ============================================================
+#                 LINK RULE MODEL (домены группы)
+# ============================================================
+class LinkRule(Base):
+    """Домен в списке группы: action="deny" — запрещён, "allow" — разрешён (вместе с поддоменами)."""
+
+    __tablename__ = "link_rules"
+    __table_args__ = (
+        UniqueConstraint("group_id", "domain", name="uq_link_rules_group_domain"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False)
+    domain = Column(String, nullable=False)
+    action = Column(String, nullable=False, default="deny")
+
+    group = relationship("Group", back_populates="link_rules")
+
+    def __repr__(self):
+        return f"<LinkRule(group_id={self.group_id}, domain='{self.domain}', action='{self.action}')>"
+
+
+# ============================================================
+#                FLOOD SETTINGS MODEL (пороги антифлуда)
+# ============================================================
+class FloodSettings(Base):
+    __tablename__ = "flood_settings"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), unique=True, nullable=False)
+
+    preset = Column(String, default="normal")
+    window_seconds = Column(Float, default=10.0)
+    chat_messages = Column(Integer, default=40)      # сообщений в чате за окно
+    user_messages = Column(Integer, default=8)       # сообщений одного пользователя за окно
+    duplicates = Column(Integer, default=3)          # одинаковых текстов за join_window
+    joins = Column(Integer, default=20)              # вступлений за join_window
+    join_window_seconds = Column(Float, default=60.0)
+    lockdown_seconds = Column(Float, default=300.0)
+
+    group = relationship("Group", back_populates="flood_settings")
+
+    def __repr__(self):
+        return f"<FloodSettings(group_id={self.group_id}, preset={self.preset})>"
+
+
+# ============================================================
+#                 GROUP ROSTER MODEL (админы + название)
+# ============================================================
+class GroupRoster(Base):
+    __tablename__ = "group_rosters"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), unique=True, nullable=False)
+
+    title = Column(String, nullable=True)
+    admin_ids = Column(JSON, nullable=False, default=list)
+    updated_at = Column(Float, nullable=False, default=0.0)
+
+    group = relationship("Group", back_populates="roster")
+
+    def __repr__(self):
+        return f"<GroupRoster(group_id={self.group_id}, admins={len(self.admin_ids or [])})>"
+
+
+# ============================================================
+#              PENDING CAPTCHA MODEL (ждут нажатия)
+# ============================================================
+class PendingCaptcha(Base):
+    __tablename__ = "pending_captchas"
+    __table_args__ = (UniqueConstraint("chat_id", "user_id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=True)
+
+    chat_id = Column(BigInteger, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    message_id = Column(BigInteger, nullable=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<PendingCaptcha(chat_id={self.chat_id}, user_id={self.user_id})>'
+
+
+# ============================================================
+#            FSM STATE MODEL (диалоги админ-панели)
+# ============================================================
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key = Column(String, primary_key=True)          # DefaultKeyBuilder: fsm:<chat>:<user>:<destiny>
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=False, default="{}")   # JSON
+
+    def __repr__(self):
+        return f"<FSMRecord(key={self.key}, state={self.state})>"
+
+
 # ============================================================
 #                        ENGINE + SESSION
 # ============================================================
-engine = create_engine(DB_URL, echo=False)
-Session = sessionmaker(bind=engine)
+_engine: Optional[AsyncEngine] = None
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Асинхронный движок: SQLite I/O уходит в поток aiosqlite и не блокирует event loop.
+    Создаётся при первом обращении, а не при импорте моделей.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(ASYNC_DB_URL, echo=False)
+        event.listen(_engine.sync_engine, "connect", _sqlite_pragmas)
+    return _engine
+
+
+async def dispose_engine() -> None:
+    """Закрывает соединения пула (остановка бота, конец бенчмарка)."""
+    if _engine is not None:
+        await _engine.dispose()
+
+
+class LazySessionMaker(async_sessionmaker):
+    """async_sessionmaker, который привязывается к движку при первой сессии."""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+Session = LazySessionMaker(expire_on_commit=False)
+
+
+def _sqlite_pragmas(dbapi_connection, _record):
+    """WAL, synchronous и mmap — на каждое новое соединение (journal_mode WAL сохраняется в файле)."""
+    if not ASYNC_DB_URL.startswith("sqlite"):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+async def init_db():
+    """Приводит схему к текущей версии (см. database/migrations.py). Вызывается один раз при старте."""
+    from database.migrations import migrate
 
-# Create tables only if DB does not exist
-if not os.path.exists(DB_PATH):
-    Base.metadata.create_all(engine)
+    async with get_engine().begin() as conn:
+        await conn.run_sync(migrate)
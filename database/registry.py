@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Group, Session
+from services.shard_sync import shard_sync
+
+
+# ============================================================
+#                 РЕЕСТР ИЗВЕСТНЫХ ГРУПП
+# ============================================================
+class GroupRegistry:
+    """
+    Резидентное отображение Telegram chat_id -> внутренний Group.id.
+
+    Загружается один раз при старте; в базу ходим только за чатами,
+    которых ещё не видели.
+    """
+
+    def __init__(self):
+        self._ids: Dict[int, int] = {}
+        self._chats: Dict[int, int] = {}
+
+    async def load(self, session_factory=Session) -> int:
+        async with session_factory() as session:
+            rows = (await session.execute(select(Group.chat_id, Group.id))).all()
+        self._ids = {chat_id: group_id for chat_id, group_id in rows}
+        self._chats = {group_id: chat_id for chat_id, group_id in rows}
+        return len(self._ids)
+
+    def get(self, chat_id: int) -> Optional[int]:
+        return self._ids.get(chat_id)
+
+    async def ensure(self, session: AsyncSession, chat_id: int) -> int:
+        """Возвращает Group.id, при необходимости регистрируя чат одним upsert'ом."""
+        group_id = self._ids.get(chat_id)
+        if group_id is not None:
+            return group_id
+
+        stmt = insert(Group).values(chat_id=chat_id)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Group.chat_id],
+            set_={"chat_id": stmt.excluded.chat_id},
+        ).returning(Group.id)
+        group_id = (await session.execute(stmt)).scalar_one()
+        await session.commit()
+
+        self._ids[chat_id] = group_id
+        self._chats[group_id] = chat_id
+        shard_sync.publish("group", chat_id=chat_id, group_id=group_id)
+        return group_id
+
+    def add(self, chat_id: int, group_id: int) -> None:
+        """Чат, зарегистрированный другим шардом."""
+        self._ids[chat_id] = group_id
+        self._chats[group_id] = chat_id
+
+    def chat_id(self, group_id: int) -> Optional[int]:
+        """Обратное отображение: Group.id -> Telegram chat_id."""
+        return self._chats.get(group_id)
+
+    def items(self) -> List[Tuple[int, int]]:
+        """Пары (Group.id, chat_id) всех известных групп."""
+        return [(group_id, chat_id) for chat_id, group_id in self._ids.items()]
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+group_registry = GroupRegistry()
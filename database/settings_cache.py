@@ -0,0 +1,113 @@
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import FloodSettings, GroupSettings, Session
+
+
+class FloodThresholds(NamedTuple):
+    preset: str = "normal"
+    window_seconds: float = 10.0
+    chat_messages: int = 40
+    user_messages: int = 8
+    duplicates: int = 3
+    joins: int = 20
+    join_window_seconds: float = 60.0
+    lockdown_seconds: float = 300.0
+
+    @classmethod
+    def from_model(cls, flood: FloodSettings) -> "FloodThresholds":
+        return cls(**{field: getattr(flood, field) for field in cls._fields})
+
+
+# Политики ссылок: off — не проверять, deny — удалять запрещённые домены,
+# strict — удалять все ссылки, кроме разрешённых доменов
+LINK_POLICIES = ("off", "deny", "strict")
+
+FLOOD_PRESETS = {
+    "relaxed": FloodThresholds("relaxed", 10.0, 80, 12, 5, 40, 60.0, 120.0),
+    "normal": FloodThresholds(),
+    "strict": FloodThresholds("strict", 10.0, 20, 5, 2, 10, 60.0, 600.0),
+}
+
+
+class Settings(NamedTuple):
+    filter_badwords: bool = True
+    welcome_enabled: bool = True
+    ai_filtering: bool = True
+    flood: FloodThresholds = FloodThresholds()
+    link_policy: str = "deny"
+    share_bans: bool = False
+
+    @classmethod
+    def from_model(cls, settings: Optional[GroupSettings],
+                   flood: Optional[FloodSettings] = None) -> "Settings":
+        base = cls() if settings is None else cls(
+            filter_badwords=settings.filter_badwords,
+            welcome_enabled=settings.welcome_enabled,
+            ai_filtering=settings.ai_filtering,
+            link_policy=settings.link_policy or "deny",
+            share_bans=bool(settings.share_bans),
+        )
+        if flood is not None:
+            base = base._replace(flood=FloodThresholds.from_model(flood))
+        return base
+
+
+DEFAULT_SETTINGS = Settings()
+
+
+# ============================================================
+#                КЭШ НАСТРОЕК ГРУПП
+# ============================================================
+class GroupSettingsCache:
+    """
+    Настройки групп в памяти: Group.id -> Settings.
+
+    Загружаются один раз (все при старте, новые — при первом сообщении),
+    админ-панель обновляет запись сразу после коммита.
+    """
+
+    def __init__(self):
+        self._settings: Dict[int, Settings] = {}
+
+    async def load_all(self, session_factory=Session) -> int:
+        async with session_factory() as session:
+            rows = (await session.scalars(select(GroupSettings))).all()
+            floods = {row.group_id: row for row in (await session.scalars(select(FloodSettings))).all()}
+        self._settings = {
+            row.group_id: Settings.from_model(row, floods.pop(row.group_id, None)) for row in rows
+        }
+        for group_id, flood in floods.items():
+            self._settings[group_id] = Settings.from_model(None, flood)
+        return len(self._settings)
+
+    def get(self, group_id: int) -> Optional[Settings]:
+        return self._settings.get(group_id)
+
+    async def load(self, session: AsyncSession, group_id: int) -> Settings:
+        row = await session.scalar(select(GroupSettings).filter_by(group_id=group_id))
+        flood = await session.scalar(select(FloodSettings).filter_by(group_id=group_id))
+        # Нет строки настроек — действуют значения по умолчанию
+        settings = Settings.from_model(row, flood)
+        self._settings[group_id] = settings
+        return settings
+
+    def set(self, group_id: int, settings: Settings) -> None:
+        self._settings[group_id] = settings
+
+    def update(self, group_id: int, **fields) -> Settings:
+        """Меняет отдельные поля, остальное остаётся как было."""
+        settings = self._settings.get(group_id, DEFAULT_SETTINGS)._replace(**fields)
+        self._settings[group_id] = settings
+        return settings
+
+    def invalidate(self, group_id: Optional[int] = None) -> None:
+        if group_id is None:
+            self._settings.clear()
+        else:
+            self._settings.pop(group_id, None)
+
+
+settings_cache = GroupSettingsCache()
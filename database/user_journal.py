@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from config import USER_FLUSH_BATCH, USER_FLUSH_INTERVAL
+from database.cache import UserStatus
+from database.models import ChatUser, Session
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, int]  # (group_id, user_id)
+
+# ============================================================
+#          ОТЛОЖЕННАЯ ЗАПИСЬ СТАТУСОВ (WRITE-BEHIND)
+# ============================================================
+class UserStateJournal:
+    """
+    Изменения статусов пользователей (новая запись, капча отправлена,
+    пройдена, бан) копятся в памяти и уходят в базу пачкой — одной
+    транзакцией раз в `flush_interval` секунд или при `max_pending`
+    изменённых пользователях. Несколько изменений одного пользователя
+    до записи сливаются в одну строку.
+
+    Пока изменение не записано, его видно через view(): читающие сначала
+    берут строку из базы, затем накладывают поверх ожидающие поля — и те,
+    что уже ушли в базу, но транзакция ещё не закоммичена (`_inflight`).
+    """
+
+    def __init__(self, session_factory=Session, flush_interval: float = USER_FLUSH_INTERVAL,
+                 max_pending: int = USER_FLUSH_BATCH):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: Dict[Key, dict] = {}
+        # Пачка, которая сейчас пишется: до коммита её нет ни в базе, ни в _pending
+        self._inflight: Dict[Key, dict] = {}
+        self._flushing = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    # ---------------------------
+    # Жизненный цикл
+    # ---------------------------
+    async def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Как и у капч: не cancel, а дать циклу дописать текущую пачку
+        if self._runner is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._runner
+            self._runner = None
+        await self.flush()
+
+    # ---------------------------
+    # Операции
+    # ---------------------------
+    def record(self, group_id: int, user_id: int, username: Optional[str] = None, **flags) -> None:
+        """Запоминает изменение флагов ChatUser; в базу оно попадёт со следующей пачкой."""
+        key = (group_id, user_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = {}
+        else:
+            self.coalesced += 1
+        if username is not None:
+            entry["username"] = username
+        entry.update(flags)
+        self.recorded += 1
+
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def view(self, group_id: int, user_id: int, stored: Optional[UserStatus]) -> Optional[UserStatus]:
+        """Статус из базы с наложенными незаписанными изменениями (None — пользователя нет нигде)."""
+        key = (group_id, user_id)
+        inflight, entry = self._inflight.get(key), self._pending.get(key)
+        if inflight is None and entry is None:
+            return stored
+        status = stored or UserStatus()
+        for fields in (inflight, entry):
+            if fields:
+                status = status._replace(**{f: v for f, v in fields.items() if f in UserStatus._fields})
+        return status
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # ---------------------------
+    # Фоновый цикл
+    # ---------------------------
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось сохранить статусы пользователей")
+
+    async def flush(self) -> int:
+        """Все накопленные изменения — одной транзакцией. Возвращает число строк."""
+        async with self._flushing:
+            if not self._pending:
+                return 0
+            batch = self._inflight = self._pending
+            self._pending = {}
+            try:
+                await self._write(batch)
+            except BaseException:
+                # Не записали — возвращаем, не затирая то, что успело измениться за это время
+                for key, entry in batch.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = {**entry, **newer} if newer else entry
+                raise
+            finally:
+                self._inflight = {}
+        self.flushes += 1
+        self.rows_written += len(batch)
+        return len(batch)
+
+    async def _write(self, batch: Dict[Key, dict]) -> None:
+        # Одинаковый набор полей — один многострочный upsert
+        shapes: Dict[Tuple[str, ...], List[dict]] = {}
+        for (group_id, user_id), entry in batch.items():
+            shapes.setdefault(tuple(sorted(entry)), []).append(
+                {"group_id": group_id, "user_id": user_id, **entry}
+            )
+
+        async with self.session_factory() as session:
+            for fields, rows in shapes.items():
+                # executemany одного скомпилированного upsert'а: параметры уходят в поток драйвера
+                stmt = insert(ChatUser)
+                index = [ChatUser.group_id, ChatUser.user_id]
+                if fields:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=index,
+                        set_={field: stmt.excluded[field] for field in fields},
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=index)
+                await session.execute(stmt, rows)
+            await session.commit()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+user_journal = UserStateJournal()
@@ -5,8 +5,17 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command, StateFilter
-
-from database.models import Session, Group, GroupSettings, BadWord
+from sqlalchemy import delete, func, select
+
+from database.models import Session, GroupSettings, BadWord, BannedMedia, FloodSettings, LinkRule
+from database.registry import group_registry
+from database.settings_cache import DEFAULT_SETTINGS, FLOOD_PRESETS, LINK_POLICIES, settings_cache
+from middlewares.bandword_middleware import badword_index
+from services.admin_roster import admin_roster
+from services.link_filter import link_filter, rule_domain
+from services.shared_bans import shared_bans
+from services.media_index import media_hasher, media_index, media_of, to_signed
+from services.shard_sync import shard_sync
 
 ## Присоединяем логирование к основному
 logger = logging.getLogger(__name__)
@@ -21,6 +30,20 @@ class AddBadWordState(StatesGroup):
     waiting_for_word = State()
 
 
+# -------------------------
+# FSM — запрет медиа
+# -------------------------
+class AddMediaState(StatesGroup):
+    waiting_for_media = State()
+
+
+# -------------------------
+# FSM — списки доменов
+# -------------------------
+class AddDomainState(StatesGroup):
+    waiting_for_domain = State()
+
+
 # -------------------------
 # Клавиатура: список групп
 # -------------------------
@@ -50,12 +73,44 @@ def group_settings_kb(group_id: int, settings: dict) -> InlineKeyboardMarkup:
             text=f"🟢 AI Filtering{' ✅' if settings.get('ai_filtering') else ''}",
             callback_data=f"toggle:ai:{group_id}"
         )],
+        [InlineKeyboardButton(
+            text=f"🤝 Общий бан-лист групп{' ✅' if settings.get('share_bans') else ''}",
+            callback_data=f"toggle:share:{group_id}"
+        )],
+        [InlineKeyboardButton(
+            text=f"🌊 Антифлуд: {settings.get('flood_preset', 'normal')}",
+            callback_data=f"flood:{group_id}"
+        )],
+        [InlineKeyboardButton(
+            text=f"🔗 Ссылки: {settings.get('link_policy', 'deny')}",
+            callback_data=f"links:{group_id}"
+        )],
         [InlineKeyboardButton(text="➕ Добавить банворд", callback_data=f"add_badword:{group_id}")],
-        [InlineKeyboardButton(text="📜 Показать банворды", callback_data=f"show_badwords:{group_id}")]
+        [InlineKeyboardButton(text="📜 Показать банворды", callback_data=f"show_badwords:{group_id}")],
+        [InlineKeyboardButton(text="🖼 Запретить стикер / фото / GIF", callback_data=f"add_media:{group_id}")],
+        [InlineKeyboardButton(text="🗂 Запрещённые медиа", callback_data=f"show_media:{group_id}")],
+        [
+            InlineKeyboardButton(text="⛔ Запретить домен", callback_data=f"add_domain:deny:{group_id}"),
+            InlineKeyboardButton(text="✅ Разрешить домен", callback_data=f"add_domain:allow:{group_id}"),
+        ],
+        [InlineKeyboardButton(text="🌐 Списки доменов", callback_data=f"show_domains:{group_id}")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def _cached(group_id: int):
+    return settings_cache.get(group_id) or DEFAULT_SETTINGS
+
+
+NOT_ADMIN = "❗ Это может только администратор группы."
+
+
+def _is_admin(group_id: int, user_id: int) -> bool:
+    """Меняющие фильтры действия — только админам группы: callback_data подделать несложно."""
+    chat_id = group_registry.chat_id(group_id)
+    return chat_id is not None and admin_roster.is_admin(chat_id, user_id)
+
+
 # -------------------------
 # Хендлеры
 # -------------------------
@@ -64,24 +119,21 @@ async def admin_panel(message: types.Message):
     if message.chat.type != "private":
         return
 
-    bot = message.bot
-    username = message.from_user.username
-    if not username:
-        await message.answer("❗ У вас нет username в Telegram. Установите его в настройках профиля.")
-        return
+    user_id = message.from_user.id
+    groups = group_registry.items()
 
-    with Session() as session:
-        groups = session.query(Group.id, Group.chat_id).all()
+    # Админов берём из кэша, в API — только за устаревшими записями и параллельно
+    stale = [chat_id for _, chat_id in groups if admin_roster.is_stale(chat_id)]
+    if stale:
+        await admin_roster.refresh(message.bot, stale)
+        async with Session() as session:
+            await admin_roster.flush(session)
 
-    user_groups = []
-    for gid, chat_id in groups:
-        try:
-            admins = await bot.get_chat_administrators(chat_id)
-            if username in [a.user.username for a in admins if a.user.username]:
-                chat = await bot.get_chat(chat_id)
-                user_groups.append((gid, chat.title))
-        except Exception:
-            continue
+    user_groups = [
+        (gid, admin_roster.title(chat_id) or str(chat_id))
+        for gid, chat_id in groups
+        if admin_roster.is_admin(chat_id, user_id)
+    ]
 
     if not user_groups:
         await message.answer("❗ Вы не являетесь администратором ни в одной зарегистрированной группе.")
@@ -93,17 +145,27 @@ async def admin_panel(message: types.Message):
 async def group_selected(callback: types.CallbackQuery):
     group_id = int(callback.data.split(":")[1])
 
-    with Session() as session:
-        settings = session.query(GroupSettings).filter_by(group_id=group_id).first()
+    async with Session() as session:
+        settings = await session.scalar(select(GroupSettings).filter_by(group_id=group_id))
         if not settings:
             settings = GroupSettings(group_id=group_id)
             session.add(settings)
-            session.commit()
+            await session.commit()
+            settings_cache.update(
+                group_id,
+                filter_badwords=settings.filter_badwords,
+                welcome_enabled=settings.welcome_enabled,
+                ai_filtering=settings.ai_filtering,
+            )
+            shard_sync.publish("settings", group_id=group_id)
 
         settings_data = {
             "filter_badwords": settings.filter_badwords,
             "welcome_enabled": settings.welcome_enabled,
-            "ai_filtering": settings.ai_filtering
+            "ai_filtering": settings.ai_filtering,
+            "flood_preset": _cached(group_id).flood.preset,
+            "link_policy": settings.link_policy,
+            "share_bans": settings.share_bans,
         }
 
     await callback.message.edit_text(
@@ -116,9 +178,13 @@ async def group_selected(callback: types.CallbackQuery):
 async def toggle_settings(callback: types.CallbackQuery):
     group_id = int(callback.data.split(":")[2])
     setting = callback.data.split(":")[1]
+    # Участие в общем бан-листе банит участников группы по чужим банам — только админам
+    if setting == "share" and not _is_admin(group_id, callback.from_user.id):
+        await callback.answer(NOT_ADMIN, show_alert=True)
+        return
 
-    with Session() as session:
-        settings = session.query(GroupSettings).filter_by(group_id=group_id).first()
+    async with Session() as session:
+        settings = await session.scalar(select(GroupSettings).filter_by(group_id=group_id))
         if not settings:
             await callback.answer("Настройки группы не найдены.", show_alert=True)
             return
@@ -129,19 +195,102 @@ async def toggle_settings(callback: types.CallbackQuery):
             settings.welcome_enabled = not settings.welcome_enabled
         elif setting == "ai":
             settings.ai_filtering = not settings.ai_filtering
-
-        session.commit()
+        elif setting == "share":
+            settings.share_bans = not settings.share_bans
+
+        await session.commit()
+        # Мидлвари читают настройки из кэша — обновляем сразу
+        settings_cache.update(
+            group_id,
+            filter_badwords=settings.filter_badwords,
+            welcome_enabled=settings.welcome_enabled,
+            ai_filtering=settings.ai_filtering,
+            share_bans=settings.share_bans,
+        )
+        shard_sync.publish("settings", group_id=group_id)
+        if setting == "share":
+            # Баны группы — в общий список или (выключили) список перечитывается без них
+            await shared_bans.refresh_group(group_id)
+            shard_sync.publish("bans", group_id=group_id)
 
         settings_data = {
             "filter_badwords": settings.filter_badwords,
             "welcome_enabled": settings.welcome_enabled,
-            "ai_filtering": settings.ai_filtering
+            "ai_filtering": settings.ai_filtering,
+            "flood_preset": _cached(group_id).flood.preset,
+            "link_policy": settings.link_policy,
+            "share_bans": settings.share_bans,
         }
 
     await callback.message.edit_reply_markup(reply_markup=group_settings_kb(group_id, settings_data))
     await callback.answer("✅ Настройки обновлены")
 
 
+async def cycle_flood_preset(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+
+    presets = list(FLOOD_PRESETS)
+    current = _cached(group_id).flood.preset
+    preset = presets[(presets.index(current) + 1) % len(presets)] if current in presets else "normal"
+    limits = FLOOD_PRESETS[preset]
+
+    async with Session() as session:
+        flood = await session.scalar(select(FloodSettings).filter_by(group_id=group_id))
+        if not flood:
+            flood = FloodSettings(group_id=group_id)
+            session.add(flood)
+        for field, value in limits._asdict().items():
+            setattr(flood, field, value)
+        await session.commit()
+
+        settings = settings_cache.update(group_id, flood=limits)
+        shard_sync.publish("settings", group_id=group_id)
+
+    settings_data = {
+        "filter_badwords": settings.filter_badwords,
+        "welcome_enabled": settings.welcome_enabled,
+        "ai_filtering": settings.ai_filtering,
+        "flood_preset": preset,
+        "link_policy": settings.link_policy,
+        "share_bans": settings.share_bans,
+    }
+    await callback.message.edit_reply_markup(reply_markup=group_settings_kb(group_id, settings_data))
+    await callback.answer(f"🌊 Антифлуд: {preset}")
+
+
+async def cycle_link_policy(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+    if not _is_admin(group_id, callback.from_user.id):
+        await callback.answer(NOT_ADMIN, show_alert=True)
+        return
+
+    async with Session() as session:
+        settings = await session.scalar(select(GroupSettings).filter_by(group_id=group_id))
+        if not settings:
+            await callback.answer("Настройки группы не найдены.", show_alert=True)
+            return
+
+        current = settings.link_policy
+        policy = LINK_POLICIES[(LINK_POLICIES.index(current) + 1) % len(LINK_POLICIES)] \
+            if current in LINK_POLICIES else "deny"
+        settings.link_policy = policy
+        await session.commit()
+        settings_cache.update(group_id, link_policy=policy)
+        shard_sync.publish("settings", group_id=group_id)
+
+        settings_data = {
+            "filter_badwords": settings.filter_badwords,
+            "welcome_enabled": settings.welcome_enabled,
+            "ai_filtering": settings.ai_filtering,
+            "flood_preset": _cached(group_id).flood.preset,
+            "link_policy": policy,
+            "share_bans": settings.share_bans,
+        }
+
+    await callback.message.edit_reply_markup(reply_markup=group_settings_kb(group_id, settings_data))
+    await callback.answer(f"🔗 Ссылки: {policy}")
+
+
 async def add_badword(callback: types.CallbackQuery, state: FSMContext):
     group_id = int(callback.data.split(":")[1])
     await state.update_data(group_id=group_id)
@@ -159,12 +308,16 @@ async def add_badword_reply(message: types.Message, state: FSMContext):
         await message.answer("❗ Введите непустое слово.")
         return
 
-    with Session() as session:
-        if session.query(BadWord).filter_by(group_id=group_id, word=word).first():
+    async with Session() as session:
+        if await session.scalar(select(BadWord).filter_by(group_id=group_id, word=word)):
             await message.answer(f"⚠️ Слово «{word}» уже есть в бан-листе.")
         else:
             session.add(BadWord(group_id=group_id, word=word))
-            session.commit()
+            await session.commit()
+            # Автомат группы пересоберётся при следующей проверке
+            if badword_index.is_loaded(group_id):
+                badword_index.add_word(group_id, word)
+            shard_sync.publish("badwords", group_id=group_id)
             await message.answer(f"✅ Слово «{word}» добавлено в бан-лист.")
 
     await state.clear()
@@ -173,8 +326,10 @@ async def add_badword_reply(message: types.Message, state: FSMContext):
 async def show_badwords(callback: types.CallbackQuery):
     group_id = int(callback.data.split(":")[1])
 
-    with Session() as session:
-        words = session.query(BadWord).filter_by(group_id=group_id).order_by(BadWord.id).all()
+    async with Session() as session:
+        words = (await session.scalars(
+            select(BadWord).filter_by(group_id=group_id).order_by(BadWord.id)
+        )).all()
 
     if not words:
         await callback.answer("📭 Бан-лист пуст.", show_alert=True)
@@ -185,6 +340,223 @@ async def show_badwords(callback: types.CallbackQuery):
     await callback.answer()
 
 
+async def add_media(callback: types.CallbackQuery, state: FSMContext):
+    group_id = int(callback.data.split(":")[1])
+    if not _is_admin(group_id, callback.from_user.id):
+        await callback.answer(NOT_ADMIN, show_alert=True)
+        return
+    await state.update_data(group_id=group_id)
+    await state.set_state(AddMediaState.waiting_for_media)
+    await callback.message.answer("🖼 Пришлите стикер, фото или GIF, которые нужно запретить в группе:")
+    await callback.answer()
+
+
+async def add_media_reply(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    group_id = data.get("group_id")
+    # Права могли отобрать, пока админ искал стикер
+    if group_id is None or not _is_admin(group_id, message.from_user.id):
+        await message.answer(NOT_ADMIN)
+        await state.clear()
+        return
+    media = media_of(message)
+
+    if media is None:
+        await message.answer("❗ Пришлите стикер, фото или GIF.")
+        return
+
+    # pHash — чтобы ловить и пережатые копии; без миниатюры или Pillow остаётся точное совпадение
+    value = None
+    if media.thumb_id:
+        value = await media_hasher.get(message.bot, media.thumb_id, media.thumb_unique_id)
+
+    set_kb = None
+    async with Session() as session:
+        row = await session.scalar(
+            select(BannedMedia).filter_by(group_id=group_id, file_unique_id=media.file_unique_id)
+        )
+        if row:
+            await message.answer("⚠️ Это медиа уже запрещено.")
+        else:
+            row = BannedMedia(
+                group_id=group_id, kind=media.kind, file_unique_id=media.file_unique_id,
+                set_name=media.set_name, phash=to_signed(value) if value is not None else None,
+            )
+            session.add(row)
+            await session.commit()
+            media_index.add(group_id, media.kind, media.file_unique_id, media.set_name, value)
+            shard_sync.publish("media", group_id=group_id)
+            await message.answer(
+                "✅ Медиа запрещено." + ("" if value is not None else " Похожие копии не отслеживаются: нет миниатюры.")
+            )
+
+        if media.set_name:
+            set_kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+                text=f"🚫 Весь набор «{media.set_name}»", callback_data=f"ban_set:{group_id}:{row.id}"
+            )]])
+
+    if set_kb:
+        await message.answer("Стикер из набора — можно запретить набор целиком:", reply_markup=set_kb)
+    await state.clear()
+
+
+async def ban_sticker_set(callback: types.CallbackQuery):
+    _, group_id, media_id = callback.data.split(":")
+    group_id = int(group_id)
+    if not _is_admin(group_id, callback.from_user.id):
+        await callback.answer(NOT_ADMIN, show_alert=True)
+        return
+
+    async with Session() as session:
+        row = await session.get(BannedMedia, int(media_id))
+        if not row or row.group_id != group_id or not row.set_name:
+            await callback.answer("Запись не найдена.", show_alert=True)
+            return
+        set_name = row.set_name
+        if not await session.scalar(select(BannedMedia).filter_by(group_id=group_id, kind="set", set_name=set_name)):
+            session.add(BannedMedia(group_id=group_id, kind="set", set_name=set_name))
+            await session.commit()
+            media_index.add(group_id, "set", set_name=set_name)
+            shard_sync.publish("media", group_id=group_id)
+
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer(f"🚫 Набор «{set_name}» запрещён")
+
+
+async def show_media(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+
+    async with Session() as session:
+        counts = dict((await session.execute(
+            select(BannedMedia.kind, func.count()).filter_by(group_id=group_id).group_by(BannedMedia.kind)
+        )).all())
+        sets = (await session.scalars(
+            select(BannedMedia.set_name).filter_by(group_id=group_id, kind="set").order_by(BannedMedia.id)
+        )).all()
+
+    if not counts:
+        await callback.answer("📭 Запрещённых медиа нет.", show_alert=True)
+        return
+
+    names = {"sticker": "Стикеры", "photo": "Фото", "animation": "GIF", "set": "Наборы стикеров"}
+    text = "🗂 Запрещённые медиа:\n" + "\n".join(f"{names.get(k, k)}: {n}" for k, n in counts.items())
+    if sets:
+        text += "\n\nНаборы: " + ", ".join(sets)
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🗑 Очистить", callback_data=f"clear_media:{group_id}")
+    ]])
+    await callback.message.answer(text, reply_markup=kb)
+    await callback.answer()
+
+
+async def clear_media(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+    if not _is_admin(group_id, callback.from_user.id):
+        await callback.answer("❗ Очистить список может только администратор группы.", show_alert=True)
+        return
+
+    async with Session() as session:
+        await session.execute(delete(BannedMedia).filter_by(group_id=group_id))
+        await session.commit()
+    media_index.invalidate(group_id)
+    shard_sync.publish("media", group_id=group_id)
+
+    await callback.message.edit_text("🗑 Список запрещённых медиа очищен.")
+    await callback.answer()
+
+
+async def add_domain(callback: types.CallbackQuery, state: FSMContext):
+    _, action, group_id = callback.data.split(":")
+    if not _is_admin(int(group_id), callback.from_user.id):
+        await callback.answer(NOT_ADMIN, show_alert=True)
+        return
+    await state.update_data(group_id=int(group_id), action=action)
+    await state.set_state(AddDomainState.waiting_for_domain)
+    verb = "запретить" if action == "deny" else "разрешить"
+    await callback.message.answer(
+        f"🌐 Пришлите домены, которые нужно {verb} (через пробел или с новой строки). "
+        "Подходят и ссылки, t.me/канал и @канал; поддомены наследуют правило."
+    )
+    await callback.answer()
+
+
+async def add_domain_reply(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    group_id, action = data.get("group_id"), data.get("action", "deny")
+    # Права могли отобрать, пока админ набирал ответ
+    if group_id is None or not _is_admin(group_id, message.from_user.id):
+        await message.answer(NOT_ADMIN)
+        await state.clear()
+        return
+    domains = list(dict.fromkeys(filter(None, map(rule_domain, (message.text or "").split()))))
+
+    if not domains:
+        await message.answer("❗ Не нашёл ни одного домена. Пример: example.com")
+        return
+
+    async with Session() as session:
+        rows = {
+            row.domain: row for row in (await session.scalars(
+                select(LinkRule).filter(LinkRule.group_id == group_id, LinkRule.domain.in_(domains))
+            )).all()
+        }
+        for domain in domains:
+            if domain in rows:
+                rows[domain].action = action
+            else:
+                session.add(LinkRule(group_id=group_id, domain=domain, action=action))
+        await session.commit()
+    link_filter.invalidate(group_id)
+    shard_sync.publish("links", group_id=group_id)
+
+    mark = "⛔ Запрещены" if action == "deny" else "✅ Разрешены"
+    await message.answer(f"{mark}: " + ", ".join(domains))
+    await state.clear()
+
+
+async def show_domains(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+
+    async with Session() as session:
+        rules = (await session.execute(
+            select(LinkRule.domain, LinkRule.action).filter_by(group_id=group_id).order_by(LinkRule.domain)
+        )).all()
+
+    if not rules:
+        await callback.answer("📭 Своих списков доменов нет — действует общий.", show_alert=True)
+        return
+
+    denied = [domain for domain, action in rules if action != "allow"]
+    allowed = [domain for domain, action in rules if action == "allow"]
+    text = "🌐 Домены группы:"
+    if denied:
+        text += "\n\n⛔ Запрещены:\n" + "\n".join(denied)
+    if allowed:
+        text += "\n\n✅ Разрешены:\n" + "\n".join(allowed)
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🗑 Очистить", callback_data=f"clear_domains:{group_id}")
+    ]])
+    # Длинные списки режем по лимиту сообщения Telegram
+    await callback.message.answer(text[:4000], reply_markup=kb)
+    await callback.answer()
+
+
+async def clear_domains(callback: types.CallbackQuery):
+    group_id = int(callback.data.split(":")[1])
+    if not _is_admin(group_id, callback.from_user.id):
+        await callback.answer("❗ Очистить списки может только администратор группы.", show_alert=True)
+        return
+
+    async with Session() as session:
+        await session.execute(delete(LinkRule).filter_by(group_id=group_id))
+        await session.commit()
+    link_filter.invalidate(group_id)
+    shard_sync.publish("links", group_id=group_id)
+
+    await callback.message.edit_text("🗑 Списки доменов группы очищены.")
+    await callback.answer()
+
+
 # -------------------------
 # Регистрация всех хендлеров через функцию
 # -------------------------
@@ -192,9 +564,20 @@ def register_admin_handlers(router: Router):
     router.message.register(admin_panel, Command("admin"))
     router.callback_query.register(group_selected, F.data.startswith("group:"))
     router.callback_query.register(toggle_settings, F.data.startswith("toggle:"))
+    router.callback_query.register(cycle_flood_preset, F.data.startswith("flood:"))
+    router.callback_query.register(cycle_link_policy, F.data.startswith("links:"))
     router.callback_query.register(add_badword, F.data.startswith("add_badword:"))
     router.message.register(add_badword_reply, StateFilter(AddBadWordState.waiting_for_word))
     router.callback_query.register(show_badwords, F.data.startswith("show_badwords:"))
+    router.callback_query.register(add_media, F.data.startswith("add_media:"))
+    router.message.register(add_media_reply, StateFilter(AddMediaState.waiting_for_media))
+    router.callback_query.register(ban_sticker_set, F.data.startswith("ban_set:"))
+    router.callback_query.register(show_media, F.data.startswith("show_media:"))
+    router.callback_query.register(clear_media, F.data.startswith("clear_media:"))
+    router.callback_query.register(add_domain, F.data.startswith("add_domain:"))
+    router.message.register(add_domain_reply, StateFilter(AddDomainState.waiting_for_domain))
+    router.callback_query.register(show_domains, F.data.startswith("show_domains:"))
+    router.callback_query.register(clear_domains, F.data.startswith("clear_domains:"))
 
 
 # Регистрируем роутер при импорте
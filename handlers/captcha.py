@@ -1,44 +1,88 @@
+from typing import Optional
+
 from aiogram import types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database.models import ChatUser
+from database.cache import user_cache
+from database.registry import group_registry
+from database.user_journal import user_journal
+from services.action_executor import action_executor
+from services.captcha_scheduler import captcha_scheduler
+from services.metrics import metrics
 
 
-async def send_captcha(bot, message: types.Message):
+async def send_captcha(message: types.Message, group_id: Optional[int] = None):
     if message.chat.type not in ("group", "supergroup"):
         return
 
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
                     text="✅ Я не бот",
-                    callback_data=f"captcha_ok:{message.from_user.username}",
+                    callback_data=f"captcha_ok:{user_id}",
                 )
             ]
         ]
     )
 
-    await bot.send_message(
-        chat_id=message.chat.id,
+    # Таймер истечения заводим сразу, id сообщения с капчей допишем, когда оно уйдёт
+    captcha_scheduler.schedule(chat_id, user_id, group_id)
+    metrics.inc_chat("bot_captcha_sent_total", chat_id)
+
+    # Через очередь действий: лимиты Telegram и повторы — не забота хендлера
+    action_executor.send_message(
+        chat_id=chat_id,
         text=f"Привет, {message.from_user.first_name}! Подтверди, что ты не бот 👇",
         reply_markup=kb,
+        on_done=lambda sent: captcha_scheduler.set_prompt(chat_id, user_id, sent.message_id),
     )
 
 
-async def captcha_ok(callback: types.CallbackQuery, session):
+def _release(chat_id: int, user_id: int, group_id: Optional[int]) -> None:
+    """
+    Капча без таймера: новую сам бот не пришлёт, а старые сообщения удаляются —
+    сбрасываем флаг, чтобы капчу выслали на следующее сообщение.
+    """
+    if group_id is not None:
+        user_journal.record(group_id, user_id, is_captcha_sent=False)
+    user_cache.invalidate(user_id, chat_id)
+
+
+async def captcha_ok(callback: types.CallbackQuery):
     if callback.message.chat.type not in ("group", "supergroup"):
         await callback.answer("Капча доступна только в группах", show_alert=True)
         return
 
-    username = callback.data.split(":")[1]
-    db_user = session.query(ChatUser).filter_by(username=username).first()
+    raw_user_id = callback.data.split(":")[1]
+    if not raw_user_id.isdigit():
+        # Кнопка из старой версии бота (в ней был username)
+        chat_id = callback.message.chat.id
+        _release(chat_id, callback.from_user.id, group_registry.get(chat_id))
+        await callback.answer("Капча устарела. Напиши снова в чат.")
+        return
+
+    user_id = int(raw_user_id)
+    if callback.from_user.id != user_id:
+        await callback.answer("Эта капча не для тебя 🙂", show_alert=True)
+        return
+
+    chat_id = callback.message.chat.id
+    # Ожидающая капча — единственное, что нужно проверить; в базу не ходим
+    pending = captcha_scheduler.cancel(chat_id, user_id)
+    group_id = pending.group_id if pending else group_registry.get(chat_id)
 
-    if not db_user:
-        await callback.answer("Пользователь не найден. Напиши снова в чат.")
+    if pending is None or group_id is None:
+        _release(chat_id, user_id, group_id)
+        await callback.answer("Капча устарела. Напиши снова в чат.")
         return
 
-    db_user.is_verified = True
-    session.commit()
+    # Статус — в журнал (запишется пачкой), в кэш — сразу; верификация в пределах группы
+    user_journal.record(group_id, user_id, is_verified=True, is_captcha_sent=True)
+    user_cache.update(user_id, chat_id, is_verified=True, is_captcha_sent=True)
+    metrics.inc_chat("bot_captcha_passed_total", chat_id)
 
     await callback.message.edit_text("✅ Капча успешно пройдена! Добро пожаловать!")
     await callback.answer("Спасибо, подтверждение пройдено ✅", show_alert=True)
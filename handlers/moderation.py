@@ -0,0 +1,47 @@
+from aiogram import types
+from aiogram.dispatcher.event.bases import SkipHandler
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.cache import user_cache
+from database.registry import group_registry
+from database.user_journal import user_journal
+from services.admin_roster import admin_roster
+from services.shard_sync import shard_sync
+from services.shared_bans import shared_bans
+from services.spam_classifier import recent_messages, spam_classifier
+
+
+async def member_banned(event: types.ChatMemberUpdated, session: AsyncSession):
+    """Админ забанил участника средствами Telegram — помечаем его в базе и кэше."""
+    # Баны самого бота сюда не относятся: кик по капче — это бан + разбан, пользователь
+    # может вернуться; баны общего бан-листа уже записаны там, где их выдали
+    if event.bot is not None and event.from_user.id == event.bot.id:
+        return
+
+    user = event.new_chat_member.user
+    group_id = group_registry.get(event.chat.id)
+    if group_id is None:
+        group_id = await group_registry.ensure(session, event.chat.id)
+
+    # Бан действует в этой группе; запись появится, даже если пользователь ещё не писал
+    user_journal.record(group_id, user.id, username=user.username, is_banned=True, banned_by_admin=True)
+
+    user_cache.update(user.id, event.chat.id, is_banned=True)
+    admin_roster.set_admin(event.chat.id, user.id, False)
+    await admin_roster.flush(session)
+
+    await shared_bans.record(session, group_id, user.id)
+    if shared_bans.shares(group_id):
+        shard_sync.publish("bans", user_id=user.id)
+
+    # Последнее сообщение забаненного — пример спама для классификатора
+    analysis = recent_messages.pop(event.chat.id, user.id)
+    if analysis is not None:
+        spam_classifier.learn(analysis, True)
+
+
+async def member_joined(event: types.ChatMemberUpdated):
+    """Вступление в группу: участник общего бан-листа банится, не дожидаясь первого сообщения."""
+    shared_bans.enforce(event.chat.id, group_registry.get(event.chat.id), event.new_chat_member.user, "join")
+    # Дальше — обычный учёт админов в member_updated
+    raise SkipHandler()
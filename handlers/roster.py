@@ -0,0 +1,32 @@
+from aiogram import types
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.registry import group_registry
+from services.admin_roster import admin_roster
+
+ADMIN_STATUSES = ("administrator", "creator")
+
+
+async def member_updated(event: types.ChatMemberUpdated, session: AsyncSession):
+    """Повышение/понижение участника — правим список админов группы."""
+    admin_roster.set_admin(
+        event.chat.id,
+        event.new_chat_member.user.id,
+        event.new_chat_member.status in ADMIN_STATUSES,
+    )
+    admin_roster.set_title(event.chat.id, event.chat.title)
+    await admin_roster.flush(session)
+
+
+async def bot_membership_updated(event: types.ChatMemberUpdated, session: AsyncSession):
+    """Бота добавили в группу или выгнали из неё."""
+    if event.chat.type not in ("group", "supergroup"):
+        return
+
+    await group_registry.ensure(session, event.chat.id)
+    if event.new_chat_member.status in ("left", "kicked"):
+        admin_roster.forget(event.chat.id)
+    else:
+        admin_roster.expire(event.chat.id)
+        admin_roster.set_title(event.chat.id, event.chat.title)
+    await admin_roster.flush(session)
@@ -1,48 +1,54 @@
-import os
+from typing import Callable, Dict, Any, Awaitable
 
-from dotenv import load_dotenv
-from google import genai  
-from pydantic import BaseModel, Field
+from aiogram import BaseMiddleware, types
 
-from config import GEMINI_API_KEY
+from database.settings_cache import DEFAULT_SETTINGS
+from services.action_executor import action_executor
+from services.ai_pipeline import AIFilterPipeline, make_backend
+from services.spam_classifier import recent_messages, spam_classifier
+from services.verdict_cache import VerdictCache
 
-load_dotenv()
 
+async def queue_delete(message: types.Message) -> None:
+    action_executor.delete(message.chat.id, message.message_id)
 
-class AdvertisementCheckMessage(BaseModel):
-    answer: bool = Field(..., description="True if the message contains advertisement or spam, False otherwise.")
 
-
-client = genai.Client(
-    api_key=GEMINI_API_KEY
+# Общая очередь AI-проверки; запускается и останавливается вместе с диспетчером
+ai_pipeline = AIFilterPipeline(
+    make_backend(),
+    on_spam=queue_delete,
+    cache=VerdictCache(),
+    prefilter=spam_classifier,
 )
 
-mess = """
-    🏠 Единый ЖКХ Бот — ваш официальный цифровой помощник по всем вопросам жилищно-коммунального хозяйства!
-    С ним вы сможете:
-    ✅ Передавать показания счётчиков за несколько секунд
-    💳 Просматривать и оплачивать счета онлайн
-    🔧 Оформлять заявки на ремонт и техническое обслуживание
-    📢 Получать актуальные новости и уведомления от управляющей компании
-    ✉️ Отправлять обращения, предложения и жалобы напрямую
-    📊 Отслеживать историю платежей и анализировать расходы
-
-    Все услуги ЖКХ — в одном удобном Telegram-боте!
-    🚀 Просто откройте Telegram и найдите ПОМОЩНИК ЖКХ
-"""
-
-response = client.models.generate_content(
-    model="gemini-2.5-flash",
-    contents=f"""
-    {mess}
-
-    Если сообщение выше содержит спам, рекламу или нежелательный контент, ответь только "True", если нет - "False".
-    """,
-    config={
-        "response_mime_type": "application/json",
-        "response_json_schema": AdvertisementCheckMessage.model_json_schema(),
-    },
-)
 
-print(response.text)
+class AIFilteringMiddleware(BaseMiddleware):
+    """
+    Отправляет сообщение в AI-очередь и сразу пропускает его дальше.
+    Если модель сочтёт его рекламой, оно будет удалено задним числом.
+    """
+
+    def __init__(self, pipeline: AIFilterPipeline = ai_pipeline):
+        self.pipeline = pipeline
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
+        event: types.Message,
+        data: Dict[str, Any],
+    ) -> Any:
+
+        if event.chat.type not in ("group", "supergroup"):
+            return await handler(event, data)
+
+        if not data.get("group_settings", DEFAULT_SETTINGS).ai_filtering or data.get("lockdown"):
+            return await handler(event, data)
+
+        analysis = data.get("analysis")
+        if analysis is None:
+            return await handler(event, data)
 
+        if event.from_user:
+            recent_messages.remember(event.chat.id, event.from_user.id, analysis)
+        self.pipeline.submit(event, analysis)
+        return await handler(event, data)
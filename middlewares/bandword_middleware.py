@@ -5,14 +5,28 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware, types
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-import pymorphy3
 
-from config import BANNED_WORDS
+from database.settings_cache import DEFAULT_SETTINGS
+from services.action_executor import action_executor
+from services.badword_matcher import BadWordIndex
+from services.lemmatizer import lemmatizer
+from services.metrics import metrics
+from services.spam_classifier import spam_classifier
+from services.text_analysis import fold
 
 load_dotenv()
 
 
-morph = pymorphy3.MorphAnalyzer()
+def _normal_form(word: str) -> str:
+    # Слова бан-листа сворачиваются так же, как текст сообщений (services/text_analysis.py).
+    # Пока морфология прогревается — только сама словоформа; после загрузки автоматы пересоберутся
+    word = fold(word)
+    return lemmatizer.normal_form(word) if lemmatizer.ready else word
+
+
+# Бан-листы всех групп (+ глобальный BANNED_WORDS), скомпилированные в автоматы
+badword_index = BadWordIndex(normalize=_normal_form)
+lemmatizer.on_ready(badword_index.recompile)
 
 
 class CensorshipMiddleware(BaseMiddleware):
@@ -27,14 +41,29 @@ class CensorshipMiddleware(BaseMiddleware):
         if event.chat.type not in ("group", "supergroup"):
             return await handler(event, data)
 
-        text = (event.text or "").lower()
-        words = text.split()
+        # Фильтр выключен в настройках группы — морфологию не запускаем вовсе
+        if not data.get("group_settings", DEFAULT_SETTINGS).filter_badwords:
+            return await handler(event, data)
+
+        # Lockdown: пишут только проверенные, дорогие фильтры пропускаем
+        if data.get("lockdown"):
+            return await handler(event, data)
+
+        analysis = data.get("analysis")
+        if analysis is None:
+            return await handler(event, data)
+
+        matcher = await badword_index.get(data["session"], data.get("group_id"))
+        if not lemmatizer.ready:
+            # Деградация на время прогрева: ловим только точные словоформы из бан-листа
+            metrics.inc("bot_degraded_checks_total", filter="badwords")
+        lemmas = await analysis.lemmatize()
 
-        for word in words:
-            lemma = morph.parse(word)[0].normal_form
-            for banned in BANNED_WORDS:
-                if banned in lemma:
-                    await event.delete()
-                    return
+        # Один проход автомата по всем леммам сообщения
+        if matcher.search(" ".join(lemmas)):
+            # Удалённое цензурой — пример спама для локального классификатора
+            spam_classifier.learn(analysis, True)
+            action_executor.delete(event.chat.id, event.message_id)
+            return
 
         return await handler(event, data)
@@ -1,6 +1,8 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware, types
-from database.models import Group, Session
+from database.registry import group_registry
+from database.settings_cache import settings_cache
+from services.admin_roster import admin_roster
 
 
 class GroupRegisterMiddleware(BaseMiddleware):
@@ -20,14 +22,21 @@ class GroupRegisterMiddleware(BaseMiddleware):
         if chat.type not in ("group", "supergroup"):
             return await handler(event, data)
 
-        chat_id = chat.id
+        # Известные чаты берём из памяти, новые регистрируем одним upsert'ом
+        group_id = group_registry.get(chat.id)
+        if group_id is None:
+            group_id = await group_registry.ensure(data["session"], chat.id)
 
-        # Добавляем в базу, если нет
-        with Session() as session:
-            group = session.query(Group).filter_by(chat_id=chat_id).first()
-            if not group:
-                group = Group(chat_id=chat_id)
-                session.add(group)
-                session.commit()
+        # Название чата приходит в каждом сообщении — сохраняем, только если сменилось
+        if admin_roster.set_title(chat.id, chat.title):
+            await admin_roster.flush(data["session"])
+
+        settings = settings_cache.get(group_id)
+        if settings is None:
+            settings = await settings_cache.load(data["session"], group_id)
+
+        # Дальше по цепочке — внутренний Group.id, а не Telegram chat_id, и настройки группы
+        data["group_id"] = group_id
+        data["group_settings"] = settings
 
         return await handler(event, data)
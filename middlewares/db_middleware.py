@@ -1,10 +1,7 @@
 from database.models import Session
 
 async def db_session_middleware(handler, event, data):
-    # создаём сессию
-    session = Session()
-    data["session"] = session
-    try:
+    # создаём асинхронную сессию, закроется сама
+    async with Session() as session:
+        data["session"] = session
         return await handler(event, data)
-    finally:
-        session.close()  # обязательно закрываем
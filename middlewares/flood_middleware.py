@@ -0,0 +1,92 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, types
+
+from database.cache import user_cache
+from database.registry import group_registry
+from database.settings_cache import FloodThresholds, settings_cache
+from database.user_journal import user_journal
+from services.action_executor import action_executor
+from services.admin_roster import admin_roster
+from services.flood_detector import DROP, LOCKDOWN, flood_detector
+
+LOCKDOWN_NOTICE = (
+    "🌊 В чате всплеск сообщений или вступлений. Включён режим защиты: "
+    "сообщения неподтверждённых пользователей будут удаляться."
+)
+
+# Короче — не повтор рассылки, а «+», «👍», «спасибо» от разных людей: свёрнутый
+# текст у реакций одинаковый (часто пустой), считать их дублями нельзя
+MIN_DUPLICATE_LENGTH = 12
+
+
+def _limits(chat_id: int) -> FloodThresholds:
+    group_id = group_registry.get(chat_id)
+    settings = settings_cache.get(group_id) if group_id is not None else None
+    return settings.flood if settings is not None else FloodThresholds()
+
+
+class FloodGuardMiddleware(BaseMiddleware):
+    """
+    Первая ступень фильтрации (после разбора текста): считает сообщения и вступления в памяти
+    и отсекает флуд ещё до сессии БД и остальных фильтров.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any],
+    ) -> Any:
+
+        # Вступления через chat_member (бот — админ) считаем в окне рейда
+        member = getattr(event, "chat_member", None)
+        if member and member.new_chat_member.status == "member" \
+                and member.old_chat_member.status in ("left", "kicked"):
+            self._joined(member.chat.id, 1)
+            return await handler(event, data)
+
+        message = getattr(event, "message", None)
+        if not message or message.chat.type not in ("group", "supergroup"):
+            return await handler(event, data)
+
+        chat_id = message.chat.id
+        if message.new_chat_members:
+            self._joined(chat_id, len(message.new_chat_members))
+            return await handler(event, data)
+
+        user = message.from_user
+        if not user or admin_roster.is_admin(chat_id, user.id):
+            return await handler(event, data)
+
+        # Повторы считаются по свёрнутому тексту: вариации с эмодзи и двойниками букв — тоже повторы
+        analysis = data.get("analysis")
+        text_hash = None
+        if analysis is not None and analysis.tokens and len(analysis.normalized) >= MIN_DUPLICATE_LENGTH:
+            text_hash = hash(analysis.content_hash)
+        verdict = flood_detector.on_message(chat_id, user.id, text_hash, _limits(chat_id))
+        if verdict == DROP:
+            action_executor.delete(chat_id, message.message_id)
+            return
+        if verdict == LOCKDOWN:
+            action_executor.send_message(chat_id, LOCKDOWN_NOTICE)
+
+        if flood_detector.in_lockdown(chat_id):
+            # Пока идёт рейд, пишут только уже проверенные пользователи. Удаляем здесь лишь
+            # тех, кто точно не проверен; о ком в памяти ничего нет (вытеснен из кэша, новый),
+            # решит AuthorizedMessageMiddleware по базе
+            status = user_cache.get(user.id, chat_id)
+            if status is None:
+                group_id = group_registry.get(chat_id)
+                status = user_journal.view(group_id, user.id, None) if group_id is not None else None
+            if status is not None and not status.is_verified:
+                action_executor.delete(chat_id, message.message_id)
+                return
+            data["lockdown"] = True
+
+        return await handler(event, data)
+
+    @staticmethod
+    def _joined(chat_id: int, count: int) -> None:
+        if flood_detector.on_join(chat_id, _limits(chat_id), count) == LOCKDOWN:
+            action_executor.send_message(chat_id, LOCKDOWN_NOTICE)
@@ -0,0 +1,55 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, types
+
+from database.settings_cache import DEFAULT_SETTINGS
+from services.action_executor import action_executor
+from services.admin_roster import admin_roster
+from services.link_filter import DENY, link_filter
+from services.metrics import metrics
+from services.spam_classifier import spam_classifier
+
+
+class LinkFilterMiddleware(BaseMiddleware):
+    """
+    Ссылки и приглашения против списков доменов (services/link_filter.py)
+    по политике группы. Ссылки уже извлечены в data["analysis"], сами
+    проверки — словари в памяти, база нужна только для первой загрузки
+    списка группы. Ссылки админов не проверяются.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
+        event: types.Message,
+        data: Dict[str, Any],
+    ) -> Any:
+
+        if event.chat.type not in ("group", "supergroup"):
+            return await handler(event, data)
+
+        analysis = data.get("analysis")
+        if analysis is None or not (analysis.links or analysis.mentions):
+            return await handler(event, data)
+
+        policy = data.get("group_settings", DEFAULT_SETTINGS).link_policy
+        if policy == "off":
+            return await handler(event, data)
+
+        user = event.from_user
+        if user and admin_roster.is_admin(event.chat.id, user.id):
+            return await handler(event, data)
+
+        group_id = data.get("group_id")
+        group_trie = await link_filter.get(data["session"], group_id)
+        host = link_filter.check(group_id, group_trie, analysis, policy)
+        if host is not None:
+            metrics.inc("bot_links_blocked_total", policy=policy)
+            # Классификатор общий на все группы: учим только на запрещённых доменах,
+            # а не на обычных ссылках, которых нет в разрешённых у группы со strict
+            if link_filter.verdict(group_id, group_trie, host) == DENY:
+                spam_classifier.learn(analysis, True)
+            action_executor.delete(event.chat.id, event.message_id)
+            return
+
+        return await handler(event, data)
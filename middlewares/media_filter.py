@@ -0,0 +1,66 @@
+import asyncio
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, types
+
+from services.action_executor import action_executor
+from services.media_index import PHASH, BannedMediaSet, MediaRef, media_hasher, media_index, media_of
+from services.metrics import metrics
+
+
+class MediaFilterMiddleware(BaseMiddleware):
+    """
+    Стикеры, фото и GIF против бан-листа медиа группы (services/media_index.py).
+
+    Точные совпадения (эмодзи стикера, file_unique_id, набор стикеров)
+    удаляются сразу. Почти-дубликаты по pHash проверяются фоном: миниатюра
+    скачивается (один раз на файл), и сообщение удаляется задним числом,
+    как у AI-фильтра, — остальные сообщения скачивания не ждут.
+    """
+
+    def __init__(self):
+        self._checks = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
+        event: types.Message,
+        data: Dict[str, Any],
+    ) -> Any:
+
+        if event.chat.type not in ("group", "supergroup"):
+            return await handler(event, data)
+
+        media = media_of(event)
+        if media is None:
+            return await handler(event, data)
+
+        banned = await media_index.get(data["session"], data.get("group_id"))
+        match = media_index.match(banned, media)
+        if match is not None:
+            self._block(event.chat.id, event.message_id, match)
+            return
+
+        # Lockdown: дорогие проверки пропускаем, точные уже прошли
+        if len(banned.hashes) and media.thumb_id and not data.get("lockdown"):
+            task = asyncio.create_task(self._check_hash(event.bot, event.chat.id, event.message_id, banned, media))
+            self._checks.add(task)
+            task.add_done_callback(self._checks.discard)
+
+        return await handler(event, data)
+
+    async def _check_hash(self, bot, chat_id: int, message_id: int, banned: BannedMediaSet,
+                          media: MediaRef) -> None:
+        value = await media_hasher.get(bot, media.thumb_id, media.thumb_unique_id)
+        if value is not None and media_index.near(banned, value):
+            self._block(chat_id, message_id, PHASH)
+
+    @staticmethod
+    def _block(chat_id: int, message_id: int, match: str) -> None:
+        metrics.inc("bot_media_blocked_total", match=match)
+        action_executor.delete(chat_id, message_id)
+
+    async def stop(self) -> None:
+        """Хук shutdown: дождаться начатых проверок, чтобы их удаления попали в очередь."""
+        if self._checks:
+            await asyncio.gather(*self._checks, return_exceptions=True)
@@ -1,7 +1,11 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware, types
+from database.cache import UserStatus, user_cache
 from database.models import ChatUser
+from database.user_journal import user_journal
 from handlers.captcha import send_captcha
+from services.action_executor import action_executor
+from services.shared_bans import shared_bans
 
 
 class AuthorizedMessageMiddleware(BaseMiddleware):
@@ -22,40 +26,65 @@ class AuthorizedMessageMiddleware(BaseMiddleware):
         if event.chat.type not in ("group", "supergroup"):
             return await handler(event, data)
 
-        if event.sticker and event.sticker.emoji in ("🔞", "🍓"):
-            await event.delete()
+        chat_id = event.chat.id
+        group_id = data.get("group_id")
+
+        # Общий бан-лист — раньше кэша и базы: почти всегда ответ «нет» даёт фильтр Блума.
+        # Вступившие по сервисному сообщению банятся до капчи
+        reason = "message"
+        for member in event.new_chat_members or ():
+            if member.id == user.id:
+                reason = "join"
+            else:
+                shared_bans.enforce(chat_id, group_id, member, "join")
+        if shared_bans.enforce(chat_id, group_id, user, reason):
+            action_executor.delete(chat_id, event.message_id)
             return
 
-        username = user.username or f"id_{user.id}"
-        chat_id = event.chat.id
+        # Быстрый путь: статус уже в кэше — в базу не ходим
+        status = user_cache.get(user.id, chat_id)
+        if status is not None:
+            if status.is_banned or (status.is_captcha_sent and not status.is_verified):
+                action_executor.delete(chat_id, event.message_id)
+                return
+            if status.is_verified:
+                return await handler(event, data)
+
+        # Один запрос по (group_id, user_id), поверх — ещё не записанные изменения
+        db_user = await ChatUser.get(session, user.id, group_id)
+        stored = UserStatus(db_user.is_banned, db_user.is_verified, db_user.is_captcha_sent) if db_user else None
+        status = user_journal.view(group_id, user.id, stored)
 
-        if ChatUser.is_user_banned(session, username):
-            await event.delete()
+        if status is not None and status.is_banned:
+            user_cache.update(user.id, chat_id, is_banned=True)
+            action_executor.delete(chat_id, event.message_id)
             return
 
-        db_user = session.query(ChatUser).filter_by(username=username).first()
-
-        if not db_user:
-            db_user = ChatUser(
-                username=username,
-                is_verified=False,
-                is_banned=False,
-                is_captcha_sent=False,
-                group_id=chat_id,
-            )
-            session.add(db_user)
-            session.commit()
-            await event.delete()
-
-        if not db_user.is_verified and not db_user.is_captcha_sent:
-            await send_captcha(event.bot, event)
-            db_user.is_captcha_sent = True
-            db_user.group_id = chat_id
-            session.commit()
+        if status is None:
+            # Новый пользователь: строка появится в базе со следующей пачкой журнала
+            user_journal.record(group_id, user.id, username=user.username)
+            action_executor.delete(chat_id, event.message_id)
+            status = UserStatus()
+            if data.get("lockdown"):
+                # Рейд: капчи не рассылаем, её пришлют на первое сообщение после рейда
+                user_cache.set(user.id, chat_id, status)
+                return
+        elif data.get("lockdown") and not status.is_verified:
+            # FloodGuardMiddleware пропустил того, кого не было в памяти, — по базе он не проверен
+            user_cache.set(user.id, chat_id, status)
+            action_executor.delete(chat_id, event.message_id)
             return
 
-        if not db_user.is_verified:
-            await event.delete()
+        if not status.is_verified and not status.is_captcha_sent:
+            await send_captcha(event, group_id)
+            user_journal.record(group_id, user.id, is_captcha_sent=True)
+            user_cache.set(user.id, chat_id, UserStatus(is_captcha_sent=True))
+            return
+
+        user_cache.set(user.id, chat_id, status)
+
+        if not status.is_verified:
+            action_executor.delete(chat_id, event.message_id)
             return
 
         return await handler(event, data)
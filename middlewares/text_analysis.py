@@ -0,0 +1,40 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware, types
+
+from services.text_analysis import analyze
+
+
+def _entity_links(message: types.Message, text: str):
+    """Ссылки, которые Telegram сам распознал (url), и скрытые за текстом (text_link)."""
+    links = []
+    for entity in message.entities or message.caption_entities or ():
+        if entity.type == "text_link" and entity.url:
+            links.append(entity.url)
+        elif entity.type == "url":
+            links.append(entity.extract_from(text))
+    return links
+
+
+class TextAnalysisMiddleware(BaseMiddleware):
+    """
+    Нулевая ступень конвейера: текст (или подпись) группового сообщения
+    разбирается один раз и кладётся в data["analysis"]. Антифлуд, бан-лист,
+    кэш вердиктов, локальный классификатор и AI-очередь берут его оттуда,
+    а не режут строку каждый по-своему.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any],
+    ) -> Any:
+
+        message = getattr(event, "message", None)
+        if message and message.chat.type in ("group", "supergroup"):
+            text = message.text or message.caption
+            if text:
+                data["analysis"] = analyze(text, _entity_links(message, text))
+
+        return await handler(event, data)
@@ -0,0 +1,327 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter,
+)
+
+from config import (
+    ACTIONS_CHAT_BURST, ACTIONS_CHAT_RATE, ACTIONS_GLOBAL_RATE,
+    ACTIONS_MAX_ATTEMPTS, ACTIONS_MAX_PENDING,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bot API удаляет не больше 100 сообщений за один delete_messages
+DELETE_BATCH = 100
+# Как часто (секунд) выбрасывать очереди простаивающих чатов
+SWEEP_INTERVAL = 60.0
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до следующего токена (0 — можно сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class Action:
+    __slots__ = ("method", "kwargs", "on_done", "attempts")
+
+    def __init__(self, method: str, kwargs: Dict[str, Any], on_done: Optional[Callable] = None):
+        self.method = method
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.attempts = 0
+
+
+class ChatQueue:
+    __slots__ = ("deletes", "actions", "bucket", "not_before", "busy", "delete_attempts", "actions_turn")
+
+    def __init__(self, rate: float, burst: float):
+        self.deletes: List[int] = []
+        self.actions: Deque[Action] = deque()
+        self.bucket = TokenBucket(rate, burst)
+        self.not_before = 0.0
+        self.busy = False
+        self.delete_attempts = 0
+        # Следующий запрос — действие (если есть), а не пачка удалений
+        self.actions_turn = False
+
+    def __len__(self) -> int:
+        return len(self.deletes) + len(self.actions)
+
+    def idle(self, now: float) -> bool:
+        """Пусто и ведро снова полное: новая очередь ничем не отличалась бы от этой."""
+        if self.busy or len(self) or self.not_before > now:
+            return False
+        self.bucket.delay(now)
+        return self.bucket.tokens >= self.bucket.capacity
+
+
+# ============================================================
+#            ИСПОЛНИТЕЛЬ ДЕЙСТВИЙ МОДЕРАЦИИ
+# ============================================================
+class ActionExecutor:
+    """
+    Единая очередь запросов модерации к Telegram.
+
+    Мидлвари только ставят действие в очередь и идут дальше. Исполнитель
+    склеивает удаления одного чата в delete_messages, соблюдает лимиты
+    (общий и на чат, token bucket) и при 429/сетевых ошибках повторяет
+    запрос с backoff — без участия хендлеров. В каждый чат одновременно
+    идёт не больше одного запроса, так что порядок действий сохраняется.
+    Удаления и остальные действия чата чередуются: пачка удалений,
+    действие, пачка… — поток удалений во время спам-волны не задерживает
+    баны, а баны не задерживают удаления.
+    """
+
+    def __init__(
+        self,
+        bot=None,
+        global_rate: float = ACTIONS_GLOBAL_RATE,
+        chat_rate: float = ACTIONS_CHAT_RATE,
+        chat_burst: float = ACTIONS_CHAT_BURST,
+        max_pending: int = ACTIONS_MAX_PENDING,
+        max_attempts: int = ACTIONS_MAX_ATTEMPTS,
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats: Dict[int, ChatQueue] = {}
+        self._swept = time.monotonic()
+        self._ready: Optional[asyncio.Queue] = None
+        self._scheduled = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._in_flight = set()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.api_calls = 0
+        self.retries = 0
+        self.failed = 0
+
+    # ---------------------------
+    # Жизненный цикл
+    # ---------------------------
+    def set_global_rate(self, rate: float) -> None:
+        """Общий лимит бота делится между процессами-шардами: каждому — своя доля."""
+        self._global = TokenBucket(rate, max(1.0, rate))
+
+    async def start(self, bot=None) -> None:
+        if bot is not None:
+            self.bot = bot
+        if self._runner is None or self._runner.done():
+            self._ready = asyncio.Queue()
+            self._scheduled.clear()
+            for chat_id, chat in self._chats.items():
+                if len(chat):
+                    self._wake(chat_id)
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Пытается дослать очередь за `timeout` секунд, затем останавливается."""
+        if self._runner is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self.depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._in_flight:
+            await asyncio.wait(self._in_flight, timeout=max(0.0, deadline - time.monotonic()))
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+
+    # ---------------------------
+    # Постановка в очередь
+    # ---------------------------
+    def _chat(self, chat_id: int) -> ChatQueue:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            self._sweep()
+            chat = self._chats[chat_id] = ChatQueue(self.chat_rate, self.chat_burst)
+        return chat
+
+    def _sweep(self) -> None:
+        # Очередь опустевшего чата живёт, пока не восполнится ведро: иначе следующее
+        # действие получило бы свежий burst, и ровный поток не упирался бы в лимит чата
+        now = time.monotonic()
+        if now - self._swept < SWEEP_INTERVAL:
+            return
+        self._swept = now
+        for chat_id in [chat_id for chat_id, chat in self._chats.items() if chat.idle(now)]:
+            del self._chats[chat_id]
+
+    def _wake(self, chat_id: int) -> None:
+        if self._ready is not None and chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._ready.put_nowait(chat_id)
+
+    def delete(self, chat_id: int, message_id: int) -> bool:
+        chat = self._chat(chat_id)
+        if len(chat) >= self.max_pending:
+            self.dropped += 1
+            return False
+        chat.deletes.append(message_id)
+        self.enqueued += 1
+        if not chat.busy:
+            self._wake(chat_id)
+        return True
+
+    def call(self, chat_id: int, method: str, on_done: Optional[Callable] = None, **kwargs) -> bool:
+        """Любой метод Bot API, например call(chat_id, "ban_chat_member", user_id=...)."""
+        chat = self._chat(chat_id)
+        if len(chat) >= self.max_pending:
+            self.dropped += 1
+            return False
+        chat.actions.append(Action(method, {"chat_id": chat_id, **kwargs}, on_done))
+        self.enqueued += 1
+        if not chat.busy:
+            self._wake(chat_id)
+        return True
+
+    def send_message(self, chat_id: int, text: str, on_done: Optional[Callable] = None, **kwargs) -> bool:
+        return self.call(chat_id, "send_message", on_done=on_done, text=text, **kwargs)
+
+    def ban(self, chat_id: int, user_id: int, **kwargs) -> bool:
+        return self.call(chat_id, "ban_chat_member", user_id=user_id, **kwargs)
+
+    # ---------------------------
+    # Выполнение
+    # ---------------------------
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            chat_id = await self._ready.get()
+            self._scheduled.discard(chat_id)
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.busy or not len(chat):
+                continue
+
+            now = time.monotonic()
+            wait = max(chat.not_before - now, chat.bucket.delay(now), self._global.delay(now))
+            if wait > 0:
+                self._scheduled.add(chat_id)
+                loop.call_later(wait, self._requeue, chat_id)
+                continue
+
+            chat.bucket.take()
+            self._global.take()
+            chat.busy = True
+            task = asyncio.create_task(self._execute(chat_id, chat))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def _requeue(self, chat_id: int) -> None:
+        self._scheduled.discard(chat_id)
+        self._wake(chat_id)
+
+    async def _execute(self, chat_id: int, chat: ChatQueue) -> None:
+        try:
+            # Удаления накопились, пока ждали токен, — отправляем пачкой
+            if chat.deletes and not (chat.actions_turn and chat.actions):
+                chat.actions_turn = True
+                batch, chat.deletes = chat.deletes[:DELETE_BATCH], chat.deletes[DELETE_BATCH:]
+                await self._delete_batch(chat_id, chat, batch)
+            else:
+                chat.actions_turn = False
+                await self._call(chat, chat.actions.popleft())
+        finally:
+            chat.busy = False
+            if len(chat):
+                self._wake(chat_id)
+
+    async def _delete_batch(self, chat_id: int, chat: ChatQueue, batch: List[int]) -> None:
+        self.api_calls += 1
+        try:
+            await self.bot.delete_messages(chat_id=chat_id, message_ids=batch)
+            chat.delete_attempts = 0
+        except (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound) as e:
+            # Сообщения уже удалены или у бота нет прав — повторять бессмысленно
+            chat.delete_attempts = 0
+            logger.debug("delete_messages в %s: %s", chat_id, e)
+        except Exception as e:
+            chat.delete_attempts += 1
+            if self._retry(chat, chat.delete_attempts, e):
+                chat.deletes[:0] = batch
+            else:
+                chat.delete_attempts = 0
+                self.failed += len(batch)
+
+    async def _call(self, chat: ChatQueue, action: Action) -> None:
+        self.api_calls += 1
+        try:
+            result = await getattr(self.bot, action.method)(**action.kwargs)
+        except (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound) as e:
+            self.failed += 1
+            logger.warning("%s в %s не выполнен: %s", action.method, action.kwargs.get("chat_id"), e)
+            return
+        except Exception as e:
+            action.attempts += 1
+            if self._retry(chat, action.attempts, e):
+                chat.actions.appendleft(action)
+            else:
+                self.failed += 1
+            return
+
+        if action.on_done is not None:
+            outcome = action.on_done(result)
+            if inspect.isawaitable(outcome):
+                await outcome
+
+    def _retry(self, chat: ChatQueue, attempts: int, error: Exception) -> bool:
+        if attempts >= self.max_attempts:
+            logger.warning("Действие отброшено после %d попыток: %s", attempts, error)
+            return False
+        self.retries += 1
+        if isinstance(error, TelegramRetryAfter):
+            delay = error.retry_after
+        else:
+            delay = min(30.0, 0.5 * 2 ** attempts)
+        chat.not_before = time.monotonic() + delay
+        return True
+
+    # ---------------------------
+    # Метрики
+    # ---------------------------
+    def depth(self) -> int:
+        return sum(len(chat) for chat in self._chats.values())
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.depth(),
+            "chats_pending": sum(1 for chat in self._chats.values() if len(chat)),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "api_calls": self.api_calls,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+action_executor = ActionExecutor()
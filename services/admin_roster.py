@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import ROSTER_CONCURRENCY, ROSTER_TTL
+from database.models import GroupRoster, Session
+from database.registry import group_registry
+from services.shard_sync import shard_sync
+
+logger = logging.getLogger(__name__)
+
+
+class RosterEntry:
+    __slots__ = ("title", "admin_ids", "updated_at")
+
+    def __init__(self, title: Optional[str] = None, admin_ids: Iterable[int] = (), updated_at: float = 0.0):
+        self.title = title
+        self.admin_ids: Set[int] = set(admin_ids)
+        self.updated_at = updated_at
+
+
+# ============================================================
+#             КЭШ АДМИНОВ И НАЗВАНИЙ ГРУПП
+# ============================================================
+class AdminRoster:
+    """
+    chat_id -> (название, id админов), хранится в group_rosters.
+
+    Держится в актуальном состоянии апдейтами chat_member / my_chat_member,
+    так что /admin отвечает из памяти. В API идём только за записями старше
+    `ttl`, причём параллельно, но не больше `concurrency` запросов сразу.
+    """
+
+    def __init__(self, ttl: float = ROSTER_TTL, concurrency: int = ROSTER_CONCURRENCY):
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self._entries: Dict[int, RosterEntry] = {}
+        self._dirty: Set[int] = set()
+
+    async def load(self, session_factory=Session) -> int:
+        chat_ids = {group_id: chat_id for group_id, chat_id in group_registry.items()}
+        async with session_factory() as session:
+            rows = (await session.scalars(select(GroupRoster))).all()
+        self._entries = {
+            chat_ids[row.group_id]: RosterEntry(row.title, row.admin_ids or (), row.updated_at)
+            for row in rows if row.group_id in chat_ids
+        }
+        return len(self._entries)
+
+    def _entry(self, chat_id: int) -> RosterEntry:
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            entry = self._entries[chat_id] = RosterEntry()
+        return entry
+
+    # ---------------------------
+    # Чтение
+    # ---------------------------
+    def is_stale(self, chat_id: int) -> bool:
+        entry = self._entries.get(chat_id)
+        return entry is None or time.time() - entry.updated_at > self.ttl
+
+    def is_admin(self, chat_id: int, user_id: int) -> bool:
+        entry = self._entries.get(chat_id)
+        return entry is not None and user_id in entry.admin_ids
+
+    def title(self, chat_id: int) -> Optional[str]:
+        entry = self._entries.get(chat_id)
+        return entry.title if entry else None
+
+    # ---------------------------
+    # Обновления из апдейтов
+    # ---------------------------
+    def set_admin(self, chat_id: int, user_id: int, is_admin: bool) -> None:
+        entry = self._entries.get(chat_id)
+        # Неполный список не выдаём за свежий: дождёмся полной загрузки
+        if entry is None:
+            return
+        if is_admin and user_id not in entry.admin_ids:
+            entry.admin_ids.add(user_id)
+            self._dirty.add(chat_id)
+        elif not is_admin and user_id in entry.admin_ids:
+            entry.admin_ids.discard(user_id)
+            self._dirty.add(chat_id)
+
+    def set_title(self, chat_id: int, title: Optional[str]) -> bool:
+        entry = self._entries.get(chat_id)
+        if entry is None or not title or entry.title == title:
+            return False
+        entry.title = title
+        self._dirty.add(chat_id)
+        return True
+
+    def put(self, chat_id: int, title: Optional[str], admin_ids: Iterable[int], updated_at: float) -> None:
+        """Запись, уже сохранённая другим шардом: в базу второй раз не пишем."""
+        self._entries[chat_id] = RosterEntry(title, admin_ids, updated_at)
+
+    def expire(self, chat_id: int) -> None:
+        """Пометить запись устаревшей — перечитаем при следующем /admin."""
+        entry = self._entry(chat_id)
+        entry.updated_at = 0.0
+        self._dirty.add(chat_id)
+
+    def forget(self, chat_id: int) -> None:
+        """Бот больше не в группе — админов у неё для нас нет."""
+        entry = self._entry(chat_id)
+        entry.admin_ids.clear()
+        entry.updated_at = time.time()
+        self._dirty.add(chat_id)
+
+    # ---------------------------
+    # Обновление через API
+    # ---------------------------
+    async def _fetch(self, bot, chat_id: int, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            try:
+                admins, chat = await asyncio.gather(
+                    bot.get_chat_administrators(chat_id),
+                    bot.get_chat(chat_id),
+                )
+            except Exception as e:
+                # Бота выгнали или чат удалён — запоминаем пустой список, чтобы не долбить API
+                logger.info("Не удалось получить админов чата %s: %s", chat_id, e)
+                self.forget(chat_id)
+                return
+
+        entry = self._entry(chat_id)
+        entry.title = chat.title
+        entry.admin_ids = {a.user.id for a in admins}
+        entry.updated_at = time.time()
+        self._dirty.add(chat_id)
+
+    async def refresh(self, bot, chat_ids: Iterable[int]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._fetch(bot, chat_id, semaphore) for chat_id in chat_ids))
+
+    # ---------------------------
+    # Сохранение
+    # ---------------------------
+    async def flush(self, session: AsyncSession) -> None:
+        if not self._dirty:
+            return
+        rows = []
+        published = []
+        for chat_id in self._dirty:
+            group_id = group_registry.get(chat_id)
+            entry = self._entries.get(chat_id)
+            if group_id is None or entry is None:
+                continue
+            row = {
+                "group_id": group_id,
+                "title": entry.title,
+                "admin_ids": sorted(entry.admin_ids),
+                "updated_at": entry.updated_at,
+            }
+            rows.append(row)
+            published.append((chat_id, row))
+        self._dirty.clear()
+        if not rows:
+            return
+
+        stmt = insert(GroupRoster).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GroupRoster.group_id],
+            set_={
+                "title": stmt.excluded.title,
+                "admin_ids": stmt.excluded.admin_ids,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+        for chat_id, row in published:
+            shard_sync.publish("roster", chat_id=chat_id, group_id=row["group_id"], title=row["title"],
+                               admin_ids=row["admin_ids"], updated_at=row["updated_at"])
+
+
+admin_roster = AdminRoster()
@@ -0,0 +1,344 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from config import (
+    AI_BACKEND, AI_BATCH_SIZE, AI_BATCH_WINDOW, AI_MAX_IN_FLIGHT, AI_QUEUE_SIZE,
+    GEMINI_API_KEY, GEMINI_MODEL,
+)
+from services.spam_classifier import HAM, SPAM, SpamClassifier
+from services.text_analysis import TextAnalysis
+from services.verdict_cache import VerdictCache
+
+logger = logging.getLogger(__name__)
+
+
+class AdvertisementCheckMessage(BaseModel):
+    answer: bool = Field(..., description="True if the message contains advertisement or spam, False otherwise.")
+
+
+class AdvertisementBatchCheck(BaseModel):
+    verdicts: List[AdvertisementCheckMessage] = Field(
+        ..., description="One verdict per numbered message, in the same order."
+    )
+
+
+# ============================================================
+#                        БЭКЕНДЫ
+# ============================================================
+class ClassifierBackend:
+    """Классифицирует пачку текстов, возвращает по вердикту на каждый."""
+
+    async def warm_up(self) -> None:
+        """Тяжёлая инициализация (импорт SDK, клиент). Ошибка — бэкенд недоступен."""
+
+    async def classify(self, texts: Sequence[str]) -> List[AdvertisementCheckMessage]:
+        raise NotImplementedError
+
+
+class GeminiBackend(ClassifierBackend):
+
+    PROMPT = (
+        "Ниже пронумерованы сообщения из групповых чатов. Для каждого сообщения "
+        "определи, содержит ли оно спам, рекламу или нежелательный контент: "
+        "answer = true, если содержит, иначе false. Верни ровно {count} вердиктов "
+        "в том же порядке.\n\n{messages}"
+    )
+
+    def __init__(self, api_key: Optional[str] = GEMINI_API_KEY, model: str = GEMINI_MODEL):
+        # SDK импортируется долго (и его может не быть в офлайн-окружении) — клиент создаётся в warm_up
+        self.api_key = api_key
+        self.model = model
+        self.client = None
+
+    async def warm_up(self) -> None:
+        if self.client is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self.client = await loop.run_in_executor(None, self._make_client)
+
+    def _make_client(self):
+        from google import genai
+
+        return genai.Client(api_key=self.api_key)
+
+    async def classify(self, texts: Sequence[str]) -> List[AdvertisementCheckMessage]:
+        await self.warm_up()
+        messages = "\n\n".join(f"[{i + 1}]\n{text}" for i, text in enumerate(texts))
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=self.PROMPT.format(count=len(texts), messages=messages),
+            config={
+                "response_mime_type": "application/json",
+                "response_json_schema": AdvertisementBatchCheck.model_json_schema(),
+            },
+        )
+        return AdvertisementBatchCheck.model_validate_json(response.text).verdicts
+
+
+class FakeBackend(ClassifierBackend):
+    """Офлайн-бэкенд: спам — всё, где встречается один из маркеров."""
+
+    def __init__(self, latency: float = 0.05,
+                 markers: Sequence[str] = ("реклам", "подпис", "http", "t.me/", "бот", "скидк")):
+        self.latency = latency
+        self.markers = tuple(markers)
+        self.calls = 0
+        self.texts = 0
+
+    async def classify(self, texts: Sequence[str]) -> List[AdvertisementCheckMessage]:
+        self.calls += 1
+        self.texts += len(texts)
+        await asyncio.sleep(self.latency)
+        return [
+            AdvertisementCheckMessage(answer=any(m in text.lower() for m in self.markers))
+            for text in texts
+        ]
+
+
+def make_backend(name: str = AI_BACKEND) -> ClassifierBackend:
+    if name == "fake":
+        return FakeBackend()
+    return GeminiBackend()
+
+
+# ============================================================
+#                 ОЧЕРЕДЬ С МИКРО-БАТЧИНГОМ
+# ============================================================
+class Candidate(NamedTuple):
+    message: Any
+    analysis: TextAnalysis
+    enqueued_at: float
+
+
+async def delete_message(message: Any) -> None:
+    try:
+        await message.delete()
+    except Exception as e:
+        logger.warning("Не удалось удалить спам %s: %s", getattr(message, "message_id", "?"), e)
+
+
+class AIFilterPipeline:
+    """
+    Сообщения складываются в очередь и не задерживают хендлеры. Фоновая
+    задача собирает их в пачки (до `max_batch` штук или `max_delay` секунд),
+    одновременно в модель уходит не больше `max_in_flight` запросов.
+    Спам удаляется уже после того, как пришёл вердикт.
+
+    С `cache` повторы и вариации уже известного спама удаляются сразу,
+    без обращения к модели. `prefilter` — локальный классификатор: в модель
+    уходят только сообщения, в которых он не уверен, а её вердикты идут
+    ему же на дообучение.
+    """
+
+    def __init__(
+        self,
+        backend: ClassifierBackend,
+        max_batch: int = AI_BATCH_SIZE,
+        max_delay: float = AI_BATCH_WINDOW,
+        max_in_flight: int = AI_MAX_IN_FLIGHT,
+        queue_size: int = AI_QUEUE_SIZE,
+        on_spam: Callable[[Any], Awaitable[None]] = delete_message,
+        cache: Optional[VerdictCache] = None,
+        prefilter: Optional[SpamClassifier] = None,
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.prefilter = prefilter
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.on_spam = on_spam
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._warming: Optional[asyncio.Future] = None
+        self._in_flight = set()
+        # None — бэкенд прогревается, True — готов, False — недоступен (фильтр выключен)
+        self.available: Optional[bool] = None
+
+        self.submitted = 0
+        self.dropped = 0
+        self.batches = 0
+        self.flagged = 0
+        self.errors = 0
+        self.local_spam = 0
+        self.local_ham = 0
+        self.unchecked = 0
+        self.latencies = deque(maxlen=10_000)
+
+    @property
+    def running(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._batcher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дожидается разбора очереди и запросов в полёте."""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._batcher = None
+
+    async def warm_up(self) -> bool:
+        """
+        Прогрев бэкенда; повторные вызовы ждут ту же попытку. Возвращает, доступен ли бэкенд.
+
+        Пока идёт прогрев, сообщения копятся в очереди (не больше queue_size)
+        и будут проверены, когда модель станет доступна. Если прогрев не
+        удался, AI-фильтр выключается: работают только кэш вердиктов и
+        локальный классификатор, остальное пропускается без проверки.
+        """
+        if self._warming is None:
+            self._warming = asyncio.ensure_future(self._warm_backend())
+        await asyncio.shield(self._warming)
+        return bool(self.available)
+
+    async def _warm_backend(self) -> None:
+        try:
+            await self.backend.warm_up()
+        except Exception as e:
+            self.available = False
+            logger.error("AI-бэкенд недоступен, AI-фильтр выключен: %s", e)
+        else:
+            self.available = True
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    def submit(self, message: Any, analysis: TextAnalysis) -> bool:
+        if not self.running:
+            return False
+
+        if self.cache is not None:
+            verdict = self.cache.get(analysis)
+            if verdict is not None:
+                if verdict:
+                    self.flagged += 1
+                    self._spawn(self.on_spam(message))
+                return True
+
+        if self.prefilter is not None:
+            decision, _ = self.prefilter.decide(analysis)
+            if decision == SPAM:
+                self.local_spam += 1
+                self.flagged += 1
+                self._spawn(self.on_spam(message))
+                return True
+            if decision == HAM:
+                self.local_ham += 1
+                return True
+
+        if self.available is False:
+            # Модель недоступна: остальное пропускается без проверки
+            self.unchecked += 1
+            return False
+
+        try:
+            self._queue.put_nowait(Candidate(message, analysis, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    async def _collect(self) -> List[Candidate]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        await self.warm_up()
+        if not self.available:
+            # Проверить нечем, но конвейер не останавливаем: кэш и локальный классификатор
+            # в submit() работают дальше. Накопленное за время прогрева — пропускаем
+            while True:
+                await self._queue.get()
+                self.unchecked += 1
+                self._queue.task_done()
+        while True:
+            batch = await self._collect()
+            await self._slots.acquire()
+            self._spawn(self._classify(batch))
+
+    async def _classify(self, batch: List[Candidate]) -> None:
+        try:
+            # Модели — исходный текст: свёртка нужна нашим фильтрам, а не ей
+            verdicts = await self.backend.classify([c.analysis.raw for c in batch])
+        except Exception as e:
+            self.errors += 1
+            logger.warning("AI-классификация пачки из %d сообщений не удалась: %s", len(batch), e)
+            verdicts = []
+        finally:
+            self._slots.release()
+
+        self.batches += 1
+        now = time.monotonic()
+        for i, candidate in enumerate(batch):
+            self.latencies.append(now - candidate.enqueued_at)
+            try:
+                # Вердиктов меньше, чем сообщений — недостающие считаем чистыми и не кэшируем
+                if i < len(verdicts):
+                    await self._apply(candidate, verdicts[i].answer)
+            except Exception:
+                self.errors += 1
+                logger.exception("Вердикт AI не применён к сообщению %s",
+                                 getattr(candidate.message, "message_id", "?"))
+            finally:
+                # Иначе stop() навсегда застрянет на _queue.join()
+                self._queue.task_done()
+
+    async def _apply(self, candidate: Candidate, is_spam: bool) -> None:
+        if self.cache is not None:
+            self.cache.put(candidate.analysis, is_spam)
+        if self.prefilter is not None:
+            self.prefilter.learn(candidate.analysis, is_spam)
+        if is_spam:
+            self.flagged += 1
+            await self.on_spam(candidate.message)
+
+    def stats(self) -> dict:
+        stats = {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "flagged": self.flagged,
+            "errors": self.errors,
+            "local_spam": self.local_spam,
+            "local_ham": self.local_ham,
+            "unchecked": self.unchecked,
+            "backend": {None: "warming", True: "ready", False: "unavailable"}[self.available],
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": len(self._in_flight),
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
@@ -0,0 +1,144 @@
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import BANNED_WORDS
+from database.models import BadWord
+
+
+# ============================================================
+#                     AHO-CORASICK
+# ============================================================
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик: все шаблоны ищутся в тексте за один линейный проход,
+    независимо от их количества.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "size")
+
+    def __init__(self, patterns: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Optional[str]] = [None]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(None)
+                state = nxt
+            out[state] = pattern
+
+        # Суффиксные ссылки строим обходом в ширину
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                # Выход по суффиксной ссылке: короткий шаблон внутри длинного
+                if out[nxt] is None:
+                    out[nxt] = out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self.size = len(goto)
+
+    def search(self, text: str) -> Optional[str]:
+        """Первый найденный шаблон или None."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+
+# ============================================================
+#             ПЕРЕГРУЖАЕМЫЙ КЭШ АВТОМАТОВ ПО ГРУППАМ
+# ============================================================
+class BadWordIndex:
+    """
+    Бан-лист группы (BadWord) + глобальные BANNED_WORDS, скомпилированные в
+    один автомат. Автомат пересобирается только после изменения списка.
+    """
+
+    def __init__(self, defaults: Iterable[str] = BANNED_WORDS,
+                 normalize: Optional[Callable[[str], str]] = None):
+        self.defaults = {w.lower() for w in defaults}
+        self.normalize = normalize
+        self._words: Dict[int, Set[str]] = {}
+        self._compiled: Dict[Optional[int], AhoCorasick] = {}
+
+    def _patterns(self, word: str) -> Set[str]:
+        # Сообщения сравниваются в нормальной форме, поэтому добавляем и её
+        patterns = {word}
+        if self.normalize:
+            patterns.add(self.normalize(word))
+        return patterns
+
+    def set_words(self, group_id: int, words: Iterable[str]) -> None:
+        self._words[group_id] = {w.lower() for w in words}
+        self._compiled.pop(group_id, None)
+
+    def add_word(self, group_id: int, word: str) -> None:
+        words = self._words.setdefault(group_id, set())
+        word = word.lower()
+        if word not in words:
+            words.add(word)
+            self._compiled.pop(group_id, None)
+
+    def remove_word(self, group_id: int, word: str) -> None:
+        words = self._words.get(group_id)
+        if words and word.lower() in words:
+            words.discard(word.lower())
+            self._compiled.pop(group_id, None)
+
+    def invalidate(self, group_id: Optional[int] = None) -> None:
+        if group_id is None:
+            self._words.clear()
+            self._compiled.clear()
+        else:
+            self._words.pop(group_id, None)
+            self._compiled.pop(group_id, None)
+
+    def recompile(self) -> None:
+        """Списки те же, поменялась нормализация (догрузилась морфология) — пересобрать автоматы."""
+        self._compiled.clear()
+
+    def is_loaded(self, group_id: int) -> bool:
+        return group_id in self._words
+
+    async def load(self, session: AsyncSession, group_id: int) -> None:
+        words = await session.scalars(select(BadWord.word).filter_by(group_id=group_id))
+        self.set_words(group_id, words.all())
+
+    def matcher(self, group_id: Optional[int] = None) -> AhoCorasick:
+        automaton = self._compiled.get(group_id)
+        if automaton is None:
+            patterns: Set[str] = set()
+            for word in self.defaults | self._words.get(group_id, set()):
+                patterns |= self._patterns(word)
+            automaton = self._compiled[group_id] = AhoCorasick(sorted(patterns))
+        return automaton
+
+    async def get(self, session: AsyncSession, group_id: Optional[int]) -> AhoCorasick:
+        if group_id is not None and not self.is_loaded(group_id):
+            await self.load(session, group_id)
+        return self.matcher(group_id)
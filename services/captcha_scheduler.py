@@ -0,0 +1,297 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiogram.types import ChatPermissions
+from sqlalchemy import delete, exists, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+
+from config import CAPTCHA_EXPIRE_ACTION, CAPTCHA_TIMEOUT
+from database.cache import user_cache
+from database.models import ChatUser, Group, PendingCaptcha, Session
+from database.user_journal import UserStateJournal, user_journal
+from services.action_executor import ActionExecutor, action_executor
+from services.metrics import metrics
+from services.shard_sync import shard_sync
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, int]  # (chat_id, user_id)
+
+# Пачка строк на один запрос — чтобы не упереться в лимит параметров SQLite
+CHUNK = 500
+
+
+class Pending:
+    __slots__ = ("chat_id", "user_id", "group_id", "message_id", "expires_at")
+
+    def __init__(self, chat_id: int, user_id: int, group_id: Optional[int],
+                 message_id: Optional[int], expires_at: float):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.group_id = group_id
+        self.message_id = message_id
+        self.expires_at = expires_at
+
+
+# ============================================================
+#          ПЛАНИРОВЩИК ИСТЕЧЕНИЯ КАПЧИ (ОДНА КУЧА ТАЙМЕРОВ)
+# ============================================================
+class CaptchaScheduler:
+    """
+    Все ожидающие капчи лежат в одной куче (heapq) по времени истечения и
+    обслуживаются одной фоновой задачей — никаких sleep-задач на каждого
+    пользователя. Отмена ленивая: запись убирается из словаря, а её
+    устаревший элемент кучи пропускается при извлечении.
+
+    Состояние дублируется в таблицу pending_captchas пачками, поэтому после
+    перезапуска таймеры восстанавливаются из базы.
+    """
+
+    def __init__(self, timeout: float = CAPTCHA_TIMEOUT, action: str = CAPTCHA_EXPIRE_ACTION,
+                 executor: ActionExecutor = action_executor, session_factory=Session,
+                 journal: UserStateJournal = user_journal, flush_interval: float = 1.0):
+        self.timeout = timeout
+        self.action = action
+        self.executor = executor
+        self.session_factory = session_factory
+        self.journal = journal
+        self.flush_interval = flush_interval
+
+        self._pending: Dict[Key, Pending] = {}
+        self._heap: List[Tuple[float, Key]] = []
+        self._to_save: Dict[Key, Pending] = {}
+        self._to_forget: Set[Key] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.expired = 0
+        self.cancelled = 0
+
+    # ---------------------------
+    # Жизненный цикл
+    # ---------------------------
+    async def start(self) -> None:
+        await self.load()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Не cancel: цикл может быть посреди flush — даём ему закончить
+        if self._runner is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._runner
+            self._runner = None
+        await self.flush()
+
+    async def load(self) -> int:
+        """
+        Восстанавливает таймеры из базы (в т.ч. уже просроченные — истекут сразу)
+        и сбрасывает капчи, оставшиеся без таймера. В шардированном режиме — только
+        для своих чатов.
+        """
+        async with self.session_factory() as session:
+            rows = [row for row in (await session.scalars(select(PendingCaptcha))).all()
+                    if shard_sync.owns(row.chat_id)]
+            released = await self._release_orphans(session)
+        if released:
+            logger.info("Капча без таймера у %d пользователей: пришлём заново", released)
+        for row in rows:
+            entry = Pending(row.chat_id, row.user_id, row.group_id, row.message_id, row.expires_at)
+            key = (row.chat_id, row.user_id)
+            self._pending[key] = entry
+            self._heap.append((entry.expires_at, key))
+        heapq.heapify(self._heap)
+        return len(rows)
+
+    @staticmethod
+    async def _release_orphans(session) -> int:
+        """
+        Капча «отправлена», но таймера нет (пользователи старой версии, падение между
+        записью журнала и таймеров): такой пользователь заперт — его сообщения удаляются,
+        новая капча не приходит. Сбрасываем is_captcha_sent, чтобы её выслали снова.
+        """
+        has_timer = exists().where(PendingCaptcha.chat_id == Group.chat_id,
+                                   PendingCaptcha.user_id == ChatUser.user_id)
+        rows = (await session.execute(
+            select(ChatUser.id, Group.chat_id)
+            .join(Group, Group.id == ChatUser.group_id)
+            .where(ChatUser.is_captcha_sent.is_(True), ChatUser.is_verified.is_not(True), ~has_timer)
+        )).all()
+        ids = [row_id for row_id, chat_id in rows if shard_sync.owns(chat_id)]
+        for i in range(0, len(ids), CHUNK):
+            await session.execute(update(ChatUser).where(ChatUser.id.in_(ids[i:i + CHUNK]))
+                                  .values(is_captcha_sent=False))
+        await session.commit()
+        return len(ids)
+
+    # ---------------------------
+    # Операции
+    # ---------------------------
+    def schedule(self, chat_id: int, user_id: int, group_id: Optional[int] = None) -> None:
+        key = (chat_id, user_id)
+        expires_at = time.time() + self.timeout
+        entry = Pending(chat_id, user_id, group_id, None, expires_at)
+        self._pending[key] = entry
+        self._to_save[key] = entry
+        self._to_forget.discard(key)
+        heapq.heappush(self._heap, (expires_at, key))
+        self._compact()
+        # Новый таймер раньше текущего — будим цикл, чтобы пересчитал сон
+        if self._wakeup is not None and self._heap[0][1] == key:
+            self._wakeup.set()
+
+    def set_prompt(self, chat_id: int, user_id: int, message_id: int) -> None:
+        """Капча отправлена — запоминаем сообщение, чтобы удалить его по истечении."""
+        entry = self._pending.get((chat_id, user_id))
+        if entry is None:
+            # Истекла или пройдена раньше, чем ушло сообщение
+            self.executor.delete(chat_id, message_id)
+            return
+        entry.message_id = message_id
+        self._to_save[(chat_id, user_id)] = entry
+
+    def cancel(self, chat_id: int, user_id: int) -> Optional[Pending]:
+        key = (chat_id, user_id)
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            self.cancelled += 1
+            self._to_save.pop(key, None)
+            self._to_forget.add(key)
+        self._compact()
+        return entry
+
+    def _compact(self) -> None:
+        # Отменённые элементы копятся в куче — перестраиваем, когда их больше половины
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._pending):
+            self._heap = [(e.expires_at, k) for k, e in self._pending.items()]
+            heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    # ---------------------------
+    # Фоновый цикл
+    # ---------------------------
+    def _pop_due(self, now: float, limit: int = 1000) -> List[Pending]:
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(due) < limit:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._pending.get(key)
+            # Устаревший элемент: капчу отменили или перевыпустили
+            if entry is None or entry.expires_at != expires_at:
+                continue
+            del self._pending[key]
+            self._to_save.pop(key, None)
+            self._to_forget.add(key)
+            due.append(entry)
+        return due
+
+    async def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stopping:
+            now = time.time()
+            due = self._pop_due(now)
+            if due:
+                self._expire(due)
+
+            if time.monotonic() - last_flush >= self.flush_interval:
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Не удалось сохранить состояние капч")
+                last_flush = time.monotonic()
+
+            # Рейд: истекает сразу много — разбираем порциями, отдавая loop другим
+            if self._heap and self._heap[0][0] <= time.time() and not self._stopping:
+                await asyncio.sleep(0)
+                continue
+
+            sleep_for = self.flush_interval
+            if self._heap:
+                sleep_for = min(sleep_for, max(0.0, self._heap[0][0] - time.time()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    def _expire(self, entries: List[Pending]) -> None:
+        for entry in entries:
+            self.expired += 1
+            metrics.inc_chat("bot_captcha_expired_total", entry.chat_id)
+            if entry.message_id:
+                self.executor.delete(entry.chat_id, entry.message_id)
+            if self.action == "restrict":
+                self.executor.call(
+                    entry.chat_id, "restrict_chat_member",
+                    user_id=entry.user_id,
+                    permissions=ChatPermissions(can_send_messages=False),
+                )
+            else:
+                # Кик = бан + разбан: пользователь вылетает, но может зайти снова
+                self.executor.ban(entry.chat_id, entry.user_id)
+                self.executor.call(entry.chat_id, "unban_chat_member",
+                                   user_id=entry.user_id, only_if_banned=True)
+            # Вернётся и напишет — получит капчу заново
+            if entry.group_id is not None:
+                self.journal.record(entry.group_id, entry.user_id, is_captcha_sent=False)
+            user_cache.invalidate(entry.user_id, entry.chat_id)
+
+    # ---------------------------
+    # Сохранение
+    # ---------------------------
+    async def flush(self) -> None:
+        """Все накопленные изменения — одной транзакцией."""
+        if not (self._to_save or self._to_forget):
+            return
+        to_save, self._to_save = list(self._to_save.values()), {}
+        to_forget, self._to_forget = list(self._to_forget), set()
+        try:
+            await self._write(to_save, to_forget)
+        except BaseException:
+            # Не записали — вернём в очередь, не затирая более свежие изменения
+            for entry in to_save:
+                self._to_save.setdefault((entry.chat_id, entry.user_id), entry)
+            self._to_forget.update(k for k in to_forget if k not in self._pending)
+            raise
+
+    async def _write(self, to_save: List[Pending], to_forget: List[Key]) -> None:
+        async with self.session_factory() as session:
+            for i in range(0, len(to_forget), CHUNK):
+                await session.execute(
+                    delete(PendingCaptcha).where(
+                        tuple_(PendingCaptcha.chat_id, PendingCaptcha.user_id).in_(to_forget[i:i + CHUNK])
+                    )
+                )
+            for i in range(0, len(to_save), CHUNK):
+                stmt = insert(PendingCaptcha).values([{
+                    "chat_id": e.chat_id, "user_id": e.user_id, "group_id": e.group_id,
+                    "message_id": e.message_id, "expires_at": e.expires_at,
+                } for e in to_save[i:i + CHUNK]])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PendingCaptcha.chat_id, PendingCaptcha.user_id],
+                    set_={
+                        "message_id": stmt.excluded.message_id,
+                        "expires_at": stmt.excluded.expires_at,
+                    },
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "heap": len(self._heap),
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+        }
+
+
+captcha_scheduler = CaptchaScheduler()
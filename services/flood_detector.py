@@ -0,0 +1,147 @@
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from database.settings_cache import FloodThresholds
+
+PASS, DROP, LOCKDOWN = "pass", "drop", "lockdown"
+
+
+class Ring:
+    """
+    Последние `capacity` отметок времени в кольцевом буфере.
+
+    hit() возвращает True, если событие — больше чем `capacity`-е за окно:
+    достаточно сравнить с самой старой из хранимых отметок, то есть O(1).
+    """
+
+    __slots__ = ("times", "pos")
+
+    def __init__(self, capacity: int):
+        self.times = array("d", bytes(8 * max(1, capacity)))
+        self.pos = 0
+
+    def hit(self, now: float, window: float) -> bool:
+        times = self.times
+        oldest = times[self.pos]
+        times[self.pos] = now
+        self.pos = (self.pos + 1) % len(times)
+        return oldest > 0 and now - oldest < window
+
+
+class ChatState:
+    __slots__ = ("limits", "messages", "joins", "users", "texts", "lockdown_until")
+
+    def __init__(self, limits: FloodThresholds):
+        self.limits = limits
+        self.messages = Ring(limits.chat_messages)
+        self.joins = Ring(limits.joins)
+        self.users: "OrderedDict[int, Ring]" = OrderedDict()
+        self.texts: "OrderedDict[int, Ring]" = OrderedDict()
+        self.lockdown_until = 0.0
+
+
+def _bounded(store: OrderedDict, key: int, capacity: int, maxsize: int) -> Ring:
+    ring = store.get(key)
+    if ring is None:
+        ring = store[key] = Ring(capacity)
+        if len(store) > maxsize:
+            store.popitem(last=False)
+    else:
+        store.move_to_end(key)
+    return ring
+
+
+# ============================================================
+#                 ДЕТЕКТОР ФЛУДА И РЕЙДОВ
+# ============================================================
+class FloodDetector:
+    """
+    Скользящие окна на кольцевых буферах: по чату, по пользователю, по
+    одинаковому тексту и по вступлениям. Работает целиком в памяти и
+    вызывается до любых обращений к базе.
+
+    Всплеск сообщений или вступлений переводит чат в режим lockdown на
+    `lockdown_seconds`; флуд одного пользователя и повторы текста просто
+    отбрасываются.
+    """
+
+    def __init__(self, max_users: int = 2000, max_texts: int = 512):
+        self.max_users = max_users
+        self.max_texts = max_texts
+        self._chats: Dict[int, ChatState] = {}
+
+        self.dropped = 0
+        self.lockdowns = 0
+
+    def _state(self, chat_id: int, limits: FloodThresholds) -> ChatState:
+        state = self._chats.get(chat_id)
+        if state is None or state.limits != limits:
+            # Пороги поменялись — буферы другого размера, начинаем заново (lockdown сохраняем)
+            lockdown_until = state.lockdown_until if state else 0.0
+            state = self._chats[chat_id] = ChatState(limits)
+            state.lockdown_until = lockdown_until
+        return state
+
+    def _lock(self, state: ChatState, now: float) -> str:
+        already = state.lockdown_until > now
+        state.lockdown_until = now + state.limits.lockdown_seconds
+        if already:
+            return PASS
+        self.lockdowns += 1
+        return LOCKDOWN
+
+    def on_message(self, chat_id: int, user_id: int, text_hash: Optional[int],
+                   limits: FloodThresholds, now: Optional[float] = None) -> str:
+        now = time.monotonic() if now is None else now
+        state = self._state(chat_id, limits)
+
+        if state.messages.hit(now, limits.window_seconds):
+            verdict = self._lock(state, now)
+            if verdict == LOCKDOWN:
+                return verdict
+
+        if _bounded(state.users, user_id, limits.user_messages, self.max_users).hit(now, limits.window_seconds):
+            self.dropped += 1
+            return DROP
+
+        if text_hash is not None and _bounded(
+            state.texts, text_hash, limits.duplicates, self.max_texts
+        ).hit(now, limits.join_window_seconds):
+            self.dropped += 1
+            return DROP
+
+        return PASS
+
+    def on_join(self, chat_id: int, limits: FloodThresholds, count: int = 1,
+                now: Optional[float] = None) -> str:
+        now = time.monotonic() if now is None else now
+        state = self._state(chat_id, limits)
+        burst = False
+        for _ in range(count):
+            burst = state.joins.hit(now, limits.join_window_seconds) or burst
+        return self._lock(state, now) if burst else PASS
+
+    def in_lockdown(self, chat_id: int, now: Optional[float] = None) -> bool:
+        state = self._chats.get(chat_id)
+        if state is None:
+            return False
+        return state.lockdown_until > (time.monotonic() if now is None else now)
+
+    def lift(self, chat_id: int) -> None:
+        state = self._chats.get(chat_id)
+        if state is not None:
+            state.lockdown_until = 0.0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "chats": len(self._chats),
+            "in_lockdown": sum(1 for s in self._chats.values() if s.lockdown_until > now),
+            "lockdowns": self.lockdowns,
+            "dropped": self.dropped,
+        }
+
+
+flood_detector = FloodDetector()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+#              ЛЕММАТИЗАЦИЯ С КЭШЕМ И ВЫНОСОМ ИЗ LOOP
+# ============================================================
+class Lemmatizer:
+    """
+    Обёртка над pymorphy3 с ограниченным кэшем слово -> лемма.
+
+    Лексика чатов сильно повторяется, так что большая часть слов отдаётся из
+    кэша. Длинные сообщения (рекламные простыни) разбираются в отдельном
+    потоке, чтобы не задерживать остальные чаты.
+
+    Словари pymorphy3 загружаются не при импорте, а в `warm_up()` (фоном
+    после старта) или при первом обращении к `morph`. Пока `ready` ложно,
+    вызывающий сам решает, ждать ли морфологию (см. CensorshipMiddleware).
+    """
+
+    def __init__(self, maxsize: int = 100_000, offload_threshold: int = 64, workers: int = 2):
+        self._morph = None
+        self._on_ready: List[Callable[[], None]] = []
+        self.offload_threshold = offload_threshold
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lemmatizer")
+        self.lemma = lru_cache(maxsize=maxsize)(self._parse)
+
+        self.calls = 0
+        self.offloaded = 0
+        self.total_time = 0.0
+        self.load_time: Optional[float] = None
+
+    # ---------------------------
+    # Загрузка словарей
+    # ---------------------------
+    @property
+    def ready(self) -> bool:
+        return self._morph is not None
+
+    @property
+    def morph(self):
+        if self._morph is None:
+            self._set(self._build())
+        return self._morph
+
+    @staticmethod
+    def _build():
+        import pymorphy3
+
+        return pymorphy3.MorphAnalyzer()
+
+    def _set(self, morph) -> None:
+        if self._morph is not None:
+            return
+        self._morph = morph
+        for callback in self._on_ready:
+            callback()
+        self._on_ready.clear()
+
+    def on_ready(self, callback: Callable[[], None]) -> None:
+        """Вызвать после загрузки словарей (сразу, если уже загружены)."""
+        if self.ready:
+            callback()
+        else:
+            self._on_ready.append(callback)
+
+    async def warm_up(self) -> None:
+        """Загружает словари в потоке — event loop в это время обрабатывает апдейты."""
+        if self.ready:
+            return
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        morph = await loop.run_in_executor(self._executor, self._build)
+        self._set(morph)
+        self.load_time = time.perf_counter() - started
+        logger.info("Морфология загружена за %.2f с", self.load_time)
+
+    def _parse(self, word: str) -> str:
+        return self.morph.parse(word)[0].normal_form
+
+    def lemmatize(self, words: Sequence[str]) -> List[str]:
+        started = time.perf_counter()
+        lemma = self.lemma
+        lemmas = [lemma(word) for word in words]
+        self.calls += 1
+        self.total_time += time.perf_counter() - started
+        return lemmas
+
+    async def lemmatize_async(self, words: Sequence[str]) -> List[str]:
+        if len(words) < self.offload_threshold:
+            return self.lemmatize(words)
+        self.offloaded += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.lemmatize, words)
+
+    def normal_form(self, text: str) -> str:
+        return " ".join(self.lemmatize(text.split()))
+
+    def stats(self) -> dict:
+        info = self.lemma.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "cache_size": info.currsize,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+            "calls": self.calls,
+            "offloaded": self.offloaded,
+            "total_ms": round(self.total_time * 1000, 2),
+            "avg_us": round(self.total_time / self.calls * 1e6, 1) if self.calls else 0.0,
+            "ready": self.ready,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+lemmatizer = Lemmatizer()
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import LINK_ALLOWLIST, LINK_DENYLIST, LINK_DENYLIST_PATH, LINK_VERDICT_CACHE_SIZE
+from database.models import LinkRule
+from services.text_analysis import TextAnalysis
+
+logger = logging.getLogger(__name__)
+
+NONE, ALLOW, DENY = 0, 1, 2
+
+_TELEGRAM = {"t.me", "telegram.me", "telegram.dog"}
+# Приглашения в закрытые чаты (t.me/+hash, t.me/joinchat/hash) — один псевдо-домен
+INVITE = "joinchat.t.me"
+_HOST_RE = re.compile(r"[a-z0-9_-]+(?:\.[a-z0-9_-]+)+")
+_TRAILING = ".,;:!?)]}>»\"'"
+
+
+# ---------------------------
+# Ссылка -> домен
+# ---------------------------
+def normalize_domain(value: str) -> Optional[str]:
+    """'https://Sub.Example.com:443/x', '*.example.com', 'пример.рф' -> домен в ASCII или None."""
+    value = value.strip().rstrip(_TRAILING).lower()
+    if value.startswith("*."):
+        value = value[2:]
+    try:
+        host = urlsplit(value if "://" in value else "//" + value).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.strip(".")
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    return host if _HOST_RE.fullmatch(host) else None
+
+
+def link_host(link: str) -> Optional[str]:
+    """
+    Домен ссылки. Ссылки на Telegram превращаются в псевдо-домены, чтобы
+    каналы и приглашения жили в том же дереве: t.me/name и @name -> name.t.me,
+    t.me/+hash -> joinchat.t.me. Запрет «t.me» закрывает все сразу.
+    """
+    host = normalize_domain(link)
+    if host not in _TELEGRAM:
+        return host
+    link = link.rstrip(_TRAILING)
+    path = urlsplit(link if "://" in link else "//" + link).path.strip("/")
+    name = path.split("/", 1)[0]
+    if not name:
+        return "t.me"
+    if name == "joinchat" or name.startswith("+"):
+        return INVITE
+    return f"{name}.t.me"
+
+
+def rule_domain(value: str) -> Optional[str]:
+    """Домен для списка из ввода админа: домен, ссылка, t.me/канал или @канал."""
+    if value.startswith("@") and len(value) > 1:
+        return f"{value[1:].lower()}.t.me"
+    return link_host(value)
+
+
+# ============================================================
+#        ДЕРЕВО ДОМЕНОВ ПО МЕТКАМ СПРАВА НАЛЕВО (СКОМПИЛИРОВАННОЕ)
+# ============================================================
+class DomainTrie:
+    """
+    Списки доменов: ru -> example -> promo. Вердикт домена наследуют все
+    поддомены, самый длинный совпавший суффикс побеждает — так
+    «docs.example.com» можно разрешить внутри запрещённого «example.com».
+
+    Узлы — номера, рёбра — один словарь (узел, метка) -> узел, вердикты —
+    bytearray: ни словаря на каждый узел, ни объектов-узлов. Поиск — одно
+    обращение к словарю на метку домена, сколько бы доменов ни было в списке.
+    На одном домене разрешение сильнее запрета.
+    """
+
+    __slots__ = ("_edges", "_verdicts", "size")
+
+    def __init__(self, rules: Iterable[Tuple[str, int]] = ()):
+        self._edges: Dict[Tuple[int, str], int] = {}
+        self._verdicts = bytearray(1)
+        self.size = 0
+        for domain, verdict in rules:
+            self.add(domain, verdict)
+
+    def add(self, domain: str, verdict: int) -> None:
+        edges, verdicts = self._edges, self._verdicts
+        node = 0
+        for label in reversed(domain.split(".")):
+            key = (node, sys.intern(label))
+            child = edges.get(key)
+            if child is None:
+                child = edges[key] = len(verdicts)
+                verdicts.append(NONE)
+            node = child
+        if verdicts[node] == NONE:
+            self.size += 1
+        if verdicts[node] != ALLOW:
+            verdicts[node] = verdict
+
+    def lookup(self, host: str) -> int:
+        edges, verdicts = self._edges, self._verdicts
+        node, verdict = 0, NONE
+        for label in reversed(host.split(".")):
+            node = edges.get((node, label))
+            if node is None:
+                break
+            if verdicts[node]:
+                verdict = verdicts[node]
+        return verdict
+
+    def __len__(self) -> int:
+        return self.size
+
+
+# ============================================================
+#                 ФИЛЬТР ССЫЛОК: СПИСКИ + КЭШ ВЕРДИКТОВ
+# ============================================================
+class LinkFilter:
+    """
+    Ссылки сообщения (из TextAnalysis: текст, сущности url и text_link,
+    упоминания @name) против списков доменов.
+
+    Общий список — LINK_ALLOWLIST / LINK_DENYLIST из config плюс файл
+    LINK_DENYLIST_PATH (сотни тысяч доменов): он собирается фоном в
+    `load_global()` (шаг прогрева), до этого действуют встроенные списки.
+    Списки групп (LinkRule) загружаются при первой ссылке в группе и
+    сильнее общего: разрешённое группой не запрещается общим списком.
+
+    Вердикты кэшируются по (группа, домен); любое изменение списков
+    сбрасывает кэш целиком — меняются они редко.
+    """
+
+    def __init__(self, allow: Iterable[str] = LINK_ALLOWLIST, deny: Iterable[str] = LINK_DENYLIST,
+                 path: Optional[str] = LINK_DENYLIST_PATH, cache_size: int = LINK_VERDICT_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._builtin = [(d, ALLOW) for d in allow] + [(d, DENY) for d in deny]
+        self._global = DomainTrie(self._builtin)
+        self._groups: Dict[int, DomainTrie] = {}
+        self._verdicts: "OrderedDict[Tuple[Optional[int], str], int]" = OrderedDict()
+        self.load_time: Optional[float] = None
+
+        self.lookups = 0
+        self.cache_hits = 0
+
+    # ---------------------------
+    # Общий список
+    # ---------------------------
+    async def load_global(self) -> Optional[bool]:
+        """Шаг прогрева: собирает большой список в потоке, event loop не ждёт."""
+        if not self.path:
+            return None
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            trie = await loop.run_in_executor(None, self.build_global, self.path)
+        except OSError as e:
+            logger.error("Список доменов %s не загружен: %s", self.path, e)
+            return False
+        self._global = trie
+        self._verdicts.clear()
+        self.load_time = time.perf_counter() - started
+        logger.info("Список доменов: %d записей за %.2f с", len(trie), self.load_time)
+        return True
+
+    def build_global(self, path: str) -> DomainTrie:
+        trie = DomainTrie()
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                # Формат hosts: «0.0.0.0 domain» — домен последним полем
+                domain = normalize_domain(fields[-1]) if fields else None
+                if domain:
+                    trie.add(domain, DENY)
+        for domain, verdict in self._builtin:
+            trie.add(domain, verdict)
+        return trie
+
+    # ---------------------------
+    # Списки групп
+    # ---------------------------
+    async def get(self, session: AsyncSession, group_id: Optional[int]) -> Optional[DomainTrie]:
+        if group_id is None:
+            return None
+        trie = self._groups.get(group_id)
+        if trie is None:
+            rows = await session.execute(select(LinkRule.domain, LinkRule.action).filter_by(group_id=group_id))
+            trie = self._groups[group_id] = DomainTrie(
+                (domain, ALLOW if action == "allow" else DENY) for domain, action in rows
+            )
+        return trie
+
+    def invalidate(self, group_id: Optional[int] = None) -> None:
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(group_id, None)
+        self._verdicts.clear()
+
+    # ---------------------------
+    # Проверка
+    # ---------------------------
+    def verdict(self, group_id: Optional[int], group_trie: Optional[DomainTrie], host: str) -> int:
+        self.lookups += 1
+        key = (group_id, host)
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self.cache_hits += 1
+            self._verdicts.move_to_end(key)
+            return verdict
+
+        verdict = group_trie.lookup(host) if group_trie else NONE
+        if verdict == NONE:
+            verdict = self._global.lookup(host)
+        self._verdicts[key] = verdict
+        if len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+        return verdict
+
+    def check(self, group_id: Optional[int], group_trie: Optional[DomainTrie],
+              analysis: TextAnalysis, policy: str) -> Optional[str]:
+        """
+        Домен, из-за которого сообщение надо удалить, или None.
+        deny — только запрещённые домены; strict — всё, что не разрешено явно.
+        Упоминания @name проверяются только по запретам: в strict они не ссылки.
+        """
+        for link in analysis.links:
+            host = link_host(link)
+            if host is None:
+                continue
+            verdict = self.verdict(group_id, group_trie, host)
+            if verdict == DENY or (policy == "strict" and verdict != ALLOW):
+                return host
+        for mention in analysis.mentions:
+            host = f"{mention[1:]}.t.me"
+            if self.verdict(group_id, group_trie, host) == DENY:
+                return host
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "global_domains": len(self._global),
+            "groups": len(self._groups),
+            "cached": len(self._verdicts),
+            "lookups": self.lookups,
+            "hit_ratio": round(self.cache_hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+link_filter = LinkFilter()
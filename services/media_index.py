@@ -0,0 +1,365 @@
+import asyncio
+import io
+import logging
+import math
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations
+from operator import mul
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import BANNED_STICKER_EMOJI, MEDIA_DOWNLOADS, MEDIA_HASH_CACHE_SIZE, MEDIA_PHASH_DISTANCE
+from database.models import BannedMedia
+
+logger = logging.getLogger(__name__)
+
+EMOJI, FILE, SET, PHASH = "emoji", "file", "set", "phash"
+
+
+# ============================================================
+#                 ПЕРЦЕПТИВНЫЙ ХЭШ (pHash, 64 бита)
+# ============================================================
+_SIZE = 32     # картинка сжимается до 32x32 в оттенках серого
+_LOW = 8       # из DCT берутся частоты 8x8 — общая форма, а не детали
+_COS = [[math.cos(math.pi * (2 * x + 1) * u / (2 * _SIZE)) for x in range(_SIZE)] for u in range(_LOW)]
+
+
+def phash(pixels: Sequence[int]) -> int:
+    """
+    pHash по 32x32 яркостям (построчно): DCT, низкие частоты 8x8, бит —
+    выше ли коэффициент медианы. Пережатие, масштаб и мелкие правки меняют
+    лишь несколько бит, поэтому похожие картинки ищутся по расстоянию Хэмминга.
+    """
+    # DCT разделимое: сначала по строкам (только нужные 8 частот), потом по столбцам
+    rows = [[sum(map(mul, cos, pixels[y * _SIZE:(y + 1) * _SIZE])) for cos in _COS] for y in range(_SIZE)]
+    coeffs = [sum(map(mul, cos, [row[u] for row in rows])) for cos in _COS for u in range(_LOW)]
+    ordered = sorted(coeffs)
+    median = (ordered[31] + ordered[32]) / 2
+    value = 0
+    for bit, coeff in enumerate(coeffs):
+        if coeff > median:
+            value |= 1 << bit
+    return value
+
+
+def image_phash(data: bytes) -> int:
+    """pHash файла картинки (JPEG, PNG, WebP, первый кадр GIF). Pillow грузится при первом вызове."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        small = image.convert("L").resize((_SIZE, _SIZE), Image.Resampling.LANCZOS)
+    return phash(small.tobytes())
+
+
+def to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+# ============================================================
+#         ИНДЕКС ПО РАССТОЯНИЮ ХЭММИНГА (MULTI-INDEX HASHING)
+# ============================================================
+@lru_cache(maxsize=None)
+def _masks(width: int, radius: int) -> List[int]:
+    """Все маски из `width` бит с не больше чем `radius` единицами."""
+    return [sum(1 << bit for bit in bits) for r in range(radius + 1) for bits in combinations(range(width), r)]
+
+
+class HammingIndex:
+    """
+    Поиск хэша на расстоянии не больше `max_distance` без перебора всего списка.
+
+    64 бита режутся на 4 полосы по 16. Если хэши отличаются не больше чем
+    на d бит, то хотя бы в одной полосе — не больше чем на d // 4
+    (принцип Дирихле, как в SimHashIndex). Поэтому в каждой полосе
+    проверяются корзины всех ключей в радиусе d // 4 от ключа запроса:
+    при d = 8 это 4 * 137 словарных обращений при любом размере списка, а
+    в корзине по 16-битному ключу — единицы хэшей.
+
+    BK-дерево на таких данных обходит почти все узлы и на Python медленнее
+    простого перебора (см. benchmarks/bench_media_index.py).
+    """
+
+    BANDS, WIDTH = 4, 16
+
+    __slots__ = ("max_distance", "_masks", "_tables", "size")
+
+    def __init__(self, max_distance: int = MEDIA_PHASH_DISTANCE, values: Iterable[int] = ()):
+        self.max_distance = max_distance
+        self._masks = _masks(self.WIDTH, max_distance // self.BANDS)
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self.BANDS)]
+        self.size = 0
+        for value in values:
+            self.add(value)
+
+    def _keys(self, value: int):
+        mask = (1 << self.WIDTH) - 1
+        for band, table in enumerate(self._tables):
+            yield table, value >> (band * self.WIDTH) & mask
+
+    def add(self, value: int) -> bool:
+        if self.find(value, 0) is not None:
+            return False
+        for table, key in self._keys(value):
+            table.setdefault(key, []).append(value)
+        self.size += 1
+        return True
+
+    def find(self, value: int, max_distance: Optional[int] = None) -> Optional[int]:
+        """Любой хэш на расстоянии <= max_distance или None."""
+        limit = self.max_distance if max_distance is None else max_distance
+        masks = self._masks if max_distance is None else (0,)
+        for table, key in self._keys(value):
+            for mask in masks:
+                bucket = table.get(key ^ mask)
+                if bucket:
+                    for candidate in bucket:
+                        if (candidate ^ value).bit_count() <= limit:
+                            return candidate
+        return None
+
+    def __len__(self) -> int:
+        return self.size
+
+
+# ============================================================
+#                    ЧТО ЗА МЕДИА В СООБЩЕНИИ
+# ============================================================
+class MediaRef(NamedTuple):
+    kind: str                      # sticker | photo | animation
+    file_unique_id: str
+    set_name: Optional[str] = None
+    emoji: Optional[str] = None
+    # Что скачивать для pHash: миниатюра (у анимированных стикеров и GIF
+    # другой картинки нет) или самый маленький размер фото
+    thumb_id: Optional[str] = None
+    thumb_unique_id: Optional[str] = None
+
+
+def media_of(message) -> Optional[MediaRef]:
+    sticker = message.sticker
+    if sticker is not None:
+        thumb = sticker.thumbnail
+        if thumb is not None:
+            thumb_id, thumb_unique_id = thumb.file_id, thumb.file_unique_id
+        elif not sticker.is_animated and not sticker.is_video:
+            thumb_id, thumb_unique_id = sticker.file_id, sticker.file_unique_id
+        else:
+            thumb_id = thumb_unique_id = None
+        return MediaRef("sticker", sticker.file_unique_id, sticker.set_name, sticker.emoji,
+                        thumb_id, thumb_unique_id)
+
+    if message.photo:
+        # Размеры одного фото — от меньшего к большему; для 32x32 хватает самого маленького
+        smallest, largest = message.photo[0], message.photo[-1]
+        return MediaRef("photo", largest.file_unique_id,
+                        thumb_id=smallest.file_id, thumb_unique_id=smallest.file_unique_id)
+
+    animation = message.animation
+    if animation is not None:
+        thumb = animation.thumbnail
+        return MediaRef("animation", animation.file_unique_id,
+                        thumb_id=thumb.file_id if thumb else None,
+                        thumb_unique_id=thumb.file_unique_id if thumb else None)
+    return None
+
+
+# ============================================================
+#        ЗАПРЕЩЁННЫЕ МЕДИА ГРУППЫ: МНОЖЕСТВА + ИНДЕКС pHash
+# ============================================================
+class BannedMediaSet:
+    """Запрещённое в одной группе: точные file_unique_id, наборы стикеров, pHash."""
+
+    __slots__ = ("files", "sets", "hashes")
+
+    def __init__(self):
+        self.files: Set[str] = set()
+        self.sets: Set[str] = set()
+        self.hashes = HammingIndex()
+
+    def add(self, kind: str, file_unique_id: Optional[str] = None, set_name: Optional[str] = None,
+            phash_value: Optional[int] = None) -> None:
+        if kind == "set":
+            if set_name:
+                self.sets.add(set_name)
+            return
+        if file_unique_id:
+            self.files.add(file_unique_id)
+        if phash_value is not None:
+            self.hashes.add(phash_value)
+
+
+class MediaIndex:
+    """
+    Бан-листы медиа по группам, загружаются из BannedMedia при первом
+    сообщении с медиа в группе. Проверка в два шага:
+      * match() — мгновенно, по множествам: эмодзи стикера (глобально),
+        file_unique_id, набор стикеров; скачивать ничего не нужно;
+      * near() — pHash по HammingIndex; нужен скачанный файл, поэтому
+        вызывающий обращается к нему, только если у группы есть хэши.
+    """
+
+    def __init__(self, emoji: Iterable[str] = BANNED_STICKER_EMOJI):
+        self.emoji = set(emoji)
+        self._groups: Dict[int, BannedMediaSet] = {}
+
+    def is_loaded(self, group_id: int) -> bool:
+        return group_id in self._groups
+
+    async def load(self, session: AsyncSession, group_id: int) -> BannedMediaSet:
+        banned = BannedMediaSet()
+        rows = await session.execute(
+            select(BannedMedia.kind, BannedMedia.file_unique_id, BannedMedia.set_name, BannedMedia.phash)
+            .filter_by(group_id=group_id)
+        )
+        for kind, file_unique_id, set_name, value in rows:
+            banned.add(kind, file_unique_id, set_name, to_unsigned(value) if value is not None else None)
+        self._groups[group_id] = banned
+        return banned
+
+    async def get(self, session: AsyncSession, group_id: Optional[int]) -> BannedMediaSet:
+        if group_id is None:
+            return BannedMediaSet()
+        banned = self._groups.get(group_id)
+        if banned is None:
+            banned = await self.load(session, group_id)
+        return banned
+
+    def add(self, group_id: int, kind: str, file_unique_id: Optional[str] = None,
+            set_name: Optional[str] = None, phash_value: Optional[int] = None) -> None:
+        """Новая запись из админки; незагруженную группу догрузим целиком при первой проверке."""
+        banned = self._groups.get(group_id)
+        if banned is not None:
+            banned.add(kind, file_unique_id, set_name, phash_value)
+
+    def invalidate(self, group_id: Optional[int] = None) -> None:
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(group_id, None)
+
+    def match(self, banned: BannedMediaSet, media: MediaRef) -> Optional[str]:
+        if media.emoji and media.emoji in self.emoji:
+            return EMOJI
+        if media.file_unique_id in banned.files:
+            return FILE
+        if media.set_name and media.set_name in banned.sets:
+            return SET
+        return None
+
+    def near(self, banned: BannedMediaSet, value: int) -> bool:
+        return banned.hashes.find(value) is not None
+
+    def stats(self) -> dict:
+        return {
+            "groups": len(self._groups),
+            "files": sum(len(b.files) for b in self._groups.values()),
+            "sets": sum(len(b.sets) for b in self._groups.values()),
+            "hashes": sum(len(b.hashes) for b in self._groups.values()),
+        }
+
+
+# ============================================================
+#            СКАЧИВАНИЕ И КЭШ pHash ПО file_unique_id
+# ============================================================
+class MediaHasher:
+    """
+    pHash медиа по file_unique_id: каждый файл скачивается не больше одного
+    раза. Готовые хэши лежат в LRU, одновременные запросы одного файла ждут
+    одну загрузку, одновременных загрузок — не больше `downloads`.
+
+    Без Pillow хэши не считаются (`available` = False): остаётся точное
+    совпадение по file_unique_id.
+    """
+
+    def __init__(self, maxsize: int = MEDIA_HASH_CACHE_SIZE, downloads: int = MEDIA_DOWNLOADS):
+        self.maxsize = maxsize
+        self.downloads = downloads
+        self._hashes: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._available: Optional[bool] = None
+
+        self.hits = 0
+        self.fetched = 0
+        self.failed = 0
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                import PIL  # noqa: F401
+                self._available = True
+            except ImportError:
+                self._available = False
+                logger.warning("Pillow не установлен: медиа сравниваются только по file_unique_id")
+        return self._available
+
+    async def get(self, bot, file_id: str, file_unique_id: str) -> Optional[int]:
+        """pHash файла или None (не картинка, не скачался, нет Pillow)."""
+        if file_unique_id in self._hashes:
+            self.hits += 1
+            self._hashes.move_to_end(file_unique_id)
+            return self._hashes[file_unique_id]
+        if not self.available:
+            return None
+
+        pending = self._pending.get(file_unique_id)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        future = self._pending[file_unique_id] = asyncio.get_running_loop().create_future()
+        try:
+            value = await self._fetch(bot, file_id, file_unique_id)
+            future.set_result(value)
+            return value
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            del self._pending[file_unique_id]
+
+    async def _fetch(self, bot, file_id: str, file_unique_id: str) -> Optional[int]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.downloads)
+        async with self._slots:
+            try:
+                data = (await bot.download(file_id)).getvalue()
+            except Exception as e:
+                # Сетевую ошибку не кэшируем: в следующий раз попробуем снова
+                self.failed += 1
+                logger.warning("Не удалось скачать медиа %s: %s", file_unique_id, e)
+                return None
+        self.fetched += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            value = await loop.run_in_executor(None, image_phash, data)
+        except Exception as e:
+            logger.info("Медиа %s не разобрано как картинка: %s", file_unique_id, e)
+            value = None
+        self.put(file_unique_id, value)
+        return value
+
+    def put(self, file_unique_id: str, value: Optional[int]) -> None:
+        self._hashes[file_unique_id] = value
+        self._hashes.move_to_end(file_unique_id)
+        while len(self._hashes) > self.maxsize:
+            self._hashes.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def stats(self) -> dict:
+        return {"cached": len(self._hashes), "hits": self.hits, "fetched": self.fetched, "failed": self.failed}
+
+
+media_index = MediaIndex()
+media_hasher = MediaHasher()
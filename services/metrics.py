@@ -0,0 +1,308 @@
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.methods import DeleteMessage, DeleteMessages
+from sqlalchemy import event
+
+from services.webhook import update_chat_id
+
+# Чат апдейта, который сейчас обрабатывается: по нему SQL-запросы относятся к чату
+current_chat: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_chat", default=None)
+
+# Секунды: от десятков микросекунд (кэш) до секунд (сеть, большие транзакции)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+HELP = {
+    "bot_update_seconds": "Полное время обработки апдейта диспетчером",
+    "bot_updates_total": "Апдейты по чатам",
+    "bot_stage_seconds": "Собственное время мидлвари или хендлера (без следующих звеньев)",
+    "bot_db_queries_total": "SQL-запросы по чатам",
+    "bot_db_query_seconds": "Время SQL-запроса",
+    "bot_api_calls_total": "Вызовы Telegram API по методам и чатам",
+    "bot_api_errors_total": "Неудачные вызовы Telegram API",
+    "bot_api_seconds": "Время вызова Telegram API",
+    "bot_deleted_messages_total": "Удалённые ботом сообщения по чатам",
+    "bot_captcha_sent_total": "Отправленные капчи по чатам",
+    "bot_captcha_passed_total": "Пройденные капчи по чатам",
+    "bot_captcha_expired_total": "Истёкшие капчи по чатам",
+    "bot_action_queue_depth": "Действий модерации в очереди",
+    "bot_ai_queue_depth": "Сообщений в очереди AI-проверки",
+    "bot_journal_pending": "Пользователей с незаписанными изменениями",
+    "bot_captcha_pending": "Ожидающих капч",
+    "bot_user_cache_size": "Записей в кэше статусов пользователей",
+    "bot_warmup_pending": "Компонентов, которые ещё прогреваются",
+    "bot_degraded_checks_total": "Проверки в упрощённом режиме, пока фильтр прогревается",
+    "bot_media_blocked_total": "Удалённые медиа по типу совпадения (emoji, file, set, phash)",
+    "bot_media_hash_cache_size": "pHash скачанных медиа в кэше",
+    "bot_links_blocked_total": "Удалённые сообщения со ссылками по политике группы (deny, strict)",
+    "bot_shared_bans_total": "Баны по общему бан-листу (join, message, propagated)",
+    "bot_shared_ban_users": "Пользователей в общем бан-листе",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+INF = 'le="+Inf"'
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# ============================================================
+#                 РЕЕСТР МЕТРИК (ФОРМАТ PROMETHEUS)
+# ============================================================
+class MetricsRegistry:
+    """
+    Счётчики, гистограммы и гейджи в памяти процесса, отдаются текстом
+    в формате Prometheus. Без внешних зависимостей: обновление — это
+    сложение в словаре, поэтому обёртки можно держать включёнными всегда.
+
+    Метка chat ограничена `max_chats` разными значениями, остальные чаты
+    попадают в chat="other" — иначе число рядов растёт вместе с ботом.
+    """
+
+    def __init__(self, max_chats: int = 500):
+        self.max_chats = max_chats
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._chats: set = set()
+
+    def chat_label(self, chat_id: Optional[int]) -> str:
+        if chat_id is None:
+            return "none"
+        if chat_id in self._chats:
+            return str(chat_id)
+        if len(self._chats) < self.max_chats:
+            self._chats.add(chat_id)
+            return str(chat_id)
+        return "other"
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        series = self._counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+    def inc_chat(self, name: str, chat_id: Optional[int], value: float = 1, **labels) -> None:
+        self.inc(name, value, chat=self.chat_label(chat_id), **labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """Гистограмма с фиксированными метками — для горячего пути берут её один раз."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        series = self._histograms.setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram()
+        return hist
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        self.histogram(name, **labels).observe(value)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Значение читается в момент выгрузки: глубины очередей, размеры кэшей."""
+        self._gauges[name] = read
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(self._counters.items()):
+            header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, series in sorted(self._histograms.items()):
+            header(name, "histogram")
+            for labels, hist in series.items():
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, INF)} {hist.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        self._counters.clear()
+        self._histograms.clear()
+        self._chats.clear()
+
+
+metrics = MetricsRegistry()
+
+
+# ---------------------------
+# Диспетчер: мидлвари и хендлеры
+# ---------------------------
+def _stage_recorder(registry: MetricsRegistry) -> Callable[[str], Callable[[float], None]]:
+    return lambda stage: registry.histogram("bot_stage_seconds", stage=stage).observe
+
+
+def _wrap(middleware: Callable, record: Callable[[float], None]) -> Callable:
+    async def timed(handler: Callable[..., Awaitable[Any]], event, data: Dict[str, Any]) -> Any:
+        inner = 0.0
+
+        async def call_next(e, d):
+            nonlocal inner
+            started = time.perf_counter()
+            try:
+                return await handler(e, d)
+            finally:
+                inner += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await middleware(call_next, event, data)
+        finally:
+            record(time.perf_counter() - started - inner)
+
+    return timed
+
+
+def _probe(record: Callable[[float], None]) -> Callable:
+    async def timed(handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            record(time.perf_counter() - started)
+
+    return timed
+
+
+def instrument_dispatcher(dp: Dispatcher, stage: Optional[Callable[[str], Callable[[float], None]]] = None,
+                          registry: MetricsRegistry = None) -> Dispatcher:
+    """
+    Оборачивает все уже зарегистрированные мидлвари диспетчера и добавляет
+    замер хендлеров. Для мидлвари пишется собственное время — без следующих
+    звеньев цепочки, но вместе с её собственными await (БД, морфология).
+
+    `stage(name)` возвращает функцию записи значения; по умолчанию —
+    гистограмма bot_stage_seconds{stage=...}.
+    """
+    registry = registry or metrics
+    stage = stage or _stage_recorder(registry)
+
+    for observer_name, observer in dp.observers.items():
+        for manager in (observer.outer_middleware, observer.middleware):
+            current = list(manager)
+            for middleware in current:
+                manager.unregister(middleware)
+            for middleware in current:
+                label = getattr(middleware, "__name__", type(middleware).__name__)
+                manager.register(_wrap(middleware, stage(f"{observer_name}.{label}")))
+        if observer_name != "update" and observer.handlers:
+            observer.middleware.register(_probe(stage(f"{observer_name}.handler")))
+
+    # Снаружи всего: полный путь апдейта и чат для счётчиков SQL
+    update_seconds = registry.histogram("bot_update_seconds")
+
+    async def track_update(handler, update, data):
+        chat_id = update_chat_id(update)
+        token = current_chat.set(chat_id)
+        registry.inc_chat("bot_updates_total", chat_id)
+        started = time.perf_counter()
+        try:
+            return await handler(update, data)
+        finally:
+            update_seconds.observe(time.perf_counter() - started)
+            current_chat.reset(token)
+
+    # Первым в списке outer — значит, самым внешним
+    outer = dp.update.outer_middleware
+    current = list(outer)
+    for middleware in current:
+        outer.unregister(middleware)
+    outer.register(track_update)
+    for middleware in current:
+        outer.register(middleware)
+    return dp
+
+
+# ---------------------------
+# Telegram API
+# ---------------------------
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: каждый вызов API — счётчик, время, удаления по чатам."""
+
+    def __init__(self, registry: MetricsRegistry = None):
+        self.registry = registry or metrics
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        chat_id = getattr(method, "chat_id", None)
+        chat_id = chat_id if isinstance(chat_id, int) else None
+        self.registry.inc_chat("bot_api_calls_total", chat_id, method=name)
+        started = time.perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except Exception:
+            self.registry.inc("bot_api_errors_total", method=name)
+            raise
+        finally:
+            self.registry.observe("bot_api_seconds", time.perf_counter() - started, method=name)
+
+        if isinstance(method, DeleteMessages):
+            self.registry.inc_chat("bot_deleted_messages_total", chat_id, len(method.message_ids))
+        elif isinstance(method, DeleteMessage):
+            self.registry.inc_chat("bot_deleted_messages_total", chat_id)
+        return response
+
+
+# ---------------------------
+# SQL
+# ---------------------------
+def watch_engine(engine, registry: MetricsRegistry = None) -> None:
+    """Счётчик и время SQL-запросов (engine — AsyncEngine или обычный Engine)."""
+    registry = registry or metrics
+    sync_engine = getattr(engine, "sync_engine", engine)
+    query_seconds = registry.histogram("bot_db_query_seconds")
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        query_seconds.observe(time.perf_counter() - started)
+        registry.inc_chat("bot_db_queries_total", current_chat.get())
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+from services.metrics import MetricsRegistry, metrics
+from services.profiler import SamplingProfiler, profiler
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============================================================
+#              ЛОКАЛЬНЫЙ HTTP: /metrics И /profile
+# ============================================================
+def build_app(registry: MetricsRegistry = metrics, sampler: SamplingProfiler = profiler) -> web.Application:
+
+    async def render_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+    async def profile_status(request: web.Request) -> web.Response:
+        return web.json_response(sampler.status())
+
+    async def profile_start(request: web.Request) -> web.Response:
+        try:
+            interval = float(request.query.get("interval", "0.005"))
+            seconds = float(request.query["seconds"]) if "seconds" in request.query else None
+        except ValueError:
+            return web.Response(status=400, text="interval/seconds должны быть числами")
+        if not 0.0005 <= interval <= 1:
+            return web.Response(status=400, text="interval: от 0.0005 до 1 секунды")
+        if not sampler.start(interval, seconds):
+            return web.Response(status=409, text="профилировщик уже запущен")
+        return web.json_response(sampler.status())
+
+    async def profile_stop(request: web.Request) -> web.Response:
+        # stop() ждёт поток сэмплера и сворачивает стеки — не на event loop
+        return web.Response(text=await asyncio.to_thread(sampler.stop))
+
+    app = web.Application()
+    app.router.add_get("/metrics", render_metrics)
+    app.router.add_get("/profile", profile_status)
+    app.router.add_post("/profile/start", profile_start)
+    app.router.add_post("/profile/stop", profile_stop)
+    return app
+
+
+class MetricsServer:
+    """Поднимается и гасится вместе с диспетчером (startup/shutdown)."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        if not self.port or self._runner is not None:
+            return
+        self._runner = web.AppRunner(build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Метрики: http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if profiler.running:
+            await asyncio.to_thread(profiler.stop)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
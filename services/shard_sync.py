@@ -0,0 +1,72 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+
+def shard_of(chat_id: int, shards: int) -> int:
+    """Шард, которому принадлежит чат: все его апдейты обрабатываются там."""
+    return hash(chat_id) % shards
+
+
+# ============================================================
+#         СИНХРОНИЗАЦИЯ РЕЗИДЕНТНЫХ КЭШЕЙ МЕЖДУ ШАРДАМИ
+# ============================================================
+class ShardSync:
+    """
+    В шардированном режиме у каждого процесса свои кэши (реестр групп,
+    настройки, админы, банворды), а меняются они в процессе, которому
+    достался апдейт: админка в личке и сообщения группы обычно живут в
+    разных шардах.
+
+    Тот, кто изменил кэш и записал изменение в базу, вызывает
+    `publish(topic, **payload)`; фронт рассылает событие остальным шардам,
+    и там срабатывает подписчик темы. В одном процессе publish ничего не
+    делает — кэш уже актуален.
+    """
+
+    def __init__(self):
+        self._outbox = None
+        self.shard: Optional[int] = None
+        self.shards = 1
+        self._handlers: Dict[str, Handler] = {}
+        self.published = 0
+        self.received = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._outbox is not None
+
+    def attach(self, outbox, shard: int, shards: int) -> None:
+        """Включается в процессе-шарде: outbox — очередь к фронту."""
+        self._outbox = outbox
+        self.shard = shard
+        self.shards = shards
+
+    def owns(self, chat_id: int) -> bool:
+        """Чат обрабатывается этим процессом (в одном процессе — любой)."""
+        return self._outbox is None or shard_of(chat_id, self.shards) == self.shard
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic] = handler
+
+    def publish(self, topic: str, **payload: Any) -> None:
+        if self._outbox is None:
+            return
+        self.published += 1
+        self._outbox.put(("sync", self.shard, topic, payload))
+
+    async def deliver(self, topic: str, payload: Dict[str, Any]) -> None:
+        handler = self._handlers.get(topic)
+        if handler is None:
+            return
+        self.received += 1
+        try:
+            await handler(**payload)
+        except Exception:
+            logger.exception("Не удалось применить событие %s от другого шарда", topic)
+
+
+shard_sync = ShardSync()
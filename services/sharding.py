@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.types import Update
+from aiohttp import web
+
+from config import (
+    SHARD_QUEUE_SIZE, WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL,
+)
+from services.shard_sync import shard_of
+from services.webhook import build_app, update_chat_id
+
+logger = logging.getLogger(__name__)
+
+
+def raw_chat_id(raw: Dict[str, Any]) -> int:
+    """update_chat_id для сырого dict — фронту не нужно разбирать апдейт целиком."""
+    for kind, event in raw.items():
+        if kind == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from")
+        if user:
+            return user["id"]
+    return raw["update_id"]
+
+
+# ============================================================
+#         ФРОНТ: РАЗДАЧА АПДЕЙТОВ ПРОЦЕССАМ-ШАРДАМ
+# ============================================================
+class ShardRouter:
+    """
+    Фронт-процесс только получает апдейты и раскладывает их по шардам:
+    шард = hash(chat_id) % shards. Каждый шард — отдельный процесс со своей
+    цепочкой мидлварей, кэшами и очередями, поэтому тяжёлая морфология в
+    нескольких больших группах не тормозит остальные.
+
+    Апдейты, пришедшие за один проход event loop, уходят шарду одной пачкой.
+    Обратно шарды шлют события синхронизации кэшей (services/shard_sync.py),
+    фронт пересылает их всем остальным.
+
+    `target(shard, shards, inbox, outbox, *args)` — точка входа процесса-шарда
+    (в боте — bot.run_shard).
+    """
+
+    def __init__(self, bot: Optional[Bot], shards: int, target: Callable, args: Sequence = (),
+                 queue_size: int = SHARD_QUEUE_SIZE):
+        self.bot = bot
+        self.shards = shards
+        self.target = target
+        self.args = tuple(args)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._inboxes = [self._ctx.Queue(maxsize=queue_size) for _ in range(shards)]
+        self._outbox = self._ctx.Queue()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * shards
+        self._buffers: List[List[dict]] = [[] for _ in range(shards)]
+        self._flush_scheduled = False
+        self._relay: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._ready_shards = set()
+        self._stopping = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.synced = 0
+        self.restarts = 0
+        self.shard_stats: Dict[int, dict] = {}
+
+    # ---------------------------
+    # Жизненный цикл
+    # ---------------------------
+    async def start(self, timeout: float = 120.0) -> None:
+        """
+        Поднимает процессы и ждёт, пока каждый загрузит состояние и запустит
+        диспетчер. Первый шард стартует один: он доводит схему базы, и
+        остальные не соревнуются за миграции.
+        """
+        self._ready = asyncio.Event()
+        self._relay = asyncio.create_task(self._run_relay())
+        self._spawn(0)
+        await asyncio.wait_for(self._wait_ready(1), timeout)
+        for shard in range(1, self.shards):
+            self._spawn(shard)
+        await asyncio.wait_for(self._wait_ready(self.shards), timeout)
+        logger.info("Шардов запущено: %d", self.shards)
+
+    async def _wait_ready(self, count: int) -> None:
+        while len(self._ready_shards) < count:
+            self._ready.clear()
+            await self._ready.wait()
+
+    async def stop(self) -> None:
+        """Досылает буферы, просит шарды доработать очереди и ждёт их выхода."""
+        self._stopping = True
+        loop = asyncio.get_running_loop()
+        for shard, inbox in enumerate(self._inboxes):
+            buffer, self._buffers[shard] = self._buffers[shard], []
+            if buffer:
+                await loop.run_in_executor(None, inbox.put, ("updates", buffer))
+            await loop.run_in_executor(None, inbox.put, ("stop",))
+        for process in self._processes:
+            if process is not None:
+                await loop.run_in_executor(None, process.join)
+        if self._relay is not None:
+            await self._relay
+            self._relay = None
+
+    def _spawn(self, shard: int) -> None:
+        process = self._ctx.Process(
+            target=self.target,
+            args=(shard, self.shards, self._inboxes[shard], self._outbox) + self.args,
+            name=f"shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[shard] = process
+
+    # ---------------------------
+    # Раздача апдейтов
+    # ---------------------------
+    def submit(self, update: Update) -> bool:
+        """Тот же интерфейс, что у UpdateWorkerPool: подходит для webhook.build_app."""
+        raw = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+        return self._route(update_chat_id(update), raw)
+
+    def submit_raw(self, raw: Dict[str, Any]) -> bool:
+        return self._route(raw_chat_id(raw), raw)
+
+    def _route(self, chat_id: int, raw: Dict[str, Any]) -> bool:
+        shard = shard_of(chat_id, self.shards)
+        if self._inboxes[shard].full():
+            self.rejected += 1
+            return False
+        self._buffers[shard].append(raw)
+        self.accepted += 1
+        self._schedule_flush()
+        return True
+
+    def _schedule_flush(self, delay: float = 0.0) -> None:
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        # put() без ожидания: event loop фронта не должен вставать из-за медленного шарда.
+        # Очередь полна — пачка ждёт в буфере, а новые апдейты этому шарду _route не примет
+        self._flush_scheduled = False
+        for shard, buffer in enumerate(self._buffers):
+            if not buffer:
+                continue
+            try:
+                self._inboxes[shard].put_nowait(("updates", buffer))
+            except queue.Full:
+                self._schedule_flush(0.05)
+                continue
+            self._buffers[shard] = []
+
+    async def wait_capacity(self) -> None:
+        """Для long polling: не берём новые апдейты, пока очереди шардов полны."""
+        while any(inbox.full() for inbox in self._inboxes):
+            await asyncio.sleep(0.05)
+
+    # ---------------------------
+    # События от шардов
+    # ---------------------------
+    async def _run_relay(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopped = 0
+        while stopped < self.shards:
+            try:
+                message = await loop.run_in_executor(None, self._outbox.get, True, 1.0)
+            except queue.Empty:
+                if self._stopping and not any(p is not None and p.is_alive() for p in self._processes):
+                    break
+                self._check_processes()
+                continue
+
+            kind = message[0]
+            if kind == "sync":
+                _, source, topic, payload = message
+                self.synced += 1
+                for shard, inbox in enumerate(self._inboxes):
+                    if shard != source:
+                        await loop.run_in_executor(None, inbox.put, ("sync", topic, payload))
+            elif kind == "ready":
+                self._ready_shards.add(message[1])
+                self._ready.set()
+            elif kind == "stopped":
+                _, shard, stats = message
+                self.shard_stats[shard] = stats
+                stopped += 1
+
+    def _check_processes(self) -> None:
+        if self._stopping:
+            return
+        for shard, process in enumerate(self._processes):
+            if process is not None and not process.is_alive():
+                # Очередь шарда переживает процесс: новый продолжит с того же места
+                logger.error("Шард %d завершился с кодом %s, перезапускаем", shard, process.exitcode)
+                self.restarts += 1
+                self._ready_shards.discard(shard)
+                self._spawn(shard)
+
+    def depth(self) -> int:
+        return sum(inbox.qsize() for inbox in self._inboxes)
+
+    def stats(self) -> dict:
+        return {
+            "shards": self.shards,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "synced": self.synced,
+            "restarts": self.restarts,
+        }
+
+
+# ---------------------------
+# Получение апдейтов во фронте
+# ---------------------------
+async def poll(bot: Bot, router: ShardRouter, allowed_updates: List[str], timeout: int = 30) -> None:
+    """Long polling без диспетчера: апдейты сразу уходят шардам."""
+    offset = None
+    while True:
+        await router.wait_capacity()
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates)
+        except Exception as e:
+            logger.warning("getUpdates не удался: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            # Offset двигаем только за принятым апдейтом: отвергнутый ждёт места у шарда
+            while not router.submit(update):
+                await router.wait_capacity()
+            offset = update.update_id + 1
+
+
+async def serve_webhook(bot: Bot, router: ShardRouter, allowed_updates: List[str],
+                        host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> None:
+    if not WEBHOOK_URL:
+        raise RuntimeError("Для RUN_MODE=webhook нужно задать WEBHOOK_URL")
+
+    runner = web.AppRunner(build_app(router))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+    )
+    logger.info("Webhook слушает %s:%s%s, шардов: %d", host, port, WEBHOOK_PATH, router.shards)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Set
+
+from aiogram import types
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import SHARED_BAN_BITS_PER_USER, SHARED_BAN_HASHES, SHARED_BAN_MERGE
+from database.cache import user_cache
+from database.models import ChatUser, GroupSettings, Session
+from database.registry import group_registry
+from database.settings_cache import settings_cache
+from database.user_journal import user_journal
+from services.action_executor import action_executor
+from services.admin_roster import admin_roster
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_M64 = (1 << 64) - 1
+
+
+def _hash(user_id: int):
+    """
+    Две хэш-функции для двойного хэширования фильтра Блума — половины
+    перемешанного splitmix64 значения: id идут почти подряд, без
+    перемешивания младшие биты у соседей совпадают.
+    """
+    z = ((user_id ^ (user_id >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+    z ^= z >> 31
+    return z & 0xFFFFFFFF, (z >> 32) | 1
+
+
+# ============================================================
+#        ФИЛЬТР БЛУМА + ОТСОРТИРОВАННЫЙ МАССИВ ID
+# ============================================================
+class BanFilter:
+    """
+    Множество user_id для проверки на каждом сообщении.
+
+    Фильтр Блума (bytearray, SHARED_BAN_HASHES проб) отвечает «точно нет»
+    без обращения к спискам — это почти все сообщения. На «может быть»
+    ответ уточняется бинарным поиском в отсортированном array('q') и в
+    небольшом множестве новых банов: они копятся там и вливаются в массив
+    слиянием, когда их набирается SHARED_BAN_MERGE. Около 12 байт на
+    пользователя против ~70 у set.
+
+    Фильтр строится с двойным запасом. Переполненный он по-прежнему
+    отвечает верно, только чаще «может быть»; пересобрать его побольше —
+    дело владельца (`overfull`), это секунды на миллионе.
+    """
+
+    __slots__ = ("hashes", "bits_per_user", "merge_at", "capacity", "_bits", "_mask", "_ids", "_delta")
+
+    def __init__(self, ids: Iterable[int] = (), bits_per_user: int = SHARED_BAN_BITS_PER_USER,
+                 hashes: int = SHARED_BAN_HASHES, merge_at: int = SHARED_BAN_MERGE):
+        self.hashes = hashes
+        self.bits_per_user = bits_per_user
+        self.merge_at = merge_at
+        self._ids = array("q", sorted(set(ids)))
+        self._delta: Set[int] = set()
+        self._build_bloom()
+
+    def _build_bloom(self) -> None:
+        # Размер — степень двойки: номер бита берётся маской, без деления
+        wanted = max(len(self), 1024) * 2 * self.bits_per_user
+        size = 1 << (wanted - 1).bit_length()
+        self._bits = bytearray(size >> 3)
+        self._mask = size - 1
+        self.capacity = size // self.bits_per_user
+        for user_id in self._ids:
+            self._set(user_id)
+        for user_id in self._delta:
+            self._set(user_id)
+
+    def _set(self, user_id: int) -> None:
+        bits, mask = self._bits, self._mask
+        h, step = _hash(user_id)
+        for _ in range(self.hashes):
+            bit = h & mask
+            bits[bit >> 3] |= 1 << (bit & 7)
+            h += step
+
+    def might_contain(self, user_id: int) -> bool:
+        bits, mask = self._bits, self._mask
+        h, step = _hash(user_id)
+        for _ in range(self.hashes):
+            bit = h & mask
+            if not bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+            h += step
+        return True
+
+    def __contains__(self, user_id: int) -> bool:
+        # might_contain() без лишнего вызова: это путь каждого сообщения
+        bits, mask = self._bits, self._mask
+        h, step = _hash(user_id)
+        for _ in range(self.hashes):
+            bit = h & mask
+            if not bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+            h += step
+        if user_id in self._delta:
+            return True
+        ids = self._ids
+        i = bisect_left(ids, user_id)
+        return i < len(ids) and ids[i] == user_id
+
+    def add(self, user_id: int) -> bool:
+        """False — пользователь уже в списке."""
+        if user_id in self:
+            return False
+        self._delta.add(user_id)
+        self._set(user_id)
+        if len(self._delta) >= self.merge_at:
+            self.merge()
+        return True
+
+    def merge(self) -> None:
+        """
+        Новые баны — в отсортированный массив: место каждого ищется бинарным
+        поиском, а куски между ними копируются срезами массива целиком, не
+        поштучно через Python.
+        """
+        if not self._delta:
+            return
+        ids, merged, start = self._ids, array("q"), 0
+        for user_id in sorted(self._delta):
+            end = bisect_left(ids, user_id, start)
+            merged += ids[start:end]
+            merged.append(user_id)
+            start = end
+        merged += ids[start:]
+        self._ids = merged
+        self._delta.clear()
+
+    @property
+    def overfull(self) -> bool:
+        return len(self) > self.capacity
+
+    def ids(self) -> array:
+        return self._ids + array("q", self._delta)
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._delta)
+
+    def memory(self) -> int:
+        """Байт на фильтр и массив (множество новых банов — не больше SHARED_BAN_MERGE)."""
+        return len(self._bits) + self._ids.itemsize * len(self._ids)
+
+
+# ============================================================
+#             ОБЩИЙ БАН-ЛИСТ ГРУПП, КОТОРЫЕ В НЁМ УЧАСТВУЮТ
+# ============================================================
+class SharedBanList:
+    """
+    Пользователи, забаненные админом хотя бы в одной группе с включённым
+    share_bans. В таких группах они банятся сразу: при вступлении — ещё
+    до первого сообщения, при сообщении — до обращения к базе, а при
+    новом бане — во всех участвующих группах, где пользователь уже был.
+
+    Весь список читается из базы один раз (шаг прогрева); дальше он только
+    дополняется: новые баны, события других шардов, группа, включившая
+    участие. Выключившая — повод перечитать всё: из фильтра Блума не удалить.
+    Пока список не прочитан, в нём только баны, выданные после старта.
+    """
+
+    def __init__(self, session_factory=Session):
+        self.session_factory = session_factory
+        self.filter = BanFilter()
+        self.loaded = False
+        # Баны, пришедшие, пока список перечитывается, — чтобы не потерять их при подмене
+        self._arrived: Optional[List[int]] = None
+        self._regrow: Optional[asyncio.Task] = None
+
+        self.checks = 0
+        self.hits = 0
+
+    # ---------------------------
+    # Загрузка
+    # ---------------------------
+    @staticmethod
+    def _query(group_id: Optional[int] = None):
+        # Только баны админов: баны самого бота (разошедшиеся по группам) — следствие их,
+        # а не повод для списка; иначе после перезапуска список держал бы и их
+        stmt = (
+            select(ChatUser.user_id)
+            .join(GroupSettings, GroupSettings.group_id == ChatUser.group_id)
+            .where(ChatUser.is_banned.is_(True), ChatUser.banned_by_admin.is_(True),
+                   GroupSettings.share_bans.is_(True))
+        )
+        if group_id is not None:
+            stmt = stmt.where(ChatUser.group_id == group_id)
+        return stmt.distinct()
+
+    async def load(self) -> bool:
+        """Шаг прогрева: весь список из базы, фильтр строится в потоке."""
+        if self._regrow is not None and not self._regrow.done():
+            await self._regrow
+        self._arrived = []
+        try:
+            # Недавние баны ещё в журнале — без них перечитанный список их бы потерял
+            await user_journal.flush()
+            async with self.session_factory() as session:
+                ids = (await session.scalars(self._query())).all()
+            await self._swap(ids)
+        finally:
+            self._arrived = None
+        self.loaded = True
+        logger.info("Общий бан-лист: %d пользователей", len(self.filter))
+        return True
+
+    async def _swap(self, ids) -> None:
+        loop = asyncio.get_running_loop()
+        ban_filter = await loop.run_in_executor(None, BanFilter, ids)
+        for user_id in self._arrived:
+            ban_filter.add(user_id)
+        self.filter = ban_filter
+
+    async def _grow(self) -> None:
+        """Фильтр Блума переполнен: собираем побольше в потоке, пока отвечает старый."""
+        try:
+            await self._swap(self.filter.ids())
+        finally:
+            self._arrived = None
+
+    async def refresh_group(self, group_id: int) -> None:
+        """Группа включила или выключила участие (здесь или на другом шарде)."""
+        async with self.session_factory() as session:
+            ids = (await session.scalars(self._query(group_id))).all()
+            shares = await session.scalar(select(GroupSettings.share_bans).filter_by(group_id=group_id))
+        if shares:
+            for user_id in ids:
+                self._add(user_id)
+        else:
+            await self.load()
+
+    # ---------------------------
+    # Операции
+    # ---------------------------
+    @staticmethod
+    def shares(group_id: Optional[int]) -> bool:
+        settings = settings_cache.get(group_id) if group_id is not None else None
+        return settings is not None and settings.share_bans
+
+    def _add(self, user_id: int) -> bool:
+        if self._arrived is not None:
+            self._arrived.append(user_id)
+        added = self.filter.add(user_id)
+        if self.filter.overfull and self._arrived is None:
+            # Баны до подмены копятся в _arrived с этого момента, а не с запуска задачи
+            self._arrived = []
+            self._regrow = asyncio.ensure_future(self._grow())
+        return added
+
+    def add(self, user_id: int) -> bool:
+        """Бан из другого шарда: только в список, группы он забанил сам."""
+        return self._add(user_id)
+
+    def is_banned(self, user_id: int) -> bool:
+        self.checks += 1
+        if user_id in self.filter:
+            self.hits += 1
+            return True
+        return False
+
+    def enforce(self, chat_id: int, group_id: Optional[int], user: types.User, reason: str) -> bool:
+        """Пользователь из списка в участвующей группе — бан. True — забанен."""
+        if not self.shares(group_id) or not self.is_banned(user.id) or admin_roster.is_admin(chat_id, user.id):
+            return False
+        # Вступление видно и как chat_member, и как сервисное сообщение — баним один раз
+        status = user_cache.get(user.id, chat_id)
+        if status is None or not status.is_banned:
+            self._ban(chat_id, group_id, user.id, user.username)
+            metrics.inc("bot_shared_bans_total", reason=reason)
+        return True
+
+    async def record(self, session: AsyncSession, group_id: int, user_id: int) -> int:
+        """
+        Админ забанил пользователя в группе: если группа участвует — в список
+        и бан во всех остальных участвующих группах, где пользователь уже есть.
+        Возвращает число групп, куда бан разошёлся.
+        """
+        if not self.shares(group_id):
+            return 0
+        self._add(user_id)
+
+        # Покрывающий индекс по (user_id, is_banned): все группы пользователя без чтения таблицы
+        rows = await session.scalars(
+            select(ChatUser.group_id)
+            .join(GroupSettings, GroupSettings.group_id == ChatUser.group_id)
+            .where(ChatUser.user_id == user_id, ChatUser.group_id != group_id,
+                   ChatUser.is_banned.is_not(True), GroupSettings.share_bans.is_(True))
+        )
+        spread = 0
+        for other in rows:
+            chat_id = group_registry.chat_id(other)
+            if chat_id is None or admin_roster.is_admin(chat_id, user_id):
+                continue
+            self._ban(chat_id, other, user_id)
+            spread += 1
+        if spread:
+            metrics.inc("bot_shared_bans_total", spread, reason="propagated")
+        return spread
+
+    @staticmethod
+    def _ban(chat_id: int, group_id: int, user_id: int, username: Optional[str] = None) -> None:
+        action_executor.ban(chat_id, user_id)
+        user_journal.record(group_id, user_id, username=username, is_banned=True)
+        user_cache.update(user_id, chat_id, is_banned=True)
+
+    def __len__(self) -> int:
+        return len(self.filter)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.filter),
+            "memory_bytes": self.filter.memory(),
+            "loaded": self.loaded,
+            "checks": self.checks,
+            "hits": self.hits,
+        }
+
+
+shared_bans = SharedBanList()
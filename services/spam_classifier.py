@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: сохранения разных процессов не блокируют друг друга
+    fcntl = None
+
+from config import SPAM_HAM_THRESHOLD, SPAM_MODEL_PATH, SPAM_SPAM_THRESHOLD
+from services.text_analysis import TextAnalysis
+
+logger = logging.getLogger(__name__)
+
+HAM, UNSURE, SPAM = "ham", "unsure", "spam"
+
+# (counts, totals, docs) — состояние модели, которое пишется в файл
+State = Tuple[Tuple[array, array], List[int], List[int]]
+Learned = List[Tuple[int, List[int]]]
+
+
+@contextmanager
+def _locked(path: str):
+    """Межпроцессная блокировка файла модели на время чтения-слияния-записи."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# ============================================================
+#              НАИВНЫЙ БАЙЕС НА ХЭШИРОВАННЫХ ПРИЗНАКАХ
+# ============================================================
+class SpamClassifier:
+    """
+    Мультиномиальный наивный Байес по словам и символьным триграммам.
+
+    Признаки хэшируются crc32 в 2**bits корзин, поэтому словарь не растёт и
+    модель занимает фиксированную память. Учится по одному примеру за раз —
+    из решений модерации — и уверенно решает только крайние случаи:
+    всё между порогами уходит в AI-фильтр.
+
+    Слова берутся из TextAnalysis (уже свёрнутые), так что «кpиптa» с
+    латиницей и «крипта» — один и тот же признак.
+
+    Файл модели общий для всех шардов, а учится каждый своему: save()
+    не перезаписывает файл своей копией, а добавляет к тому, что в нём
+    лежит, только примеры, выученные с прошлого сохранения. Автосохранение
+    (каждые `autosave_every` примеров) идёт в потоке: блокировка файла,
+    чтение, слияние и сжатие ~2 МБ — не на event loop.
+    """
+
+    MAGIC = b"SPNB1"
+
+    def __init__(self, bits: int = 18, low: float = SPAM_HAM_THRESHOLD,
+                 high: float = SPAM_SPAM_THRESHOLD, min_examples: int = 50,
+                 path: Optional[str] = None, autosave_every: int = 1000):
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.low = low
+        self.high = high
+        self.min_examples = min_examples
+        self.path = path
+        self.autosave_every = autosave_every
+        # counts[0] — не спам, counts[1] — спам
+        self.counts = (array("I", bytes(4 << bits)), array("I", bytes(4 << bits)))
+        self.totals = [0, 0]
+        self.docs = [0, 0]
+        self._unsaved = 0
+        # Признаки примеров с прошлого сохранения — их save() доливает в файл
+        self._learned: Learned = []
+        self._saving: Optional[asyncio.Task] = None
+
+    def features(self, analysis: TextAnalysis) -> List[int]:
+        feats = [f"w:{w}" for w in analysis.tokens]
+        joined = f" {analysis.normalized} "
+        feats += [joined[i:i + 3] for i in range(len(joined) - 2)]
+        if analysis.links or analysis.mentions:
+            feats.append("meta:link")
+        mask = self.mask
+        return [zlib.crc32(f.encode()) & mask for f in feats]
+
+    @property
+    def ready(self) -> bool:
+        """Пока примеров мало, модель ничего не решает сама."""
+        return min(self.docs) >= self.min_examples
+
+    def learn(self, analysis: TextAnalysis, is_spam: bool) -> None:
+        label = int(is_spam)
+        counts = self.counts[label]
+        feats = self.features(analysis)
+        for f in feats:
+            counts[f] += 1
+        self.totals[label] += len(feats)
+        self.docs[label] += 1
+
+        if self.path:
+            self._learned.append((label, feats))
+            self._unsaved += 1
+            if self._unsaved >= self.autosave_every:
+                self._autosave()
+
+    def score(self, analysis: TextAnalysis) -> float:
+        """Вероятность спама, 0..1."""
+        feats = self.features(analysis)
+        ham, spam = self.counts
+        size = 1 << self.bits
+        log = math.log
+
+        log_odds = log((self.docs[1] + 1) / (self.docs[0] + 1))
+        log_odds += len(feats) * (log(self.totals[0] + size) - log(self.totals[1] + size))
+        for f in feats:
+            log_odds += log(spam[f] + 1) - log(ham[f] + 1)
+
+        log_odds = max(-50.0, min(50.0, log_odds))
+        return 1.0 / (1.0 + math.exp(-log_odds))
+
+    def decide(self, analysis: TextAnalysis) -> Tuple[str, float]:
+        if not self.ready:
+            return UNSURE, 0.5
+        p = self.score(analysis)
+        if p >= self.high:
+            return SPAM, p
+        if p <= self.low:
+            return HAM, p
+        return UNSURE, p
+
+    # ---------------------------
+    # Хранение на диске
+    # ---------------------------
+    def _autosave(self) -> None:
+        if self._saving is not None and not self._saving.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Без event loop (скрипты, бенчмарки) — сохраняем на месте
+            self.save()
+            return
+        self._saving = loop.create_task(self.save_async())
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        learned, state = self._snapshot()
+        try:
+            merged = self._store(path, learned, state)
+        except BaseException:
+            self._restore(learned)
+            raise
+        self._adopt(merged)
+
+    async def save_async(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        learned, state = self._snapshot()
+        try:
+            merged = await asyncio.to_thread(self._store, path, learned, state)
+        except Exception:
+            self._restore(learned)
+            logger.exception("Модель спама %s не сохранена", path)
+            return
+        self._adopt(merged)
+
+    async def stop(self) -> None:
+        """При остановке: дождаться автосохранения и дописать остальное."""
+        if self._saving is not None:
+            await self._saving
+            self._saving = None
+        if self.path:
+            await self.save_async()
+
+    def _snapshot(self) -> Tuple[Learned, State]:
+        """На event loop: что выучено с прошлого сохранения и копия модели (на случай, если файла нет)."""
+        learned, self._learned, self._unsaved = self._learned, [], 0
+        return learned, (tuple(c[:] for c in self.counts), list(self.totals), list(self.docs))
+
+    def _restore(self, learned: Learned) -> None:
+        # Не сохранили — примеры дольются в следующий раз
+        self._learned[:0] = learned
+        self._unsaved += len(learned)
+
+    def _store(self, path: str, learned: Learned, state: State) -> State:
+        """В потоке: файл + свои новые примеры -> файл. Саму модель не трогает."""
+        with _locked(path):
+            merged = self._merge_saved(path, learned) or state
+            self._write(path, merged)
+        return merged
+
+    def _adopt(self, merged: State) -> None:
+        """
+        На event loop: модель из файла (с примерами других шардов) вместо своей.
+        Выученное, пока шло сохранение, в файл не попало — доливаем его поверх.
+        """
+        self._apply(merged, self._learned)
+        self.counts, self.totals, self.docs = merged
+
+    @staticmethod
+    def _apply(state: State, learned: Learned) -> None:
+        counts, totals, docs = state
+        for label, feats in learned:
+            label_counts = counts[label]
+            for f in feats:
+                label_counts[f] += 1
+            totals[label] += len(feats)
+            docs[label] += 1
+
+    def _merge_saved(self, path: str, learned: Learned) -> Optional[State]:
+        """Модель из файла (с тем, что выучили другие шарды) плюс свои новые примеры."""
+        try:
+            saved = self._read(path)
+        except (OSError, ValueError, zlib.error):
+            return None
+        if saved is None or saved.bits != self.bits:
+            return None
+        state = (saved.counts, saved.totals, saved.docs)
+        self._apply(state, learned)
+        return state
+
+    def _write(self, path: str, state: State) -> None:
+        (ham, spam), totals, docs = state
+        if sys.byteorder == "big":
+            ham, spam = array("I", ham), array("I", spam)
+            ham.byteswap()
+            spam.byteswap()
+
+        meta = json.dumps({"bits": self.bits, "totals": totals, "docs": docs}).encode()
+        payload = zlib.compress(ham.tobytes() + spam.tobytes(), 6)
+
+        # Свой временный файл у каждого процесса: шарды могут сохранять одновременно
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(len(meta).to_bytes(4, "little"))
+            f.write(meta)
+            f.write(payload)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = SPAM_MODEL_PATH, **kwargs) -> "SpamClassifier":
+        """Загружает модель; если файла нет или он битый — начинает с нуля."""
+        try:
+            model = cls._read(path, **kwargs)
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning("Модель спама %s не загружена (%s), начинаем с нуля", path, e)
+            model = None
+        return model if model is not None else cls(path=path, **kwargs)
+
+    @classmethod
+    def _read(cls, path: str, **kwargs) -> Optional["SpamClassifier"]:
+        """None — файла нет; битый файл — исключение."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("unknown format")
+            meta = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+            raw = zlib.decompress(f.read())
+
+        model = cls(bits=meta["bits"], path=path, **kwargs)
+        half = len(raw) // 2
+        for counts, chunk in zip(model.counts, (raw[:half], raw[half:])):
+            loaded = array("I")
+            loaded.frombytes(chunk)
+            if sys.byteorder == "big":
+                loaded.byteswap()
+            counts[:] = loaded
+        model.totals = meta["totals"]
+        model.docs = meta["docs"]
+        return model
+
+    def stats(self) -> dict:
+        return {"ham_docs": self.docs[0], "spam_docs": self.docs[1], "ready": self.ready}
+
+
+# ============================================================
+#          ПОСЛЕДНИЕ СООБЩЕНИЯ — ДЛЯ ОБУЧЕНИЯ ПО БАНАМ
+# ============================================================
+class RecentMessages:
+    """Разбор последнего сообщения каждого пользователя в чате (ограниченный LRU)."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[int, int], TextAnalysis]" = OrderedDict()
+
+    def remember(self, chat_id: int, user_id: int, analysis: TextAnalysis) -> None:
+        key = (chat_id, user_id)
+        self._data[key] = analysis
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, chat_id: int, user_id: int) -> Optional[TextAnalysis]:
+        return self._data.pop((chat_id, user_id), None)
+
+
+spam_classifier = SpamClassifier.load(SPAM_MODEL_PATH)
+recent_messages = RecentMessages()
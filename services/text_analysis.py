@@ -0,0 +1,139 @@
+import hashlib
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.lemmatizer import lemmatizer
+
+# ============================================================
+#            ТАБЛИЦЫ ПЕРЕКОДИРОВКИ (СОБИРАЮТСЯ ОДИН РАЗ)
+# ============================================================
+# Невидимые символы: нулевой ширины, мягкий перенос, метки направления,
+# селекторы вариантов и теги — их вставляют внутрь слов, чтобы сломать поиск
+_INVISIBLE = [
+    0x00AD, 0x034F, 0x061C, 0x115F, 0x1160, 0x17B4, 0x17B5, 0x180E, 0x3164, 0xFEFF, 0xFFA0,
+    *range(0x200B, 0x2010), *range(0x202A, 0x202F), *range(0x2060, 0x2070),
+    *range(0xFE00, 0xFE10), *range(0xE0000, 0xE0080), *range(0xE0100, 0xE01F0),
+]
+
+# Эмодзи и пиктограммы между буквами — просто разделители
+_SEPARATORS = [
+    *range(0x2190, 0x2C00), *range(0x1F000, 0x1FB00), 0x20E3,
+]
+
+
+def _letters(start: int) -> Dict[int, str]:
+    return {start + i: chr(ord("a") + i) for i in range(26)}
+
+
+def _build_fold_table() -> Dict[int, Optional[str]]:
+    table: Dict[int, Optional[str]] = {cp: " " for cp in _SEPARATORS}
+    # Буквы-эмодзи: 🇸🇵🇦🇲, 🅢🅟🅐🅜, 🆂🅿🅰🅼 — NFKC их не раскрывает
+    table.update(_letters(0x1F1E6))
+    table.update(_letters(0x1F150))
+    table.update(_letters(0x1F170))
+    table.update({cp: None for cp in _INVISIBLE})
+    return table
+
+
+_FOLD = _build_fold_table()
+
+# Латиница и цифры, похожие на кириллицу, — для слов, где кириллица уже есть
+# («s» — от «$»: $кидка)
+_TO_CYRILLIC = str.maketrans("aceopxykmthbnrus0346", "асеорхукмтнвпгисозчб")
+# Leetspeak в латинских словах: p0rn, fr33, b1tc0in
+_TO_LATIN = str.maketrans("013457", "oieast")
+
+_LETTER_SIGNS = {"@": "a", "$": "s"}
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+_WORD_RE = re.compile(r"\w+")
+# @ и $ внутри слова — буквы: кр@сота, $кидка
+_SIGN_IN_WORD_RE = re.compile(r"(?<=[^\W\d_])[@$]|(?<!\w)\$(?=[^\W\d_])")
+# Слово по одной букве: «к р и п т а», «б.о.т», «к💥р💥и💥п💥т💥а» (цифры не склеиваем: «я в 5»)
+_SPACED_RE = re.compile(r"(?<!\w)(?:[^\W\d_][^\w\n]{1,3}){2,}[^\W\d_](?!\w)")
+# Однобуквенные слова русского: «а я с ним», «и в у» — обычная речь, а не слово по буквам.
+# Из одних таких букв склеиваем только длинные цепочки: «с у к а» — да, «а я с» — нет
+_SINGLE_LETTER_WORDS = frozenset("аиясвкоу")
+_SPACED_MIN_FUNCTION_LETTERS = 4
+_LINK_RE = re.compile(r"(?:https?://|www\.)\S+|\b(?:t|telegram)\.me/\S+")
+_MENTION_RE = re.compile(r"(?<!\w)@\w{4,}")
+
+
+def _fold_word(word: str) -> str:
+    if _CYRILLIC_RE.search(word):
+        return word.translate(_TO_CYRILLIC)
+    if not word.isalpha() and not word.isdigit():
+        return word.translate(_TO_LATIN)
+    return word
+
+
+def _join_spaced(match: "re.Match") -> str:
+    letters = _WORD_RE.findall(match[0])
+    if len(letters) < _SPACED_MIN_FUNCTION_LETTERS and _SINGLE_LETTER_WORDS.issuperset(letters):
+        return match[0]
+    return "".join(letters)
+
+
+def _prepare(text: str) -> str:
+    """NFKC + таблица невидимых/эмодзи + нижний регистр; ссылки ищутся уже здесь."""
+    return unicodedata.normalize("NFKC", text).translate(_FOLD).lower()
+
+
+def _tokens(prepared: str) -> List[str]:
+    prepared = _SIGN_IN_WORD_RE.sub(lambda m: _LETTER_SIGNS[m[0]], prepared)
+    prepared = _SPACED_RE.sub(_join_spaced, prepared)
+    return [_fold_word(word) for word in _WORD_RE.findall(prepared)]
+
+
+def fold(text: str) -> str:
+    """Нормальная форма без разбора ссылок: так же приводятся слова бан-листа."""
+    return " ".join(_tokens(_prepare(text)))
+
+
+# ============================================================
+#                РАЗБОР ТЕКСТА СООБЩЕНИЯ — ОДИН РАЗ
+# ============================================================
+class TextAnalysis:
+    """
+    Всё, что фильтрам нужно от текста сообщения, посчитанное один раз.
+
+    `normalized` — слова в нижнем регистре через пробел после свёртки
+    обфускаций: невидимые символы удалены, эмодзи стали разделителями,
+    буквы-эмодзи и NFKC-варианты (𝐬𝐩𝐚𝐦, ｓｐａｍ) — обычными буквами, латинские
+    двойники и цифры в кириллических словах — кириллицей, слова по буквам
+    склеены. `tokens` — те же слова списком, `content_hash` — blake2b от
+    `normalized` (одинаков у вариантов одного текста). `links` — ссылки из
+    текста и из сущностей сообщения (url, text_link).
+
+    Леммы считаются по требованию (`await lemmatize()`) и запоминаются:
+    морфология нужна только бан-листу, и только если он включён.
+    """
+
+    __slots__ = ("raw", "normalized", "tokens", "links", "mentions", "content_hash", "_lemmas")
+
+    def __init__(self, raw: str, tokens: List[str], links: Tuple[str, ...] = (),
+                 mentions: Tuple[str, ...] = ()):
+        self.raw = raw
+        self.tokens = tokens
+        self.normalized = " ".join(tokens)
+        self.links = links
+        self.mentions = mentions
+        self.content_hash = hashlib.blake2b(self.normalized.encode(), digest_size=16).digest()
+        self._lemmas: Optional[List[str]] = None
+
+    async def lemmatize(self) -> List[str]:
+        """Леммы слов; пока морфология прогревается — сами слова (и не запоминаем)."""
+        if self._lemmas is None:
+            if not lemmatizer.ready:
+                return self.tokens
+            self._lemmas = await lemmatizer.lemmatize_async(self.tokens)
+        return self._lemmas
+
+    def __repr__(self) -> str:
+        return f"TextAnalysis({self.normalized[:40]!r}, tokens={len(self.tokens)}, links={len(self.links)})"
+
+
+def analyze(text: str, entity_links: Iterable[str] = ()) -> TextAnalysis:
+    prepared = _prepare(text)
+    links = tuple(dict.fromkeys(_LINK_RE.findall(prepared) + [link.lower() for link in entity_links]))
+    return TextAnalysis(text, _tokens(prepared), links, tuple(_MENTION_RE.findall(prepared)))
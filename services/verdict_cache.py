@@ -0,0 +1,155 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from services.text_analysis import TextAnalysis
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+
+
+def simhash(tokens: List[str]) -> int:
+    """64-битный SimHash по словам и парам слов."""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * 64
+    for feature in features:
+        h = _hash64(feature)
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+# ============================================================
+#                ИНДЕКС ПОЧТИ-ДУБЛИКАТОВ (SIMHASH)
+# ============================================================
+class SimHashIndex:
+    """
+    Отпечатки, отличающиеся не больше чем на `max_distance` бит.
+
+    64 бита режутся на max_distance + 1 полос: у близких отпечатков хотя бы
+    одна полоса совпадает точно (принцип Дирихле), так что поиск — это
+    несколько словарных обращений вместо полного перебора. Размер ограничен,
+    старые отпечатки вытесняются (LRU).
+    """
+
+    def __init__(self, max_distance: int = 5, maxsize: int = 50_000):
+        self.max_distance = max_distance
+        self.maxsize = maxsize
+        self.bands = max_distance + 1
+        self._width = 64 // self.bands
+        self._fingerprints: "OrderedDict[int, None]" = OrderedDict()
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(self.bands)]
+
+    def _keys(self, fingerprint: int):
+        mask = (1 << self._width) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self._width) & mask
+
+    def add(self, fingerprint: int) -> None:
+        if fingerprint in self._fingerprints:
+            self._fingerprints.move_to_end(fingerprint)
+            return
+        self._fingerprints[fingerprint] = None
+        for band, key in self._keys(fingerprint):
+            self._tables[band].setdefault(key, set()).add(fingerprint)
+        while len(self._fingerprints) > self.maxsize:
+            self._remove(self._fingerprints.popitem(last=False)[0])
+
+    def _remove(self, fingerprint: int) -> None:
+        for band, key in self._keys(fingerprint):
+            bucket = self._tables[band].get(key)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self._tables[band][key]
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        for band, key in self._keys(fingerprint):
+            for candidate in self._tables[band].get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    self._fingerprints.move_to_end(candidate)
+                    return candidate
+        return None
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+
+# ============================================================
+#                  КЭШ ВЕРДИКТОВ КЛАССИФИКАЦИИ
+# ============================================================
+class VerdictCache:
+    """
+    Вердикты модели по тексту сообщения.
+
+    Точные повторы ищутся по content_hash из TextAnalysis (хэш свёрнутого
+    текста: регистр, пунктуация, эмодзи и двойники букв не мешают). Для спама ещё
+    запоминается SimHash, чтобы ловить вариации одной рассылки. Чистые
+    сообщения в индекс почти-дубликатов не попадают — иначе спам,
+    дописанный к безобидному тексту, проскакивал бы без проверки.
+
+    Сообщения без слов (только эмодзи или пунктуация) не кэшируются: свёрнутый
+    текст у них у всех пустой, и один вердикт достался бы каждому «👍» и «+».
+    """
+
+    def __init__(self, maxsize: int = 100_000, near_maxsize: int = 50_000,
+                 max_distance: int = 5, min_tokens: int = 6):
+        self.maxsize = maxsize
+        self.min_tokens = min_tokens
+        self._exact: "OrderedDict[bytes, bool]" = OrderedDict()
+        self._near = SimHashIndex(max_distance=max_distance, maxsize=near_maxsize)
+
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+
+    def get(self, analysis: TextAnalysis) -> Optional[bool]:
+        if not analysis.tokens:
+            return None
+        self.lookups += 1
+        key = analysis.content_hash
+
+        verdict = self._exact.get(key)
+        if verdict is not None:
+            self._exact.move_to_end(key)
+            self.exact_hits += 1
+            return verdict
+
+        tokens = analysis.tokens
+        if len(tokens) >= self.min_tokens and self._near.find(simhash(tokens)) is not None:
+            self.near_hits += 1
+            return True
+        return None
+
+    def put(self, analysis: TextAnalysis, is_spam: bool) -> None:
+        if not analysis.tokens:
+            return
+        key = analysis.content_hash
+        self._exact[key] = is_spam
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.maxsize:
+            self._exact.popitem(last=False)
+
+        tokens = analysis.tokens
+        if is_spam and len(tokens) >= self.min_tokens:
+            self._near.add(simhash(tokens))
+
+    @property
+    def saved_calls(self) -> int:
+        return self.exact_hits + self.near_hits
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "saved_calls": self.saved_calls,
+            "hit_ratio": round(self.saved_calls / self.lookups, 4) if self.lookups else 0.0,
+            "exact_size": len(self._exact),
+            "near_size": len(self._near),
+        }
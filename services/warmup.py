@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+#          ФОНОВЫЙ ПРОГРЕВ ТЯЖЁЛЫХ КОМПОНЕНТОВ
+# ============================================================
+class Warmup:
+    """
+    Тяжёлые компоненты (словари морфологии, SDK модели) грузятся фоном
+    после старта диспетчера, а не при импорте: поллинг начинается сразу.
+
+    Пока компонент не готов, его фильтр работает в деградированном режиме,
+    который определяет сам компонент:
+      * морфология — бан-лист ловит только точные словоформы;
+      * AI — сообщения копятся в очереди и проверяются после прогрева,
+        если бэкенд недоступен — работают только кэш и локальный классификатор.
+    Антифлуд, капча и баны от прогрева не зависят.
+    """
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], Awaitable[Optional[bool]]]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.status: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+
+    def add(self, name: str, step: Callable[[], Awaitable[Optional[bool]]]) -> None:
+        """step() может вернуть False: компонент недоступен, деградация остаётся насовсем."""
+        if name in self.status:
+            return
+        self._steps.append((name, step))
+        self.status[name] = "pending"
+
+    async def start(self) -> None:
+        """Хук startup: запускает прогрев и сразу возвращается."""
+        if self._task is None:
+            self.started_at = time.perf_counter()
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self) -> None:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @property
+    def ready(self) -> bool:
+        return all(status != "pending" for status in self.status.values())
+
+    def pending(self) -> int:
+        return sum(status == "pending" for status in self.status.values())
+
+    async def _run(self) -> None:
+        await asyncio.gather(*(self._step(name, step) for name, step in self._steps))
+        logger.info("Прогрев завершён за %.2f с: %s", time.perf_counter() - self.started_at, self.status)
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[Optional[bool]]]) -> None:
+        started = time.perf_counter()
+        try:
+            ok = await step()
+        except Exception:
+            ok = False
+            logger.exception("Прогрев %s не удался", name)
+        self.status[name] = "failed" if ok is False else "ready"
+        self.durations[name] = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "status": dict(self.status),
+            "durations_ms": {name: round(d * 1000, 1) for name, d in self.durations.items()},
+        }
+
+
+warmup = Warmup()
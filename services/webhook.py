@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import secrets
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from config import (
+    WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_SECRET, WEBHOOK_URL, WEBHOOK_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_id(update: Update) -> int:
+    """Ключ упорядочивания: чат, к которому относится апдейт."""
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    # callback_query: чат сообщения с кнопкой, иначе сам пользователь
+    message = getattr(event, "message", None)
+    if message is not None and getattr(message, "chat", None) is not None:
+        return message.chat.id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    return update.update_id
+
+
+# ============================================================
+#          ПУЛ ОБРАБОТЧИКОВ С ПОРЯДКОМ ВНУТРИ ЧАТА
+# ============================================================
+class UpdateWorkerPool:
+    """
+    `workers` задач, у каждой своя ограниченная очередь. Апдейт попадает в
+    очередь по hash(chat_id), поэтому апдейты одного чата обрабатываются
+    строго по порядку (колбэк капчи — после сообщения, которое её вызвало),
+    а разные чаты — параллельно.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot,
+                 workers: int = WEBHOOK_WORKERS, queue_size: int = WEBHOOK_QUEUE_SIZE):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        per_worker = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._work(q)) for q in self._queues]
+
+    async def stop(self) -> None:
+        """Дорабатывает то, что уже в очередях, и гасит обработчики."""
+        await asyncio.gather(*(q.join() for q in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, update: Update) -> bool:
+        queue = self._queues[hash(update_chat_id(update)) % self.workers]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def put(self, update: Update) -> None:
+        """Как submit, но при полной очереди ждёт места (шард читает из своей очереди сам)."""
+        await self._queues[hash(update_chat_id(update)) % self.workers].put(update)
+        self.accepted += 1
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception:
+                self.failed += 1
+                logger.exception("Ошибка обработки апдейта %s", update.update_id)
+            finally:
+                queue.task_done()
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+
+# ============================================================
+#                    AIOHTTP-СЕРВЕР
+# ============================================================
+def build_app(pool: UpdateWorkerPool, path: str = WEBHOOK_PATH,
+              secret: Optional[str] = WEBHOOK_SECRET) -> web.Application:
+
+    async def handle(request: web.Request) -> web.Response:
+        if secret and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret
+        ):
+            return web.Response(status=401)
+
+        update = Update.model_validate(await request.json(), context={"bot": pool.bot})
+        # Очередь переполнена — отвечаем ошибкой, Telegram пришлёт апдейт повторно
+        if not pool.submit(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> None:
+    if not WEBHOOK_URL:
+        raise RuntimeError("Для RUN_MODE=webhook нужно задать WEBHOOK_URL")
+
+    pool = UpdateWorkerPool(dp, bot)
+    runner = web.AppRunner(build_app(pool))
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    await pool.start()
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Webhook слушает %s:%s%s, обработчиков: %d", host, port, WEBHOOK_PATH, pool.workers)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await pool.stop()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
@@ -0,0 +1,11 @@
+"""Окружение для тестов: бот без сети и своя база во временном каталоге."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("TOKEN", "42:TEST-TOKEN")
+os.environ.setdefault("AI_BACKEND", "fake")
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="antispam-tests-"), "test.db"))
@@ -0,0 +1,51 @@
+"""Исполнитель действий: поток удалений не откладывает баны чата."""
+import asyncio
+
+from services.action_executor import ActionExecutor
+
+CHAT_ID = -100900
+
+
+class RecordingBot:
+    def __init__(self):
+        self.calls = []
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.calls.append("delete_messages")
+
+    async def ban_chat_member(self, chat_id, user_id):
+        self.calls.append("ban_chat_member")
+
+
+def test_deletes_and_actions_alternate():
+    async def scenario():
+        bot = RecordingBot()
+        executor = ActionExecutor(bot, global_rate=1000, chat_rate=1000, chat_burst=1000, max_pending=1000)
+        for message_id in range(250):
+            executor.delete(CHAT_ID, message_id)
+        executor.ban(CHAT_ID, 1)
+        executor.ban(CHAT_ID, 2)
+        await executor.start()
+        await executor.stop()
+        return bot.calls
+
+    assert asyncio.run(scenario()) == [
+        "delete_messages", "ban_chat_member", "delete_messages", "ban_chat_member", "delete_messages",
+    ]
+
+
+def test_trickled_actions_respect_chat_rate():
+    async def scenario():
+        bot = RecordingBot()
+        executor = ActionExecutor(bot, global_rate=1000, chat_rate=5, chat_burst=2, max_pending=1000)
+        await executor.start()
+        # Очередь успевает опустеть между действиями — лимит чата всё равно действует
+        for user_id in range(50):
+            executor.ban(CHAT_ID, user_id)
+            await asyncio.sleep(0.02)
+        calls = len(bot.calls)
+        await executor.stop(timeout=0)
+        return calls
+
+    # За ~1 с: burst 2 + 5 в секунду (с запасом на неточность таймеров)
+    assert asyncio.run(scenario()) <= 9
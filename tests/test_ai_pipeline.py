@@ -0,0 +1,60 @@
+"""AI-фильтр без модели: после неудачного прогрева кэш вердиктов продолжает удалять спам."""
+import asyncio
+
+from services.ai_pipeline import AIFilterPipeline, ClassifierBackend
+from services.text_analysis import analyze
+from services.verdict_cache import VerdictCache
+
+
+class BrokenBackend(ClassifierBackend):
+    async def warm_up(self) -> None:
+        raise ImportError("google-genai is not installed")
+
+
+def test_submit_after_failed_warm_up_uses_cache():
+    async def scenario():
+        deleted = []
+
+        async def on_spam(message):
+            deleted.append(message)
+
+        cache = VerdictCache()
+        cache.put(analyze("Заработок в телеграм от 500$ в день"), True)
+        pipeline = AIFilterPipeline(BrokenBackend(), on_spam=on_spam, cache=cache)
+        await pipeline.start()
+        assert await pipeline.warm_up() is False
+        await asyncio.sleep(0)
+
+        assert pipeline.running
+        assert pipeline.submit("spam", analyze("ЗАРАБОТОК в телеграм от 500$ в день!!"))
+        assert not pipeline.submit("unknown", analyze("всем привет, как дела"))
+        await pipeline.stop()
+        return deleted, pipeline.stats()
+
+    deleted, stats = asyncio.run(scenario())
+    assert deleted == ["spam"]
+    assert stats["backend"] == "unavailable"
+    assert stats["unchecked"] == 1
+
+
+class SpamBackend(ClassifierBackend):
+    async def classify(self, texts):
+        from services.ai_pipeline import AdvertisementCheckMessage
+        return [AdvertisementCheckMessage(answer=True) for _ in texts]
+
+
+def test_failing_on_spam_does_not_hang_stop():
+    async def scenario():
+        async def on_spam(message):
+            raise RuntimeError("message to delete not found")
+
+        pipeline = AIFilterPipeline(SpamBackend(), on_spam=on_spam, max_batch=3, max_delay=0.01)
+        await pipeline.start()
+        for i in range(3):
+            assert pipeline.submit(i, analyze(f"реклама номер {i}"))
+        await asyncio.wait_for(pipeline.stop(), timeout=5)
+        return pipeline.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["errors"] == 3
+    assert stats["queue_depth"] == 0
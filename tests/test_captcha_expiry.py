@@ -0,0 +1,95 @@
+"""Истёкшая капча: кик (бан + разбан) не должен превращаться в бан пользователя."""
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.types import Chat, ChatMemberBanned, ChatMemberMember, ChatMemberUpdated, User
+
+from database.cache import UserStatus, user_cache
+from database.registry import group_registry
+from database.user_journal import user_journal
+from handlers.moderation import member_banned
+from services.captcha_scheduler import CaptchaScheduler
+
+CHAT_ID, GROUP_ID, USER_ID = -100500, 7, 555
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def delete(self, chat_id, message_id):
+        self.calls.append(("delete", chat_id, message_id))
+
+    def ban(self, chat_id, user_id, **kwargs):
+        self.calls.append(("ban_chat_member", chat_id, user_id))
+
+    def call(self, chat_id, method, **kwargs):
+        self.calls.append((method, chat_id, kwargs.get("user_id")))
+
+
+def kicked_by(bot: Bot, user: User) -> ChatMemberUpdated:
+    """Апдейт chat_member, который Telegram присылает после бана."""
+    return ChatMemberUpdated(
+        chat=Chat(id=CHAT_ID, type="supergroup"),
+        from_user=User(id=bot.id, is_bot=True, first_name="bot"),
+        date=datetime.now(),
+        old_chat_member=ChatMemberMember(user=user),
+        new_chat_member=ChatMemberBanned(user=user, until_date=datetime.now()),
+    ).as_(bot)
+
+
+def test_expired_captcha_kick_is_not_a_ban():
+    bot = Bot(token="42:TEST-TOKEN")
+    user = User(id=USER_ID, is_bot=False, first_name="user")
+    group_registry.add(CHAT_ID, GROUP_ID)
+    executor = RecordingExecutor()
+    scheduler = CaptchaScheduler(timeout=0, action="kick", executor=executor, journal=user_journal)
+
+    scheduler.schedule(CHAT_ID, USER_ID, GROUP_ID)
+    user_cache.set(USER_ID, CHAT_ID, UserStatus(is_captcha_sent=True))
+    scheduler._expire(scheduler._pop_due(time.time() + 1))
+    assert ("ban_chat_member", CHAT_ID, USER_ID) in executor.calls
+    assert ("unban_chat_member", CHAT_ID, USER_ID) in executor.calls
+
+    # Бан бота возвращается апдейтом KICKED — хендлер не должен его записать
+    asyncio.run(member_banned(kicked_by(bot, user), session=None))
+
+    status = user_journal.view(GROUP_ID, USER_ID, None)
+    assert status is not None and not status.is_banned
+    assert not status.is_captcha_sent
+    cached = user_cache.get(USER_ID, CHAT_ID)
+    assert cached is None or not cached.is_banned
+
+
+def test_load_releases_captchas_without_timer(tmp_path):
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from database.models import Base, ChatUser, Group, PendingCaptcha
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'captcha.db'}")
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as session:
+            session.add(Group(id=GROUP_ID, chat_id=CHAT_ID))
+            session.add_all([
+                # 1 — капча без таймера (заперт), 2 — таймер есть, 3 — уже проверен
+                ChatUser(group_id=GROUP_ID, user_id=1, is_captcha_sent=True, is_verified=False),
+                ChatUser(group_id=GROUP_ID, user_id=2, is_captcha_sent=True, is_verified=False),
+                ChatUser(group_id=GROUP_ID, user_id=3, is_captcha_sent=True, is_verified=True),
+                PendingCaptcha(group_id=GROUP_ID, chat_id=CHAT_ID, user_id=2, expires_at=time.time() + 60),
+            ])
+            await session.commit()
+
+        scheduler = CaptchaScheduler(executor=RecordingExecutor(), session_factory=factory)
+        assert await scheduler.load() == 1
+        async with factory() as session:
+            sent = dict((await session.execute(select(ChatUser.user_id, ChatUser.is_captcha_sent))).all())
+        await engine.dispose()
+        return sent
+
+    assert asyncio.run(scenario()) == {1: False, 2: True, 3: True}
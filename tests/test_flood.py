@@ -0,0 +1,87 @@
+"""Флуд-фильтр: короткие реакции — не повторы, рейд не трогает проверенных, выпавших из кэша."""
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message, Update, User
+
+import middlewares.flood_middleware as flood_middleware
+from database.registry import group_registry
+from database.user_journal import user_journal
+from middlewares.flood_middleware import FloodGuardMiddleware
+from services.flood_detector import FloodDetector
+from services.text_analysis import analyze
+
+CHAT_ID, GROUP_ID = -100700, 9
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+    def send_message(self, chat_id, text, **kwargs):
+        pass
+
+
+def message(message_id: int, user_id: int, text: str) -> Update:
+    return Update(update_id=message_id, message=Message(
+        message_id=message_id,
+        date=datetime.now(),
+        chat=Chat(id=CHAT_ID, type="supergroup"),
+        from_user=User(id=user_id, is_bot=False, first_name="user"),
+        text=text,
+    ))
+
+
+def run(middleware, update: Update, data=None):
+    data = {"analysis": analyze(update.message.text), **(data or {})}
+
+    async def handler(event, data):
+        return data
+
+    return asyncio.run(middleware(handler, update, data))
+
+
+def setup(monkeypatch):
+    executor = RecordingExecutor()
+    detector = FloodDetector()
+    monkeypatch.setattr(flood_middleware, "action_executor", executor)
+    monkeypatch.setattr(flood_middleware, "flood_detector", detector)
+    group_registry.add(CHAT_ID, GROUP_ID)
+    return executor, detector
+
+
+def test_short_reactions_are_not_duplicates(monkeypatch):
+    executor, _ = setup(monkeypatch)
+    middleware = FloodGuardMiddleware()
+    message_id = 0
+    for text in ("+", "👍", "😂😂", "!!!", "спасибо"):
+        for user_id in range(1, 6):
+            message_id += 1
+            assert run(middleware, message(message_id, user_id, text)) is not None
+    assert executor.deleted == []
+
+
+def test_spam_copies_are_duplicates(monkeypatch):
+    executor, _ = setup(monkeypatch)
+    middleware = FloodGuardMiddleware()
+    for user_id in range(1, 6):
+        run(middleware, message(user_id, user_id, "Заработок в телеграм от 500$ в день"))
+    assert executor.deleted
+
+
+def test_lockdown_keeps_verified_user_missing_from_cache(monkeypatch):
+    executor, detector = setup(monkeypatch)
+    detector._state(CHAT_ID, flood_middleware._limits(CHAT_ID)).lockdown_until = float("inf")
+    middleware = FloodGuardMiddleware()
+
+    user_journal.record(GROUP_ID, 101, is_verified=True)
+    user_journal.record(GROUP_ID, 102, is_captcha_sent=True)
+
+    assert run(middleware, message(1, 101, "всем привет"))["lockdown"] is True
+    assert run(middleware, message(2, 102, "всем привет")) is None
+    # Ни в кэше, ни в журнале — решает AuthorizedMessageMiddleware по базе
+    assert run(middleware, message(3, 103, "всем привет"))["lockdown"] is True
+    assert executor.deleted == [2]
@@ -0,0 +1,54 @@
+"""Фильтр ссылок учит общий классификатор только на запрещённых доменах."""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from aiogram.types import Chat, Message, User
+
+import middlewares.link_filter as link_middleware
+from middlewares.link_filter import LinkFilterMiddleware
+from services.link_filter import LinkFilter
+from services.text_analysis import analyze
+
+CHAT_ID = -100800
+
+
+class Recorder:
+    def __init__(self):
+        self.learned = []
+        self.deleted = []
+
+    def learn(self, analysis, is_spam):
+        self.learned.append(analysis.raw)
+
+    def delete(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+
+def run(text: str, message_id: int, policy: str):
+    event = Message(message_id=message_id, date=datetime.now(), text=text,
+                    chat=Chat(id=CHAT_ID, type="supergroup"),
+                    from_user=User(id=1, is_bot=False, first_name="user"))
+    data = {"analysis": analyze(text), "group_settings": SimpleNamespace(link_policy=policy),
+            "group_id": None, "session": None}
+
+    async def handler(event, data):
+        return True
+
+    return asyncio.run(LinkFilterMiddleware()(handler, event, data))
+
+
+def test_strict_policy_does_not_train_on_ordinary_links(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(link_middleware, "link_filter", LinkFilter(deny=["casino.example"], path=None))
+    monkeypatch.setattr(link_middleware, "spam_classifier", recorder)
+    monkeypatch.setattr(link_middleware, "action_executor", recorder)
+
+    # Не в разрешённых — удалено по strict, но это не спам
+    assert run("рецепт тут https://cooking.example/pie", 1, "strict") is None
+    # Запрещённый домен — удалено и выучено
+    assert run("бонус https://casino.example/win", 2, "strict") is None
+    assert run("видео https://youtube.com/watch", 3, "strict") is True
+
+    assert recorder.deleted == [1, 2]
+    assert recorder.learned == ["бонус https://casino.example/win"]
@@ -0,0 +1,22 @@
+"""/profile/stop отдаёт свёрнутые стеки, не останавливая event loop на join потока."""
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from services.metrics_server import build_app
+from services.profiler import SamplingProfiler
+
+
+def test_profile_start_stop():
+    async def scenario():
+        sampler = SamplingProfiler()
+        async with TestClient(TestServer(build_app(sampler=sampler))) as client:
+            assert (await client.post("/profile/start?interval=0.001")).status == 200
+            await asyncio.sleep(0.1)
+            response = await client.post("/profile/stop")
+            return response.status, await response.text(), sampler.running
+
+    status, collapsed, running = asyncio.run(scenario())
+    assert status == 200
+    assert collapsed
+    assert not running
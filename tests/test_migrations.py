@@ -0,0 +1,76 @@
+"""Миграция базы исходной версии: chat_users с ключом username и chat_id вместо groups.id."""
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from database import migrations
+from database.migrations import SCHEMA_VERSION, UNMIGRATED, migrate
+
+BASELINE = """
+CREATE TABLE groups (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id BIGINT NOT NULL UNIQUE);
+CREATE TABLE group_settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, group_id INTEGER NOT NULL UNIQUE,
+    filter_badwords BOOLEAN, welcome_enabled BOOLEAN, ai_filtering BOOLEAN
+);
+CREATE TABLE bad_words (id INTEGER PRIMARY KEY AUTOINCREMENT, group_id INTEGER NOT NULL, word VARCHAR NOT NULL);
+CREATE TABLE chat_users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR NOT NULL UNIQUE,
+    is_verified BOOLEAN, is_banned BOOLEAN, is_captcha_sent BOOLEAN, is_admin BOOLEAN,
+    group_id INTEGER
+);
+INSERT INTO groups (id, chat_id) VALUES (3, -100123);
+INSERT INTO chat_users (username, is_verified, is_banned, is_captcha_sent, is_admin, group_id) VALUES
+    ('id_555', 0, 1, 1, 0, -100123),
+    ('alice', 1, 1, 1, 0, -100123),
+    ('id_777', 1, 0, 1, 0, -100999);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = tmp_path / "baseline.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE)
+    conn.close()
+    return path
+
+
+def _run(path):
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.begin() as conn:
+            return migrate(conn)
+    finally:
+        engine.dispose()
+
+
+def test_baseline_rows_point_at_groups(baseline_db):
+    assert _run(baseline_db) == SCHEMA_VERSION
+
+    conn = sqlite3.connect(baseline_db)
+    groups = dict(conn.execute("SELECT chat_id, id FROM groups"))
+    rows = conn.execute("SELECT user_id, group_id, is_banned, is_verified FROM chat_users ORDER BY user_id").fetchall()
+    # chat_id переведён в groups.id; незнакомый чат зарегистрирован
+    assert rows == [(555, groups[-100123], 1, 0), (777, groups[-100999], 0, 1)]
+    # Пользователь с username без известного user_id не потерян
+    assert conn.execute(f'SELECT username, is_banned FROM "{UNMIGRATED}"').fetchall() == [("alice", 1)]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_failed_step_leaves_database_untouched(baseline_db, monkeypatch):
+    def broken(conn):
+        raise RuntimeError("шаг упал")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:1] + [broken])
+    with pytest.raises(RuntimeError):
+        _run(baseline_db)
+
+    conn = sqlite3.connect(baseline_db)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_users)")}
+    assert "username" in columns and "user_id" not in columns
+    assert conn.execute("SELECT count(*) FROM chat_users").fetchone()[0] == 3
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,38 @@
+"""Общий бан-лист после перезапуска: только баны админов, не разошедшиеся баны бота."""
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import services.shared_bans as shared_bans_module
+from database.models import Base, ChatUser, Group, GroupSettings
+from database.user_journal import UserStateJournal
+from services.shared_bans import SharedBanList
+
+
+def test_load_skips_bans_issued_by_the_bot(tmp_path, monkeypatch):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bans.db'}")
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        journal = UserStateJournal(session_factory=factory)
+        monkeypatch.setattr(shared_bans_module, "user_journal", journal)
+        async with factory() as session:
+            session.add_all([Group(id=1, chat_id=-1001), Group(id=2, chat_id=-1002)])
+            session.add_all([GroupSettings(group_id=1, share_bans=True), GroupSettings(group_id=2, share_bans=True)])
+            await session.commit()
+        # 10 забанил админ группы 1, в группе 2 его забанил бот; 20 — только бан бота
+        journal.record(1, 10, is_banned=True, banned_by_admin=True)
+        journal.record(2, 10, is_banned=True)
+        journal.record(2, 20, is_banned=True)
+
+        bans = SharedBanList(session_factory=factory)
+        await bans.load()
+        await engine.dispose()
+        return bans
+
+    bans = asyncio.run(scenario())
+    assert bans.is_banned(10)
+    assert not bans.is_banned(20)
+    assert len(bans) == 1
@@ -0,0 +1,56 @@
+"""Общий файл модели: сохранения шардов складываются, а не затирают друг друга."""
+from services.spam_classifier import SpamClassifier
+from services.text_analysis import analyze
+
+
+def test_saves_from_shards_are_merged(tmp_path):
+    path = str(tmp_path / "spam_model.bin")
+    base = SpamClassifier(bits=12, path=path)
+    base.learn(analyze("всем привет"), False)
+    base.save()
+
+    first = SpamClassifier.load(path)
+    second = SpamClassifier.load(path)
+    first.learn(analyze("подписывайтесь на канал"), True)
+    second.learn(analyze("скидки на крипту"), True)
+    second.learn(analyze("как дела"), False)
+    first.save()
+    second.save()
+
+    single = SpamClassifier(bits=12)
+    for text, is_spam in (("всем привет", False), ("подписывайтесь на канал", True),
+                          ("скидки на крипту", True), ("как дела", False)):
+        single.learn(analyze(text), is_spam)
+
+    merged = SpamClassifier.load(path)
+    assert merged.docs == [2, 2]
+    assert merged.totals == single.totals
+    assert merged.counts == single.counts
+    # Второй шард после сохранения видит и то, что выучил первый
+    assert second.docs == [2, 2]
+
+    second.save()
+    assert SpamClassifier.load(path).docs == [2, 2]
+
+
+def test_autosave_runs_off_the_loop_and_keeps_new_examples(tmp_path):
+    import asyncio
+
+    path = str(tmp_path / "spam_model.bin")
+
+    async def scenario():
+        model = SpamClassifier(bits=12, path=path, autosave_every=2)
+        model.learn(analyze("всем привет"), False)
+        model.learn(analyze("подписывайтесь на канал"), True)
+        # Сохранение ушло в поток; выученное до его конца не должно потеряться
+        assert model._saving is not None and not model._saving.done()
+        model.learn(analyze("скидки на крипту"), True)
+        await model._saving
+        assert model.docs == [1, 2]
+        await model.stop()
+        return model
+
+    model = asyncio.run(scenario())
+    saved = SpamClassifier.load(path)
+    assert saved.docs == model.docs == [1, 2]
+    assert saved.counts == model.counts
@@ -0,0 +1,13 @@
+"""Склейка слов по буквам не трогает однобуквенные слова обычной речи."""
+from services.text_analysis import analyze
+
+
+def test_single_letter_words_are_not_joined():
+    assert analyze("а я с ним").tokens == ["а", "я", "с", "ним"]
+    assert analyze("ну и я с ним").tokens == ["ну", "и", "я", "с", "ним"]
+
+
+def test_spelled_out_words_are_joined():
+    assert analyze("к р и п т а").tokens == ["крипта"]
+    assert analyze("б.о.т").tokens == ["бот"]
+    assert analyze("к💥р💥и💥п💥т💥а").tokens == ["крипта"]
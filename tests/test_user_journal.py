@@ -0,0 +1,45 @@
+"""Журнал статусов: пачку, которая сейчас пишется, видно до коммита и после неудачи."""
+import asyncio
+
+import pytest
+
+from database.user_journal import UserStateJournal
+
+
+class SlowJournal(UserStateJournal):
+    def __init__(self, fail: bool):
+        super().__init__(session_factory=None)
+        self.fail = fail
+        self.writing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def _write(self, batch):
+        self.writing.set()
+        await self.release.wait()
+        if self.fail:
+            raise OSError("database is locked")
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_view_sees_batch_being_written(fail):
+    async def scenario():
+        journal = SlowJournal(fail)
+        journal.record(1, 10, is_verified=True)
+        flush = asyncio.create_task(journal.flush())
+        await journal.writing.wait()
+
+        # Строка в базе ещё старая (None), но пачка уже не в _pending
+        status = journal.view(1, 10, None)
+        assert status is not None and status.is_verified
+
+        journal.release.set()
+        try:
+            await flush
+        except OSError:
+            pass
+        return journal
+
+    journal = asyncio.run(scenario())
+    assert len(journal) == (1 if fail else 0)
+    if fail:
+        assert journal.view(1, 10, None).is_verified
@@ -0,0 +1,15 @@
+from services.text_analysis import analyze
+from services.verdict_cache import VerdictCache
+
+
+def test_wordless_messages_do_not_share_a_verdict():
+    cache = VerdictCache()
+    cache.put(analyze("🔞🔞🔞 💋"), True)
+    assert cache.get(analyze("👍")) is None
+    assert cache.get(analyze("+")) is None
+
+
+def test_text_variants_share_a_verdict():
+    cache = VerdictCache()
+    cache.put(analyze("купи крипту"), True)
+    assert cache.get(analyze("КУПИ крипту!")) is True